@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+        from .authentication import invalidate_cached_driver
+        from .models import Driver
+
+        post_save.connect(invalidate_cached_driver, sender=Driver)
+        post_delete.connect(invalidate_cached_driver, sender=Driver)
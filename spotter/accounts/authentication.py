@@ -0,0 +1,60 @@
+"""
+JWT authentication that caches the resolved Driver between requests.
+"""
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def driver_cache_key(user_id):
+    return f"accounts:driver:{user_id}"
+
+
+def driver_cache():
+    return caches[settings.DRIVER_CACHE_ALIAS]
+
+
+def invalidate_cached_driver(sender, instance, **kwargs):
+    """
+    post_save/post_delete receiver dropping a driver's cached profile.
+    """
+    driver_cache().delete(driver_cache_key(instance.pk))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that keeps the token's Driver (profile fields
+    included) in the DRIVER_CACHE_ALIAS cache for DRIVER_CACHE_TTL seconds,
+    never past the token's expiry, so authenticated requests usually make
+    no user query. Saving or deleting the driver drops the entry; bulk
+    QuerySet.update() calls bypass that and must invalidate themselves.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        cache = driver_cache()
+        key = driver_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            timeout = min(settings.DRIVER_CACHE_TTL, validated_token.get("exp", 0) - time.time())
+            if timeout > 0:
+                cache.set(key, user, timeout)
+            return user
+
+        # The cached driver was active when stored and saves invalidate it;
+        # the revocation claim is per token, so it is checked every time.
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if getattr(api_settings, "CHECK_REVOKE_TOKEN", False):
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
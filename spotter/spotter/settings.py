@@ -23,6 +23,125 @@ CORS_ALLOW_CREDENTIALS = config('CORS_ALLOW_CREDENTIALS', default=True, cast=boo
 # API key for external services (if needed)
 GEOAPIFY_API_KEY = config('GEOAPIFY_API_KEY')
 
+# Geocoding cache: in-process LRU tier (entries / seconds) backed by the
+# GeocodeCache table (rows older than GEOCODE_DB_TTL_DAYS are refreshed).
+GEOCODE_CACHE_SIZE = config('GEOCODE_CACHE_SIZE', default=2048, cast=int)
+GEOCODE_CACHE_TTL = config('GEOCODE_CACHE_TTL', default=6 * 60 * 60, cast=int)
+GEOCODE_DB_TTL_DAYS = config('GEOCODE_DB_TTL_DAYS', default=30, cast=int)
+
+# Upstream HTTP clients (tripplanner.upstream): base URLs, per-attempt
+# connect/read timeouts in seconds, retries with jittered exponential
+# backoff, pooled connections per host and circuit-breaker thresholds.
+NOMINATIM_URL = config('NOMINATIM_URL', default='https://nominatim.openstreetmap.org')
+NOMINATIM_USER_AGENT = config('NOMINATIM_USER_AGENT', default='YourAppName/1.0 (contact@yourdomain.com)')
+OSRM_URL = config('OSRM_URL', default='http://router.project-osrm.org')
+UPSTREAM_CONNECT_TIMEOUT = config('UPSTREAM_CONNECT_TIMEOUT', default=3.05, cast=float)
+UPSTREAM_READ_TIMEOUT = config('UPSTREAM_READ_TIMEOUT', default=15, cast=float)
+UPSTREAM_MAX_RETRIES = config('UPSTREAM_MAX_RETRIES', default=2, cast=int)
+UPSTREAM_BACKOFF_BASE = config('UPSTREAM_BACKOFF_BASE', default=0.25, cast=float)
+UPSTREAM_BACKOFF_MAX = config('UPSTREAM_BACKOFF_MAX', default=4, cast=float)
+UPSTREAM_POOL_SIZE = config('UPSTREAM_POOL_SIZE', default=10, cast=int)
+UPSTREAM_BREAKER_THRESHOLD = config('UPSTREAM_BREAKER_THRESHOLD', default=5, cast=int)
+UPSTREAM_BREAKER_RESET = config('UPSTREAM_BREAKER_RESET', default=30, cast=float)
+
+# Upstream geocoding concurrency and per-provider rate limits (requests/second,
+# with *_BURST back-to-back requests allowed; 0 disables a limit). The public
+# Nominatim policy is 1 req/s; raise these for self-hosted instances.
+GEOCODE_MAX_CONCURRENCY = config('GEOCODE_MAX_CONCURRENCY', default=3, cast=int)
+NOMINATIM_RATE_LIMIT = config('NOMINATIM_RATE_LIMIT', default=1.0, cast=float)
+NOMINATIM_BURST = config('NOMINATIM_BURST', default=1, cast=int)
+OSRM_RATE_LIMIT = config('OSRM_RATE_LIMIT', default=5.0, cast=float)
+OSRM_BURST = config('OSRM_BURST', default=5, cast=int)
+
+# SQLite file holding the per-provider token buckets shared by all worker
+# processes on this host; empty keeps a separate bucket per process.
+RATE_LIMIT_STORE = config('RATE_LIMIT_STORE', default=str(BASE_DIR / 'var' / 'ratelimit.sqlite3'))
+
+# Offline gazetteer (CSV of name,latitude,longitude[,kind,aliases]) consulted
+# before the geocode caches and Nominatim; empty disables it.
+GAZETTEER_PATH = config('GAZETTEER_PATH', default='')
+
+# Routing backend: "osrm" for the OSRM HTTP API at OSRM_URL, or "local" for
+# the offline graph at ROUTING_GRAPH_PATH (see build_routing_graph).
+ROUTING_PROVIDER = config('ROUTING_PROVIDER', default='osrm')
+ROUTING_GRAPH_PATH = config('ROUTING_GRAPH_PATH', default=str(BASE_DIR / 'var' / 'routing_graph.npz'))
+
+# Route cache: raw routes keyed by coordinates rounded to
+# ROUTE_CACHE_PRECISION decimal places.
+ROUTE_CACHE_SIZE = config('ROUTE_CACHE_SIZE', default=512, cast=int)
+ROUTE_CACHE_TTL = config('ROUTE_CACHE_TTL', default=60 * 60, cast=int)
+ROUTE_CACHE_PRECISION = config('ROUTE_CACHE_PRECISION', default=5, cast=int)
+
+# Background route computation: in-process worker threads per server
+# process (0 leaves RouteJob rows for `manage.py process_route_jobs`).
+ROUTE_WORKER_THREADS = config('ROUTE_WORKER_THREADS', default=1, cast=int)
+
+# Hours-of-service planning (tripplanner.hos): when the first driving day
+# starts, on-duty time at pickup/dropoff and fuel stop spacing/duration.
+DRIVING_DAY_START_HOUR = config('DRIVING_DAY_START_HOUR', default=6, cast=int)
+PICKUP_MINUTES = config('PICKUP_MINUTES', default=60, cast=int)
+DROPOFF_MINUTES = config('DROPOFF_MINUTES', default=60, cast=int)
+FUEL_STOP_INTERVAL_MILES = config('FUEL_STOP_INTERVAL_MILES', default=1000, cast=float)
+FUEL_STOP_MINUTES = config('FUEL_STOP_MINUTES', default=30, cast=int)
+
+# Batch log generation: trips per request, concurrent route fetches, and
+# the process pool used once a batch reaches BATCH_LOG_PROCESS_THRESHOLD
+# trips (BATCH_LOG_PROCESSES=0 keeps everything in-process).
+BATCH_LOG_MAX_TRIPS = config('BATCH_LOG_MAX_TRIPS', default=5000, cast=int)
+BATCH_ROUTE_CONCURRENCY = config('BATCH_ROUTE_CONCURRENCY', default=4, cast=int)
+BATCH_LOG_PROCESSES = config('BATCH_LOG_PROCESSES', default=2, cast=int)
+BATCH_LOG_PROCESS_THRESHOLD = config('BATCH_LOG_PROCESS_THRESHOLD', default=200, cast=int)
+
+# Rendered log-sheet PDFs, cached on disk by a hash of the log content.
+# Each new render prunes files unused for LOG_PDF_CACHE_MAX_AGE_DAYS and the
+# least recently used beyond LOG_PDF_CACHE_MAX_FILES.
+LOG_PDF_CACHE_DIR = config('LOG_PDF_CACHE_DIR', default=str(BASE_DIR / 'var' / 'log_pdfs'))
+LOG_PDF_CACHE_MAX_FILES = config('LOG_PDF_CACHE_MAX_FILES', default=1000, cast=int)
+LOG_PDF_CACHE_MAX_AGE_DAYS = config('LOG_PDF_CACHE_MAX_AGE_DAYS', default=30, cast=int)
+
+# Trip list cursor pagination.
+TRIP_PAGE_SIZE = config('TRIP_PAGE_SIZE', default=50, cast=int)
+TRIP_MAX_PAGE_SIZE = config('TRIP_MAX_PAGE_SIZE', default=200, cast=int)
+
+# Bulk trip import (trips/import/): rows validated and inserted per chunk,
+# and the most rows read from one upload.
+TRIP_IMPORT_CHUNK_SIZE = config('TRIP_IMPORT_CHUNK_SIZE', default=500, cast=int)
+TRIP_IMPORT_MAX_ROWS = config('TRIP_IMPORT_MAX_ROWS', default=100000, cast=int)
+
+# Multi-stop trips: extra stops allowed between pickup and dropoff.
+MAX_TRIP_STOPS = config('MAX_TRIP_STOPS', default=20, cast=int)
+
+# Distance matrices over the routing table service: places per side of one
+# upstream request, concurrent requests, cells cached per process and the
+# largest sources x destinations product one API request may ask for.
+MATRIX_CHUNK_SIZE = config('MATRIX_CHUNK_SIZE', default=50, cast=int)
+MATRIX_CONCURRENCY = config('MATRIX_CONCURRENCY', default=4, cast=int)
+MATRIX_CACHE_SIZE = config('MATRIX_CACHE_SIZE', default=200000, cast=int)
+MATRIX_MAX_CELLS = config('MATRIX_MAX_CELLS', default=100000, cast=int)
+
+# Pages of structured route steps (route_steps endpoint).
+ROUTE_STEP_PAGE_SIZE = config('ROUTE_STEP_PAGE_SIZE', default=50, cast=int)
+ROUTE_STEP_MAX_PAGE_SIZE = config('ROUTE_STEP_MAX_PAGE_SIZE', default=500, cast=int)
+
+# Prometheus metrics at /metrics: readable by staff users, or by scrapers
+# sending "Authorization: Bearer <METRICS_TOKEN>" when a token is set.
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Django cache (default LocMemCache, per process). Point it at a shared
+# backend such as Redis or Memcached when running several workers, so
+# cached driver profiles are invalidated in every process.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    },
+}
+
+# Drivers resolved by CachedJWTAuthentication are cached in this CACHES
+# alias for up to DRIVER_CACHE_TTL seconds (never past the token's expiry).
+DRIVER_CACHE_ALIAS = config('DRIVER_CACHE_ALIAS', default='default')
+DRIVER_CACHE_TTL = config('DRIVER_CACHE_TTL', default=5 * 60, cast=int)
+
 # Application definition
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -39,6 +158,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'tripplanner.middleware.TimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -118,6 +238,6 @@ AUTH_USER_MODEL = 'accounts.Driver'
 # Django REST Framework configuration with Simple JWT
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ),
 }
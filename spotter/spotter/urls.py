@@ -16,9 +16,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from tripplanner.views import MetricsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('tripplanner.urls')),
     path('api/auth/', include('accounts.urls')),
+    path('metrics', MetricsView.as_view(), name='metrics'),
 ]
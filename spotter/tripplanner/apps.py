@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class TripplannerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tripplanner'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, pre_delete
+        from .ledger import capture_trip_days, release_trip_days
+        from .metrics import install_query_timer
+        from .models import Trip
+
+        connection_created.connect(install_query_timer)
+        pre_delete.connect(capture_trip_days, sender=Trip)
+        post_delete.connect(release_trip_days, sender=Trip)
@@ -0,0 +1,95 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import django
+from django.conf import settings
+from django.db import close_old_connections
+from .ledger import prior_on_duty_many
+from .utils import LOG_ROUTE_FIELDS, generate_daily_logs, get_route
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def _log_worker(item):
+    trip, route_data, prior_daily_on_duty = item
+    return generate_daily_logs(trip, route_data, prior_daily_on_duty)
+
+
+def _get_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            # Spawned, not forked: web workers run threads, and forking those
+            # can copy locks in a held state. The initializer must not live in
+            # this module, which can only be imported once apps are loaded.
+            _process_pool = ProcessPoolExecutor(
+                max_workers=settings.BATCH_LOG_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=django.setup,
+            )
+        return _process_pool
+
+
+def _route_in_worker(places):
+    try:
+        return get_route(*places)
+    finally:
+        close_old_connections()
+
+
+def fetch_routes(trips):
+    """
+    Route every trip, reusing stored routes and fetching each distinct
+    sequence of places once, concurrently.
+    Returns {trip_id: route_data or Exception}.
+    """
+    routes = {}
+    pending = {}
+    for trip in trips:
+        stored = trip.stored_route()
+        if stored is not None:
+            routes[trip.pk] = stored
+        else:
+            pending.setdefault(trip.route_places, []).append(trip.pk)
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=settings.BATCH_ROUTE_CONCURRENCY) as executor:
+            futures = {places: executor.submit(_route_in_worker, places) for places in pending}
+            for places, future in futures.items():
+                try:
+                    route_data = future.result()
+                except Exception as e:
+                    route_data = e
+                for trip_id in pending[places]:
+                    routes[trip_id] = route_data
+    return routes
+
+
+def generate_logs_batch(trips):
+    """
+    Generate daily logs for many trips (loaded with their drivers).
+    Returns (results, errors): {trip_id: logs} and {trip_id: message}.
+    Large batches are spread over a process pool.
+    """
+    trips = list(trips)
+    routes = fetch_routes(trips)
+    priors = prior_on_duty_many(trips)
+
+    errors = {}
+    work = []
+    for trip in trips:
+        route_data = routes[trip.pk]
+        if isinstance(route_data, Exception):
+            errors[trip.pk] = str(route_data)
+        else:
+            # Only the fields the log generator reads cross the process boundary.
+            work.append((trip, {field: route_data.get(field) for field in LOG_ROUTE_FIELDS}, priors[trip.pk]))
+
+    if settings.BATCH_LOG_PROCESSES > 0 and len(work) >= settings.BATCH_LOG_PROCESS_THRESHOLD:
+        chunksize = max(1, len(work) // (settings.BATCH_LOG_PROCESSES * 4))
+        logs = _get_process_pool().map(_log_worker, work, chunksize=chunksize)
+    else:
+        logs = map(_log_worker, work)
+    results = {trip.pk: trip_logs for (trip, _, _), trip_logs in zip(work, logs)}
+    return results, errors
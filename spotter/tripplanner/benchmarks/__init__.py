@@ -0,0 +1,3 @@
+"""
+Benchmarks for the route and log pipeline; see benchmarks.suite.
+"""
@@ -0,0 +1,264 @@
+"""
+Benchmarks for the route and log pipeline, run with `manage.py run_benchmarks`.
+
+Upstream geocoding and routing are replayed from fixtures/upstream.json.gz
+(refresh it with `run_benchmarks --record`), so runs are offline and
+repeatable. Results are compared with baseline.json to flag regressions.
+"""
+import gc
+import gzip
+import json
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timezone as dt_timezone
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+from accounts.models import Driver
+from tripplanner import routing, utils
+from tripplanner.models import LogSheet, Trip
+from tripplanner.serializers import TripSerializer
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+FIXTURE_PATH = BENCHMARK_DIR / "fixtures" / "upstream.json.gz"
+BASELINE_PATH = BENCHMARK_DIR / "baseline.json"
+
+# Places recorded by --record: one long three-stop trip.
+SCENARIOS = [("Chicago, IL", "Oklahoma City, OK", "Los Angeles, CA")]
+
+# Total driving hours per log benchmark, from one day to multi-week trips.
+TRIP_LENGTHS = {"1_day": 8, "1_week": 60, "3_weeks": 190, "6_weeks": 390}
+
+_benchmarks = {}
+
+
+def benchmark(name, number=1):
+    """
+    Register `fn(context)` as a benchmark; `number` calls make one sample.
+    """
+    def register(fn):
+        _benchmarks[name] = (fn, number)
+        return fn
+    return register
+
+
+def load_fixture(path=FIXTURE_PATH):
+    with gzip.open(path, "rt", encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def record_fixture(path=FIXTURE_PATH):
+    """
+    Fetch SCENARIOS from the live geocoder and the OSRM provider and save
+    the raw responses as the replay fixture.
+    """
+    places = {}
+    routes = []
+    provider = routing.OSRMProvider()
+    for scenario in SCENARIOS:
+        coordinates = []
+        for place in scenario:
+            if place not in places:
+                places[place] = list(utils._geocode_upstream(place))
+            coordinates.append(places[place])
+        routes.append({"coordinates": coordinates, "route": provider.route(coordinates)})
+    with gzip.open(path, "wt", encoding="utf-8") as handle:
+        json.dump({"places": places, "routes": routes}, handle, separators=(",", ":"))
+
+
+class ReplayProvider(routing.RoutingProvider):
+    """
+    Serves recorded routes by their waypoint coordinates. The recording is
+    full detail, so every detail level gets the same response.
+    """
+    name = "replay"
+
+    def __init__(self, fixture):
+        self.routes = {
+            utils.route_cache_key(*map(tuple, item["coordinates"])): item["route"]
+            for item in fixture["routes"]
+        }
+
+    def route(self, coordinates, detail="full"):
+        return self.routes[utils.route_cache_key(*coordinates)]
+
+
+@contextmanager
+def replay(fixture):
+    """
+    Route geocoding and routing through the fixture for the duration.
+    """
+    places = {utils.normalize_place(name): tuple(coords) for name, coords in fixture["places"].items()}
+    with mock.patch.object(utils, "_geocode_upstream", lambda location: places[utils.normalize_place(location)]), \
+            mock.patch.object(utils, "_persistable", lambda key: False), \
+            mock.patch.object(routing, "_provider", ReplayProvider(fixture)), \
+            mock.patch.object(utils, "get_gazetteer", lambda: None):
+        yield
+
+
+def _driver():
+    return Driver(
+        pk=1, username="benchmark", carrier="Carrier", truck_number="T-1",
+        home_terminal_address="Terminal", shipping_docs="BOL-1", driver_signature="signature",
+    )
+
+
+def _route_data(raw, driving_hours):
+    """
+    The recorded route in get_route() format, stretched to `driving_hours`.
+    """
+    formatted = utils._format_route(raw, SCENARIOS[0], [(0, 0)] * 3)
+    scale = driving_hours / formatted["duration"]
+    return dict(
+        formatted,
+        distance=formatted["distance"] * scale,
+        duration=driving_hours,
+        legs=[{"distance": leg["distance"] * scale, "duration": leg["duration"] * scale} for leg in formatted["legs"]],
+    )
+
+
+def _log_benchmark(hours):
+    def run(context):
+        utils.generate_daily_logs(context.trip, context.routes[hours])
+    return run
+
+
+for _name, _hours in TRIP_LENGTHS.items():
+    benchmark(f"generate_daily_logs[{_name}]", number=5)(_log_benchmark(_hours))
+
+
+@benchmark("format_route[recorded]", number=5)
+def format_route(context):
+    utils._format_route(context.raw_route, SCENARIOS[0], context.coordinates)
+
+
+@benchmark("format_route[recorded, summary]", number=50)
+def format_route_summary(context):
+    utils._format_route(context.raw_route, SCENARIOS[0], context.coordinates, "summary")
+
+
+@benchmark("route_steps[recorded, first page]", number=50)
+def route_steps_page(context):
+    utils.RouteSteps(context.raw_route, SCENARIOS[0])[0:50]
+
+
+@benchmark("get_route[replay, cold]", number=5)
+def get_route_cold(context):
+    utils._geocode_cache.clear()
+    utils._route_cache.clear()
+    with replay(context.fixture):
+        utils.get_route(*SCENARIOS[0])
+
+
+@benchmark("get_route[replay, warm]", number=50)
+def get_route_warm(context):
+    with replay(context.fixture):
+        utils.get_route(*SCENARIOS[0])
+
+
+@benchmark("TripSerializer[1000 trips]")
+def serialize_trips(context):
+    TripSerializer(context.trips, many=True, expand=[]).data
+
+
+@benchmark("TripSerializer[1000 trips, expand=logs]")
+def serialize_trips_with_logs(context):
+    TripSerializer(context.trips, many=True).data
+
+
+def _trips(count=1000, days=5):
+    """
+    Unsaved trips with prefetched log sheets, so serialization runs
+    without touching the database.
+    """
+    driver = _driver()
+    created = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+    trips = []
+    for pk in range(1, count + 1):
+        trip = Trip(
+            pk=pk, driver=driver, current_location="Chicago, IL",
+            pickup_location="Oklahoma City, OK", dropoff_location="Los Angeles, CA",
+            current_cycle_hours=12.5, created_at=created,
+        )
+        trip._prefetched_objects_cache = {"logs": [
+            LogSheet(pk=pk * days + day, trip=trip, day=day + 1, log_date=date(2024, 1, day + 1),
+                     driving_hours=10.5, rest_periods=10, notes="Day notes", updated_at=created)
+            for day in range(days)
+        ]}
+        trips.append(trip)
+    return trips
+
+
+def build_context():
+    fixture = load_fixture()
+    recorded = fixture["routes"][0]
+    trip = SimpleNamespace(
+        current_cycle_hours=12.5, current_location=SCENARIOS[0][0], pickup_location=SCENARIOS[0][1],
+        dropoff_location=SCENARIOS[0][2], driver=_driver(), created_at=datetime(2024, 1, 1, tzinfo=dt_timezone.utc),
+    )
+    return SimpleNamespace(
+        fixture=fixture,
+        raw_route=recorded["route"],
+        coordinates=[tuple(point) for point in recorded["coordinates"]],
+        trip=trip,
+        routes={hours: _route_data(recorded["route"], hours) for hours in TRIP_LENGTHS.values()},
+        trips=_trips(),
+    )
+
+
+def run_benchmarks(pattern=None, rounds=7):
+    """
+    Run the registered benchmarks whose name contains `pattern`. Returns
+    {name: {"median_ms", "min_ms"}} per call.
+    """
+    context = build_context()
+    results = {}
+    for name, (fn, number) in _benchmarks.items():
+        if pattern and pattern not in name:
+            continue
+        fn(context)  # Warm up imports and caches.
+        samples = []
+        for _ in range(rounds):
+            # As in timeit, keep collector pauses out of the samples.
+            gc.collect()
+            gc.disable()
+            try:
+                start = time.perf_counter()
+                for _ in range(number):
+                    fn(context)
+                samples.append((time.perf_counter() - start) * 1000 / number)
+            finally:
+                gc.enable()
+        results[name] = {"median_ms": round(statistics.median(samples), 4), "min_ms": round(min(samples), 4)}
+    return results
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not Path(path).exists():
+        return {}
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(results, handle, indent=2, sort_keys=True)
+        handle.write("\n")
+
+
+def compare(results, baseline, threshold):
+    """
+    (name, min_ms, baseline_ms, change) rows; `change` is the relative
+    difference in best-of-rounds time, which is far less noisy than the
+    median, or None when there is no baseline entry. Returns the rows and
+    the names slower than `threshold`.
+    """
+    rows, regressions = [], []
+    for name, result in results.items():
+        base = baseline.get(name, {}).get("min_ms")
+        change = (result["min_ms"] - base) / base if base else None
+        rows.append((name, result["min_ms"], base, change))
+        if change is not None and change > threshold:
+            regressions.append(name)
+    return rows, regressions
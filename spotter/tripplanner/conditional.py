@@ -0,0 +1,57 @@
+import hashlib
+import json
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+from .logsheets import DRIVER_FIELDS, HOS_SETTINGS, LOGS_FORMAT_VERSION
+
+
+def trip_etag(trip, request, prior_daily_on_duty=None):
+    """
+    Strong ETag for a trip-derived response, computed only from data the
+    view already has: the trip's inputs, its route state, the driver
+    profile, the HOS settings and the request path and query string. Log
+    responses also pass the driver's prior duty from the ledger, since
+    other trips change it. Expects `trip.driver` to be loaded.
+    """
+    driver = trip.driver
+    payload = json.dumps({
+        "trip": [
+            trip.pk, trip.current_location, trip.pickup_location, trip.dropoff_location,
+            trip.stops, trip.current_cycle_hours, trip.created_at,
+        ],
+        "route": [trip.route_status, trip.route_updated_at],
+        "driver": [getattr(driver, field) for field in DRIVER_FIELDS] if driver else None,
+        "settings": [getattr(settings, name) for name in HOS_SETTINGS],
+        "duty": prior_daily_on_duty,
+        "version": LOGS_FORMAT_VERSION,
+        "request": [request.path, sorted(request.GET.lists())],
+    }, sort_keys=True, separators=(",", ":"), cls=DjangoJSONEncoder)
+    return quote_etag(hashlib.sha256(payload.encode("utf-8")).hexdigest())
+
+
+def etag_matches(request, etag):
+    """
+    True if the request's If-None-Match lists `etag` (weak comparison, as
+    RFC 9110 specifies for If-None-Match) or is "*".
+    """
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    candidates = parse_etags(header)
+    if "*" in candidates:
+        return True
+    return any(
+        (candidate[2:] if candidate.startswith("W/") else candidate) == etag
+        for candidate in candidates
+    )
+
+
+def set_etag(response, etag):
+    """
+    Attach `etag` and ask clients to revalidate on every use.
+    """
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
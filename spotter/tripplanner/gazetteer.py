@@ -0,0 +1,179 @@
+import csv
+import math
+import os
+import re
+import threading
+from bisect import bisect_left
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from .geometry import haversine
+
+# Spatial grid cell size for reverse lookups, in degrees.
+GRID_DEGREES = 0.5
+# Reverse lookups give up after searching this many rings of cells.
+MAX_RINGS = 8
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def normalize_name(name):
+    """
+    Gazetteer key for a place name: case-folded, punctuation dropped and
+    whitespace collapsed, so "St. Louis, MO" matches "st louis mo".
+    """
+    return " ".join(_PUNCTUATION.sub(" ", name.casefold()).split())
+
+
+class Gazetteer:
+    """
+    In-memory index of known places. Normalized names (and aliases) are kept
+    in one sorted list searched with bisect for exact and prefix matches;
+    coordinates live in NumPy arrays and a coarse grid of cells answers
+    nearest-place queries.
+
+    `rows` are (name, latitude, longitude, kind, aliases) tuples; earlier
+    rows win when two places share a name.
+    """
+
+    def __init__(self, rows):
+        names, kinds, lats, lons = [], [], [], []
+        keyed = {}
+        for name, lat, lon, kind, aliases in rows:
+            index = len(names)
+            names.append(name)
+            kinds.append(kind)
+            lats.append(lat)
+            lons.append(lon)
+            for alias in (name, *aliases):
+                key = normalize_name(alias)
+                if key:
+                    keyed.setdefault(key, index)
+
+        self.names = names
+        self.kinds = kinds
+        self.lat = np.asarray(lats, dtype=np.float64)
+        self.lon = np.asarray(lons, dtype=np.float64)
+        self._keys = sorted(keyed)
+        self._key_index = [keyed[key] for key in self._keys]
+
+        self._grid = {}
+        for index, cell in enumerate(zip(*self._cells(self.lat, self.lon))):
+            self._grid.setdefault(cell, []).append(index)
+
+    @classmethod
+    def from_csv(cls, path):
+        """
+        Load a CSV with `name,latitude,longitude` columns plus optional
+        `kind` (city, truck_stop, terminal, ...) and `aliases` separated by "|".
+        """
+        rows = []
+        with open(path, newline="", encoding="utf-8") as handle:
+            for record in csv.DictReader(handle):
+                aliases = [alias for alias in (record.get("aliases") or "").split("|") if alias.strip()]
+                rows.append((
+                    record["name"].strip(),
+                    float(record["latitude"]),
+                    float(record["longitude"]),
+                    (record.get("kind") or "").strip(),
+                    aliases,
+                ))
+        return cls(rows)
+
+    def __len__(self):
+        return len(self.names)
+
+    @staticmethod
+    def _cells(lat, lon):
+        return np.floor(lat / GRID_DEGREES).astype(int).tolist(), np.floor(lon / GRID_DEGREES).astype(int).tolist()
+
+    def _place(self, index, **extra):
+        return dict(
+            name=self.names[index],
+            kind=self.kinds[index],
+            latitude=float(self.lat[index]),
+            longitude=float(self.lon[index]),
+            **extra,
+        )
+
+    def lookup(self, query):
+        """
+        (lat, lon) of the place whose name or alias matches `query`, or None.
+        """
+        key = normalize_name(query)
+        position = bisect_left(self._keys, key)
+        if position < len(self._keys) and self._keys[position] == key:
+            index = self._key_index[position]
+            return (float(self.lat[index]), float(self.lon[index]))
+        return None
+
+    def search(self, prefix, limit=10):
+        """
+        Places with a name or alias starting with `prefix`, in key order.
+        """
+        key = normalize_name(prefix)
+        if not key:
+            return []
+        results = []
+        seen = set()
+        position = bisect_left(self._keys, key)
+        while position < len(self._keys) and len(results) < limit:
+            if not self._keys[position].startswith(key):
+                break
+            index = self._key_index[position]
+            if index not in seen:
+                seen.add(index)
+                results.append(self._place(index))
+            position += 1
+        return results
+
+    def reverse(self, lat, lon):
+        """
+        The nearest place to (lat, lon) with its distance in km, or None if
+        nothing lies within MAX_RINGS grid cells.
+        """
+        cell_lat, cell_lon = math.floor(lat / GRID_DEGREES), math.floor(lon / GRID_DEGREES)
+        # Shortest side of a cell: longitude cells narrow toward the poles.
+        cell_metres = GRID_DEGREES * 111_000 * math.cos(math.radians(min(abs(lat) + GRID_DEGREES, 89)))
+        best, best_distance = None, math.inf
+        for ring in range(MAX_RINGS + 1):
+            candidates = [
+                index
+                for d_lat in range(-ring, ring + 1)
+                for d_lon in range(-ring, ring + 1)
+                if max(abs(d_lat), abs(d_lon)) == ring
+                for index in self._grid.get((cell_lat + d_lat, cell_lon + d_lon), ())
+            ]
+            if candidates:
+                distances = haversine(lat, lon, self.lat[candidates], self.lon[candidates])
+                nearest = int(np.argmin(distances))
+                if distances[nearest] < best_distance:
+                    best, best_distance = candidates[nearest], float(distances[nearest])
+            # Anything in a further ring is at least `ring` cells away.
+            if best is not None and best_distance <= ring * cell_metres:
+                break
+        if best is None:
+            return None
+        return self._place(best, distance_km=round(best_distance / 1000, 3))
+
+
+_gazetteer = None
+_gazetteer_loaded = False
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer():
+    """
+    The Gazetteer loaded from settings.GAZETTEER_PATH, or None when no
+    gazetteer is configured. The file is read once, on first use.
+    """
+    global _gazetteer, _gazetteer_loaded
+    if not _gazetteer_loaded:
+        with _gazetteer_lock:
+            if not _gazetteer_loaded:
+                path = settings.GAZETTEER_PATH
+                if path and not os.path.exists(path):
+                    raise ImproperlyConfigured(f"GAZETTEER_PATH {path} does not exist.")
+                _gazetteer = Gazetteer.from_csv(path) if path else None
+                _gazetteer_loaded = True
+    return _gazetteer
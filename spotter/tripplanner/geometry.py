@@ -0,0 +1,134 @@
+import numpy as np
+
+# Web-mercator tiles are 256 px wide; one pixel at zoom z spans roughly
+# 360 / (256 * 2**z) degrees of longitude at the equator.
+TILE_SIZE = 256
+MAX_ZOOM = 22
+
+# Mean earth radius in metres.
+EARTH_RADIUS = 6371008.8
+METRES_PER_MILE = 1609.344
+
+
+def zoom_tolerance(zoom):
+    """
+    Simplification tolerance in degrees that keeps error under one pixel
+    at the given map zoom level.
+    """
+    return 360.0 / (TILE_SIZE * 2 ** zoom)
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in metres between points given in degrees;
+    accepts scalars or NumPy arrays.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class RouteIndex:
+    """
+    Cumulative-distance index over a [[lon, lat], ...] route line, built
+    once per route. locate() maps distances along the route to points by
+    binary search (np.searchsorted) and linear interpolation. When
+    `total_miles` is given, distances are rescaled so the line's own length
+    matches the router's reported distance.
+    """
+
+    def __init__(self, coordinates, total_miles=None):
+        points = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+        self.lon, self.lat = points[:, 0], points[:, 1]
+        steps = haversine(self.lat[:-1], self.lon[:-1], self.lat[1:], self.lon[1:]) / METRES_PER_MILE
+        self.cumulative = np.concatenate(([0.0], np.cumsum(steps)))
+        length = self.cumulative[-1]
+        self.scale = total_miles / length if total_miles and length > 0 else 1.0
+
+    def locate(self, miles):
+        """
+        (lat, lon) rows for each distance in `miles` along the route,
+        clamped to its ends.
+        """
+        if len(self.cumulative) == 1:
+            return np.tile([self.lat[0], self.lon[0]], (len(miles), 1))
+        position = np.clip(np.asarray(miles, dtype=float) / self.scale, 0.0, self.cumulative[-1])
+        segment = np.clip(np.searchsorted(self.cumulative, position, side="right") - 1, 0, len(self.cumulative) - 2)
+        start, end = self.cumulative[segment], self.cumulative[segment + 1]
+        span = end - start
+        fraction = np.divide(position - start, span, out=np.zeros_like(span), where=span > 0)
+        lat = self.lat[segment] + fraction * (self.lat[segment + 1] - self.lat[segment])
+        lon = self.lon[segment] + fraction * (self.lon[segment + 1] - self.lon[segment])
+        return np.column_stack((lat, lon))
+
+
+def simplify(coordinates, tolerance):
+    """
+    Douglas-Peucker simplification of a [[lon, lat], ...] line. Distances
+    from each span's interior points to its chord are computed in one NumPy
+    pass per span instead of point by point. Returns a list of pairs that
+    always keeps the first and last point.
+    """
+    points = np.asarray(coordinates, dtype=float)
+    count = len(points)
+    if count < 3 or tolerance <= 0:
+        return points.tolist()
+
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        origin = points[start]
+        chord = points[end] - origin
+        offsets = points[start + 1:end] - origin
+        chord_length = np.hypot(chord[0], chord[1])
+        if chord_length == 0:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distances = np.abs(chord[0] * offsets[:, 1] - chord[1] * offsets[:, 0]) / chord_length
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = start + 1 + index
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return points[keep].tolist()
+
+
+def encode_polyline(coordinates, precision=5):
+    """
+    Encode a [[lon, lat], ...] line in Google's encoded polyline format
+    (which orders each pair as lat, lon).
+    """
+    if not len(coordinates):
+        return ""
+    scaled = np.round(np.asarray(coordinates, dtype=float)[:, ::-1] * 10 ** precision).astype(np.int64)
+    deltas = np.diff(scaled, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    # Zig-zag encode signed deltas so small magnitudes stay short.
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+
+    chunks = []
+    for value in values.tolist():
+        while value >= 0x20:
+            chunks.append(chr((0x20 | (value & 0x1F)) + 63))
+            value >>= 5
+        chunks.append(chr(value + 63))
+    return "".join(chunks)
+
+
+def shape_geometry(geometry, tolerance=None, encoding="geojson"):
+    """
+    Apply optional simplification and encoding to a GeoJSON LineString
+    without mutating the (possibly cached) input.
+    """
+    if not geometry or geometry.get("type") != "LineString":
+        return geometry
+    coordinates = geometry["coordinates"]
+    if tolerance:
+        coordinates = simplify(coordinates, tolerance)
+    if encoding == "polyline":
+        return encode_polyline(coordinates)
+    return {"type": "LineString", "coordinates": coordinates}
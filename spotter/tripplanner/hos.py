@@ -0,0 +1,235 @@
+import math
+import numpy as np
+
+# Duty statuses, in the row order used by the log grid.
+OFF_DUTY, SLEEPER_BERTH, DRIVING, BREAK, ON_DUTY = range(5)
+STATUS_COUNT = 5
+ON_DUTY_STATUSES = (DRIVING, ON_DUTY)
+
+MINUTES_PER_DAY = 24 * 60
+
+# FMCSA property-carrying limits, in minutes.
+MAX_DRIVING = 11 * 60
+DUTY_WINDOW = 14 * 60
+DRIVING_BEFORE_BREAK = 8 * 60
+BREAK_LENGTH = 30
+DAILY_RESET = 10 * 60
+CYCLE_LIMIT = 70 * 60
+CYCLE_DAYS = 8
+RESTART_LENGTH = 34 * 60
+SHORT_CYCLE_LIMIT = 60 * 60
+SHORT_CYCLE_DAYS = 7
+
+
+class DutySchedule:
+    """
+    The planned duty statuses for a trip. `segments` are
+    (start_minute, end_minute, status) runs and `events` the stops placed
+    along the way, both in minutes from midnight of the trip's first day.
+    `timeline` is a (days, 1440) uint8 array with one status per minute.
+    """
+
+    def __init__(self, segments, events, day_miles, prior_daily_on_duty, restarts):
+        self.segments = segments
+        self.events = events
+        end = segments[-1][1] if segments else 0
+        self.days = max(1, math.ceil(end / MINUTES_PER_DAY))
+
+        flat = np.zeros(self.days * MINUTES_PER_DAY, dtype=np.uint8)
+        for start, stop, status in segments:
+            flat[start:stop] = status
+        self.timeline = flat.reshape(self.days, MINUTES_PER_DAY)
+
+        # Minutes per status for every day, from a single bincount.
+        offsets = (np.arange(self.days, dtype=np.int64) * STATUS_COUNT)[:, None]
+        self.status_minutes = np.bincount(
+            (self.timeline + offsets).ravel(), minlength=self.days * STATUS_COUNT
+        ).reshape(self.days, STATUS_COUNT)
+
+        self.day_miles = np.zeros(self.days)
+        for day, miles in day_miles.items():
+            self.day_miles[min(day, self.days - 1)] += miles
+
+        on_duty = np.isin(flat, ON_DUTY_STATUSES)
+        self._on_duty_cumsum = np.concatenate(([0], np.cumsum(on_duty, dtype=np.int64)))
+        self._prior = list(prior_daily_on_duty)
+        self._restarts = restarts
+
+    def on_duty_in_window(self, day, window_days):
+        """
+        On-duty minutes in the `window_days` days ending with `day`,
+        ignoring anything before the latest 34-hour restart.
+        """
+        day_end = (day + 1) * MINUTES_PER_DAY
+        low = (day + 1 - window_days) * MINUTES_PER_DAY
+        for restart_end in self._restarts:
+            if restart_end <= day_end:
+                low = max(low, restart_end)
+        used = int(self._on_duty_cumsum[day_end] - self._on_duty_cumsum[max(low, 0)])
+        if low < 0:
+            # Prior days are listed oldest first, ending the day before the trip.
+            first = low // MINUTES_PER_DAY
+            used += sum(self._prior[max(0, len(self._prior) + first):])
+        return used
+
+    def day_segments(self):
+        """
+        Per-day lists of (start_minute, end_minute, status) runs, in minutes
+        from each day's midnight. Runs crossing midnight are split.
+        """
+        days = [[] for _ in range(self.days)]
+        for start, end, status in self.segments:
+            cursor = start
+            while cursor < end:
+                day = cursor // MINUTES_PER_DAY
+                boundary = min(end, (day + 1) * MINUTES_PER_DAY)
+                offset = day * MINUTES_PER_DAY
+                days[day].append((cursor - offset, boundary - offset, status))
+                cursor = boundary
+        return days
+
+    def cycle_index(self, day):
+        day_end = (day + 1) * MINUTES_PER_DAY
+        return 1 + sum(1 for restart_end in self._restarts if restart_end <= day_end)
+
+
+class _Planner:
+    """
+    Event-driven simulation: each step advances the clock by whole runs of
+    one status, so cost grows with the number of stops, not with minutes.
+    """
+
+    def __init__(self, prior_daily_on_duty, fuel_interval, fuel_minutes):
+        self.now = 0
+        self.segments = []
+        self.events = []
+        self.day_miles = {}
+        self.restarts = []
+        self.miles = 0.0
+        self.fuel_interval = fuel_interval
+        self.fuel_minutes = fuel_minutes
+        self.next_fuel = fuel_interval
+        self.prior = list(prior_daily_on_duty)
+        # On-duty minutes per day counted toward the current 70-hour cycle.
+        self.cycle = {
+            -(offset + 1): minutes for offset, minutes in enumerate(reversed(self.prior))
+        }
+        self._reset_shift()
+
+    def _reset_shift(self):
+        self.window_start = None
+        self.driven_in_shift = 0
+        self.driven_since_break = 0
+
+    def cycle_available(self):
+        today = self.now // MINUTES_PER_DAY
+        used = sum(self.cycle.get(day, 0) for day in range(today - CYCLE_DAYS + 1, today + 1))
+        return CYCLE_LIMIT - used
+
+    def window_left(self):
+        if self.window_start is None:
+            return DUTY_WINDOW
+        return self.window_start + DUTY_WINDOW - self.now
+
+    def add(self, status, minutes, speed=0.0):
+        if minutes <= 0:
+            return
+        start, end = self.now, self.now + minutes
+        if self.segments and self.segments[-1][2] == status and self.segments[-1][1] == start:
+            self.segments[-1] = (self.segments[-1][0], end, status)
+        else:
+            self.segments.append((start, end, status))
+
+        if status in ON_DUTY_STATUSES:
+            if self.window_start is None:
+                self.window_start = start
+            cursor = start
+            while cursor < end:
+                day = cursor // MINUTES_PER_DAY
+                boundary = min(end, (day + 1) * MINUTES_PER_DAY)
+                self.cycle[day] = self.cycle.get(day, 0) + boundary - cursor
+                if speed:
+                    self.day_miles[day] = self.day_miles.get(day, 0.0) + (boundary - cursor) * speed
+                cursor = boundary
+        self.now = end
+
+    def event(self, kind, minutes, status):
+        start = self.now
+        self.add(status, minutes)
+        self.events.append({"type": kind, "start": start, "end": self.now, "mile": self.miles})
+
+    def work(self, kind, minutes):
+        self.event(kind, minutes, ON_DUTY)
+        # 30 consecutive minutes not driving satisfies the break requirement.
+        if minutes >= BREAK_LENGTH:
+            self.driven_since_break = 0
+
+    def drive(self, minutes, miles):
+        speed = miles / minutes if minutes else 0.0
+        remaining = minutes
+        while remaining > 0:
+            cycle_left = self.cycle_available()
+            if cycle_left <= 0:
+                self.event("restart", RESTART_LENGTH, OFF_DUTY)
+                self.restarts.append(self.now)
+                self.cycle.clear()
+                self._reset_shift()
+                continue
+            if self.driven_in_shift >= MAX_DRIVING or self.window_left() <= 0:
+                self.event("rest", DAILY_RESET, SLEEPER_BERTH)
+                self._reset_shift()
+                continue
+            if self.driven_since_break >= DRIVING_BEFORE_BREAK:
+                self.event("break", BREAK_LENGTH, BREAK)
+                self.driven_since_break = 0
+                continue
+
+            until_fuel = remaining
+            if speed and self.fuel_interval:
+                until_fuel = math.ceil((self.next_fuel - self.miles) / speed)
+                if until_fuel <= 0:
+                    self.work("fuel", self.fuel_minutes)
+                    self.next_fuel += self.fuel_interval
+                    continue
+
+            chunk = min(
+                remaining,
+                MAX_DRIVING - self.driven_in_shift,
+                self.window_left(),
+                DRIVING_BEFORE_BREAK - self.driven_since_break,
+                cycle_left,
+                until_fuel,
+            )
+            self.add(DRIVING, chunk, speed)
+            self.miles += chunk * speed
+            self.driven_in_shift += chunk
+            self.driven_since_break += chunk
+            remaining -= chunk
+
+
+def plan_trip(legs, stops, start_minute=6 * 60, prior_daily_on_duty=(),
+              fuel_interval=1000, fuel_minutes=30):
+    """
+    Plan a trip under the 11-hour driving, 14-hour window, 30-minute break,
+    10-hour reset and 70-hour/8-day rules at minute resolution.
+
+    `legs` is a sequence of (driving_minutes, miles); after leg i the
+    driver performs on-duty stop `stops[i]`, a (kind, minutes) pair such as
+    ("pickup", 60). `prior_daily_on_duty` lists on-duty minutes for the days
+    before the trip, oldest first, and feeds the rolling 70-hour cycle.
+    """
+    planner = _Planner(prior_daily_on_duty, fuel_interval, fuel_minutes)
+    planner.add(OFF_DUTY, start_minute)
+    for index, (minutes, miles) in enumerate(legs):
+        planner.drive(int(round(minutes)), miles)
+        if index < len(stops):
+            kind, stop_minutes = stops[index]
+            planner.work(kind, stop_minutes)
+
+    # Close the final day off duty.
+    day_end = math.ceil(planner.now / MINUTES_PER_DAY) * MINUTES_PER_DAY
+    planner.add(OFF_DUTY, max(day_end, MINUTES_PER_DAY) - planner.now)
+    return DutySchedule(
+        planner.segments, planner.events, planner.day_miles,
+        planner.prior[-CYCLE_DAYS:], planner.restarts,
+    )
@@ -0,0 +1,191 @@
+"""
+Bulk trip import from CSV or NDJSON uploads.
+
+Uploads are read line by line from the request stream, so memory use
+depends on TRIP_IMPORT_CHUNK_SIZE rather than the upload size. Rows are
+validated with TripSerializer and inserted with bulk_create one chunk at a
+time.
+"""
+import csv
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from rest_framework import serializers
+from .jobs import enqueue_new_route_jobs
+from .models import RouteStatus, Trip
+from .serializers import TripSerializer
+from .utils import geocode, geocode_many
+
+logger = logging.getLogger(__name__)
+
+# Trip fields an import row may set; the driver is always the uploader.
+IMPORT_FIELDS = (
+    "current_location", "pickup_location", "dropoff_location", "stops", "optimize_stops", "current_cycle_hours",
+)
+
+# Distinct locations per geocode_many() call when warming the geocode caches.
+WARMUP_CHUNK_SIZE = 100
+
+# One background thread, so warm-ups queue behind each other rather than
+# competing with request traffic for the upstream rate limits.
+_warmup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="geocode-warmup")
+
+
+class TripImportError(ValueError):
+    """
+    The upload cannot be read any further, e.g. a CSV without a header or
+    a line that is not UTF-8. `line` is the offending line, if known.
+    """
+
+    def __init__(self, message, line=None):
+        super().__init__(message)
+        self.line = line
+
+
+def _text_lines(stream):
+    for number, line in enumerate(iter(stream.readline, b""), start=1):
+        try:
+            text = line.decode("utf-8")
+        except UnicodeDecodeError:
+            raise TripImportError(f"Line {number} is not valid UTF-8.", line=number)
+        yield text.lstrip("\ufeff") if number == 1 else text
+
+
+def csv_rows(stream):
+    """
+    (line, data, errors) for each record of a CSV upload with a header row
+    naming IMPORT_FIELDS columns. Empty cells are left out so field defaults
+    apply; `stops` holds a JSON list.
+    """
+    reader = csv.DictReader(_text_lines(stream))
+    if not reader.fieldnames:
+        raise TripImportError("The CSV upload has no header row.")
+    for row in reader:
+        errors = {}
+        if None in row:
+            errors["non_field_errors"] = ["More values than header columns."]
+        data = {name: value for name, value in row.items() if name is not None and value not in (None, "")}
+        if "stops" in data:
+            try:
+                data["stops"] = json.loads(data["stops"])
+            except ValueError:
+                errors["stops"] = ["Expected a JSON list of stops."]
+        yield reader.line_num, data, errors or None
+
+
+def ndjson_rows(stream):
+    """
+    (line, data, errors) for each non-blank line of an NDJSON upload, one
+    trip object per line.
+    """
+    for number, text in enumerate(_text_lines(stream), start=1):
+        if not text.strip():
+            continue
+        try:
+            data = json.loads(text)
+        except ValueError:
+            yield number, None, {"non_field_errors": ["Invalid JSON."]}
+            continue
+        if not isinstance(data, dict):
+            yield number, None, {"non_field_errors": ["Expected a JSON object."]}
+            continue
+        yield number, data, None
+
+
+# Upload content types and their row parsers.
+IMPORT_FORMATS = {
+    "text/csv": csv_rows,
+    "application/x-ndjson": ndjson_rows,
+    "application/jsonl": ndjson_rows,
+}
+
+
+def _import_chunk(chunk, serializer, driver, report):
+    trips = []
+    for line, data, errors in chunk:
+        if errors is None:
+            try:
+                attrs = serializer.run_validation(data)
+            except serializers.ValidationError as e:
+                errors = e.detail
+        if errors:
+            report["errors"].append({"line": line, "errors": errors})
+        else:
+            trips.append(Trip(driver=driver, route_status=RouteStatus.PENDING, **attrs))
+    if trips:
+        with transaction.atomic():
+            Trip.objects.bulk_create(trips)
+            enqueue_new_route_jobs(trips)
+        report["created"] += len(trips)
+        report["trip_ids"] += [trip.pk for trip in trips]
+    return trips
+
+
+def import_trips(rows, driver, warm_geocode=False):
+    """
+    Create trips for `driver` from csv_rows()/ndjson_rows() output,
+    TRIP_IMPORT_CHUNK_SIZE rows at a time. Each chunk's valid rows are
+    inserted with one bulk_create, with route jobs as for single creates;
+    invalid rows are reported by line and do not stop the import. Reading
+    stops at an unreadable line or after TRIP_IMPORT_MAX_ROWS rows, with
+    the reason in "detail" (and an unreadable line also among the errors);
+    the rows before it are still imported. With `warm_geocode`, the distinct locations of
+    the created trips are geocoded in the background.
+    """
+    serializer = TripSerializer(fields=IMPORT_FIELDS, expand=[])
+    report = {"rows": 0, "created": 0, "trip_ids": [], "errors": []}
+    locations = {}
+    chunk = []
+    rows = iter(rows)
+    while True:
+        try:
+            row = next(rows, None)
+        except TripImportError as e:
+            report["detail"] = str(e)
+            if e.line is not None:
+                report["errors"].append({"line": e.line, "errors": {"non_field_errors": [str(e)]}})
+            row = None
+        if row is not None and report["rows"] >= settings.TRIP_IMPORT_MAX_ROWS:
+            report["detail"] = f"Stopped after {settings.TRIP_IMPORT_MAX_ROWS} rows."
+            row = None
+        if row is not None:
+            report["rows"] += 1
+            chunk.append(row)
+        if chunk and (row is None or len(chunk) >= settings.TRIP_IMPORT_CHUNK_SIZE):
+            for trip in _import_chunk(chunk, serializer, driver, report):
+                if warm_geocode:
+                    locations.update(dict.fromkeys(trip.route_places))
+            chunk = []
+        if row is None:
+            break
+
+    if locations:
+        _warmup_executor.submit(warm_geocodes, list(locations))
+        report["geocode_queued"] = len(locations)
+    return report
+
+
+def warm_geocodes(locations):
+    """
+    Resolve `locations` into the geocode caches, WARMUP_CHUNK_SIZE at a
+    time. Places that fail are logged and skipped.
+    """
+    failed = 0
+    try:
+        for start in range(0, len(locations), WARMUP_CHUNK_SIZE):
+            chunk = locations[start:start + WARMUP_CHUNK_SIZE]
+            try:
+                geocode_many(chunk)
+            except Exception:
+                # Resolved places are cached now, so retrying one by one is cheap.
+                for location in chunk:
+                    try:
+                        geocode(location)
+                    except Exception:
+                        failed += 1
+    finally:
+        close_old_connections()
+    if failed:
+        logger.warning("Geocode warm-up: %d of %d locations failed", failed, len(locations))
@@ -0,0 +1,170 @@
+import logging
+import queue
+import threading
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+from .logsheets import trip_daily_logs
+from .matrix import optimize_stops
+from .models import RouteJob, RouteStatus, Trip
+from .utils import get_route, get_route_steps
+
+logger = logging.getLogger(__name__)
+
+# Job ids waiting for the in-process worker threads of this process.
+_queue = queue.Queue()
+_workers = []
+_workers_lock = threading.Lock()
+
+
+def enqueue_route_job(trip):
+    """
+    Record a RouteJob for `trip`, supersede any older pending jobs for it,
+    mark the trip's route pending and hand the job to the local workers
+    once the surrounding transaction commits.
+    """
+    RouteJob.objects.filter(trip=trip, status=RouteJob.Status.PENDING).update(
+        status=RouteJob.Status.SUPERSEDED, finished_at=timezone.now()
+    )
+    job = RouteJob.objects.create(trip=trip)
+    Trip.objects.filter(pk=trip.pk).update(route_status=RouteStatus.PENDING, route_error="")
+    trip.route_status = RouteStatus.PENDING
+    trip.route_error = ""
+    transaction.on_commit(lambda: _submit(job.pk))
+    return job
+
+
+def enqueue_new_route_jobs(trips):
+    """
+    enqueue_route_job() for many trips just created with a pending route
+    status: their RouteJobs are inserted with one bulk_create and handed to
+    the local workers once the surrounding transaction commits.
+    """
+    jobs = RouteJob.objects.bulk_create([RouteJob(trip=trip) for trip in trips])
+
+    def submit():
+        for job in jobs:
+            _submit(job.pk)
+
+    transaction.on_commit(submit)
+    return jobs
+
+
+def _submit(job_id):
+    if settings.ROUTE_WORKER_THREADS <= 0:
+        # No in-process workers: process_route_jobs drains the table instead.
+        return
+    _ensure_workers()
+    _queue.put(job_id)
+
+
+def _ensure_workers():
+    with _workers_lock:
+        while len(_workers) < settings.ROUTE_WORKER_THREADS:
+            worker = threading.Thread(
+                target=_work, name=f"route-worker-{len(_workers)}", daemon=True
+            )
+            worker.start()
+            _workers.append(worker)
+
+
+def _work():
+    while True:
+        job_id = _queue.get()
+        try:
+            run_route_job(job_id)
+        except Exception:
+            logger.exception("Route job %s crashed", job_id)
+        finally:
+            close_old_connections()
+            _queue.task_done()
+
+
+def run_route_job(job_id):
+    """
+    Claim and run one pending job. Returns False if the job was already
+    claimed elsewhere or superseded by a newer edit of the trip.
+    """
+    claimed = RouteJob.objects.filter(pk=job_id, status=RouteJob.Status.PENDING).update(
+        status=RouteJob.Status.RUNNING, started_at=timezone.now(), attempts=F("attempts") + 1
+    )
+    if not claimed:
+        return False
+
+    job = RouteJob.objects.select_related("trip__driver").get(pk=job_id)
+    trip = job.trip
+    Trip.objects.filter(pk=trip.pk).update(route_status=RouteStatus.RUNNING)
+    # Reordered stops are only written with the route, if this job is
+    # still the trip's latest by then.
+    reordered = {}
+    try:
+        if trip.optimize_stops and len(trip.stops) > 1:
+            trip.stops = optimize_stops(trip)
+            reordered["stops"] = trip.stops
+        route_data = get_route(*trip.route_places, cache_tag=trip.pk)
+        # Served from the same cached raw route as route_data.
+        steps = get_route_steps(*trip.route_places, cache_tag=trip.pk)
+    except Exception as e:
+        _finish(job, RouteJob.Status.FAILED, error=str(e))
+        _latest_trip(job).update(route_status=RouteStatus.FAILED, route_error=str(e))
+        return True
+
+    updated = _latest_trip(job).update(
+        **reordered,
+        route_status=RouteStatus.READY,
+        route_distance=route_data["distance"],
+        route_duration=route_data["duration"],
+        route_geometry=route_data["geometry"],
+        route_instructions=route_data["instructions"],
+        route_legs=route_data["legs"],
+        route_steps=steps.leg_steps(),
+        route_map_url=route_data["map_url"],
+        route_error="",
+        route_updated_at=timezone.now(),
+    )
+    if not updated:
+        # The trip was edited while we were routing; a newer job owns it.
+        _finish(job, RouteJob.Status.SUPERSEDED)
+        return True
+    _finish(job, RouteJob.Status.DONE)
+    try:
+        # Refresh the stored logs now; unchanged days are left untouched.
+        trip_daily_logs(trip, route_data)
+    except Exception:
+        logger.exception("Log generation for trip %s failed", trip.pk)
+    return True
+
+
+def run_pending_jobs(limit=None):
+    """
+    Run pending jobs from the table in FIFO order; returns how many ran.
+    """
+    pending = RouteJob.objects.filter(status=RouteJob.Status.PENDING).order_by("created_at", "pk")
+    job_ids = list(pending.values_list("pk", flat=True)[:limit])
+    return sum(1 for job_id in job_ids if run_route_job(job_id))
+
+
+def requeue_stale_jobs(older_than):
+    """
+    Return jobs stuck in 'running' since before `older_than` (e.g. after a
+    worker process died) to the pending state.
+    """
+    return RouteJob.objects.filter(
+        status=RouteJob.Status.RUNNING, started_at__lt=older_than
+    ).update(status=RouteJob.Status.PENDING)
+
+
+def _latest_trip(job):
+    """
+    The job's trip as a queryset that is empty once a newer job exists, so
+    an update through it only applies while `job` is still the latest.
+    """
+    newer = RouteJob.objects.filter(trip_id=OuterRef("pk"), pk__gt=job.pk)
+    return Trip.objects.filter(pk=job.trip_id).exclude(Exists(newer))
+
+
+def _finish(job, status, error=""):
+    RouteJob.objects.filter(pk=job.pk).update(
+        status=status, error=error, finished_at=timezone.now()
+    )
@@ -0,0 +1,249 @@
+"""
+Per-driver duty-hours ledger for the 70-hour/8-day rule.
+
+DutyDay rows hold each driver's daily on-duty totals over all their trips,
+with running totals, the off-duty streak and the start of the current
+cycle. Questions about any date (hours available, whether a 34-hour
+restart is complete) read at most two rows and never rescan history.
+When LogSheet rows change, the ledger is recomputed from the earliest
+changed day onwards.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from . import hos
+from .models import DutyDay, LogSheet, Trip
+
+ONE_DAY = timedelta(days=1)
+
+# Columns update_duty_days() recomputes.
+LEDGER_FIELDS = (
+    "on_duty_minutes", "first_on_duty_minute", "last_on_duty_minute", "cumulative_minutes",
+    "off_duty_streak", "cycle_start", "cycle_base_minutes",
+)
+
+
+def day_totals(segments):
+    """
+    (on-duty minutes, first on-duty minute, last on-duty minute) of one
+    day's [start, end, status] segments; the bounds are None when the day
+    has no on-duty time.
+    """
+    minutes, first, last = 0, None, None
+    for start, end, status in segments:
+        if status in hos.ON_DUTY_STATUSES and end > start:
+            minutes += end - start
+            first = start if first is None else min(first, start)
+            last = end if last is None else max(last, end)
+    return minutes, first, last
+
+
+def _logged_totals(driver_id, dates):
+    totals = {day: (0, None, None) for day in dates}
+    sheets = LogSheet.objects.filter(trip__driver_id=driver_id, log_date__in=dates)
+    for log_date, segments in sheets.values_list("log_date", "data__segments"):
+        minutes, first, last = day_totals(segments or ())
+        total, low, high = totals[log_date]
+        if first is not None:
+            low = first if low is None else min(low, first)
+            high = last if high is None else max(high, last)
+        totals[log_date] = (total + minutes, low, high)
+    return totals
+
+
+def _advance(previous, row):
+    """
+    Fill `row`'s running fields from the day before (None for a driver's
+    first day, whose earlier history is unknown and never a restart).
+    """
+    cumulative = previous.cumulative_minutes if previous else 0
+    streak = previous.off_duty_streak if previous else 0
+    restarted = (
+        row.first_on_duty_minute is not None
+        and streak + row.first_on_duty_minute >= hos.RESTART_LENGTH
+    )
+    if previous is None or restarted:
+        row.cycle_start, row.cycle_base_minutes = row.date, cumulative
+    else:
+        row.cycle_start, row.cycle_base_minutes = previous.cycle_start, previous.cycle_base_minutes
+    row.cumulative_minutes = cumulative + row.on_duty_minutes
+    if row.first_on_duty_minute is None:
+        row.off_duty_streak = streak + hos.MINUTES_PER_DAY
+    else:
+        row.off_duty_streak = hos.MINUTES_PER_DAY - row.last_on_duty_minute
+
+
+def update_duty_days(driver_id, dates):
+    """
+    Re-total `driver_id`'s ledger on `dates` from their LogSheet rows and
+    recompute the running fields from the earliest of them onwards, filling
+    any missing days in between. Only rows that change are written.
+    """
+    dates = sorted(set(dates))
+    if not dates:
+        return
+    with transaction.atomic():
+        # Serialize ledger updates for the same driver.
+        list(get_user_model().objects.select_for_update().filter(pk=driver_id).values_list("pk"))
+        totals = _logged_totals(driver_id, dates)
+        previous = DutyDay.objects.filter(driver_id=driver_id, date__lt=dates[0]).order_by("-date").first()
+        rows = {row.date: row for row in DutyDay.objects.filter(driver_id=driver_id, date__gte=dates[0])}
+
+        day = previous.date + ONE_DAY if previous else dates[0]
+        end = max(dates[-1], max(rows, default=dates[-1]))
+        created, updated = [], []
+        while day <= end:
+            row = rows.get(day)
+            if row is None:
+                row = DutyDay(driver_id=driver_id, date=day)
+                created.append(row)
+                before = None
+            else:
+                before = [getattr(row, field) for field in LEDGER_FIELDS]
+            if day in totals:
+                row.on_duty_minutes, row.first_on_duty_minute, row.last_on_duty_minute = totals[day]
+            _advance(previous, row)
+            if before is not None and before != [getattr(row, field) for field in LEDGER_FIELDS]:
+                updated.append(row)
+            previous = row
+            day += ONE_DAY
+
+        if created:
+            DutyDay.objects.bulk_create(created)
+        if updated:
+            DutyDay.objects.bulk_update(updated, LEDGER_FIELDS)
+
+
+def rebuild_duty_days(driver_id):
+    """
+    Recompute `driver_id`'s whole ledger from their LogSheet rows.
+    """
+    dates = set(LogSheet.objects.filter(trip__driver_id=driver_id).values_list("log_date", flat=True))
+    dates.update(DutyDay.objects.filter(driver_id=driver_id).values_list("date", flat=True))
+    update_duty_days(driver_id, dates)
+
+
+def _as_of(row, day):
+    """
+    `row` carried forward to `day`: days after the last row are off duty.
+    """
+    if row is None or row.date == day:
+        return row
+    return DutyDay(
+        driver_id=row.driver_id, date=day,
+        cumulative_minutes=row.cumulative_minutes,
+        off_duty_streak=row.off_duty_streak + (day - row.date).days * hos.MINUTES_PER_DAY,
+        cycle_start=row.cycle_start, cycle_base_minutes=row.cycle_base_minutes,
+    )
+
+
+def duty_day(driver_id, day):
+    """
+    The ledger state at the end of `day`, or None before the driver's
+    first logged day.
+    """
+    row = DutyDay.objects.filter(driver_id=driver_id, date__lte=day).order_by("-date").first()
+    return _as_of(row, day)
+
+
+def restart_completed(driver_id, day):
+    """
+    True if the driver has been off duty for at least 34 consecutive hours
+    by the end of `day`, so their next on-duty time starts a new cycle.
+    """
+    state = duty_day(driver_id, day)
+    return state is not None and state.off_duty_streak >= hos.RESTART_LENGTH
+
+
+def cycle_used_minutes(driver_id, day):
+    """
+    On-duty minutes counted toward the 70-hour limit at the end of `day`:
+    the eight days ending with it, back to the latest 34-hour restart.
+    """
+    state = duty_day(driver_id, day)
+    if state is None or state.off_duty_streak >= hos.RESTART_LENGTH:
+        return 0
+    window_start = duty_day(driver_id, day - timedelta(days=hos.CYCLE_DAYS))
+    before = max(window_start.cumulative_minutes if window_start else 0, state.cycle_base_minutes)
+    return state.cumulative_minutes - before
+
+
+def available_hours(driver_id, day):
+    """
+    Hours left under the 70-hour/8-day limit at the end of `day`.
+    """
+    return max(0, hos.CYCLE_LIMIT - cycle_used_minutes(driver_id, day)) / 60
+
+
+def prior_on_duty_many(trips):
+    """
+    {trip pk: on-duty minutes on each of the CYCLE_DAYS - 1 days before the
+    trip, oldest first}, for plan_trip()'s `prior_daily_on_duty`. Days
+    before the latest 34-hour restart count as zero, and so does all of
+    it when the driver is off long enough for a restart by the time the
+    trip starts. Trip.current_cycle_hours is a floor on the hours already
+    used: any excess over the ledger goes on the day before the trip,
+    which is all there is for drivers without logged history. One query
+    per driver.
+    """
+    window = hos.CYCLE_DAYS - 1
+    start_minute = settings.DRIVING_DAY_START_HOUR * 60
+    starts = {trip.pk: timezone.localdate(trip.created_at) for trip in trips}
+
+    by_driver = {}
+    for trip in trips:
+        if trip.driver_id is not None:
+            by_driver.setdefault(trip.driver_id, []).append(trip.pk)
+    rows = {}
+    for driver_id, trip_ids in by_driver.items():
+        first = min(starts[pk] for pk in trip_ids) - timedelta(days=window)
+        last = max(starts[pk] for pk in trip_ids) - ONE_DAY
+        for row in DutyDay.objects.filter(driver_id=driver_id, date__gte=first, date__lte=last):
+            rows[(driver_id, row.date)] = row
+
+    priors = {}
+    for trip in trips:
+        start = starts[trip.pk]
+        days = [rows.get((trip.driver_id, start - timedelta(days=window - index))) for index in range(window)]
+        prior = [0] * window
+        latest = next((row for row in reversed(days) if row is not None), None)
+        if latest is not None:
+            state = _as_of(latest, start - ONE_DAY)
+            if state.off_duty_streak + start_minute < hos.RESTART_LENGTH:
+                prior = [
+                    row.on_duty_minutes if row is not None and row.date >= state.cycle_start else 0
+                    for row in days
+                ]
+        excess = int(round((trip.current_cycle_hours or 0) * 60)) - sum(prior)
+        if excess > 0:
+            prior[-1] += excess
+        priors[trip.pk] = prior
+    return priors
+
+
+def prior_on_duty(trip):
+    """
+    prior_on_duty_many() for one trip.
+    """
+    return prior_on_duty_many([trip])[trip.pk]
+
+
+def capture_trip_days(sender, instance, origin=None, **kwargs):
+    """
+    pre_delete receiver noting a trip's logged days, so the ledger can be
+    updated once its LogSheet rows are gone. Deleting the driver removes
+    their ledger anyway.
+    """
+    if instance.driver_id is not None and (origin is instance or getattr(origin, "model", None) is Trip):
+        instance._duty_dates = list(instance.logs.values_list("log_date", flat=True))
+
+
+def release_trip_days(sender, instance, **kwargs):
+    """
+    post_delete receiver updating the ledger for a deleted trip's days.
+    """
+    dates = getattr(instance, "_duty_dates", None)
+    if dates:
+        update_duty_days(instance.driver_id, dates)
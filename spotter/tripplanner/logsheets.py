@@ -0,0 +1,150 @@
+import hashlib
+import json
+import numpy as np
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from .ledger import prior_on_duty, update_duty_days
+from .metrics import span
+from .models import LogSheet, Trip
+from .utils import LOG_ROUTE_FIELDS, generate_daily_logs
+
+# Driver profile fields copied onto every log day.
+DRIVER_FIELDS = (
+    "username", "carrier", "truck_number", "home_terminal_address",
+    "shipping_docs", "driver_signature",
+)
+
+# Settings that change the generated schedule.
+HOS_SETTINGS = (
+    "DRIVING_DAY_START_HOUR", "PICKUP_MINUTES", "DROPOFF_MINUTES",
+    "FUEL_STOP_INTERVAL_MILES", "FUEL_STOP_MINUTES",
+)
+
+# Bumped when the stored day payload changes shape.
+LOGS_FORMAT_VERSION = 3
+
+# Columns rewritten when a day's content changes.
+UPDATE_FIELDS = (
+    "log_date", "driving_hours", "rest_periods", "notes", "data", "content_hash", "updated_at",
+)
+
+
+def _digest(value):
+    payload = json.dumps(value, sort_keys=True, separators=(",", ":"), cls=DjangoJSONEncoder)
+    return payload, hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _route_digest(route_data):
+    """
+    Route inputs for the fingerprint. Geometry can hold tens of thousands
+    of points, so it is hashed from its packed array instead of as JSON.
+    """
+    digest = []
+    for field in LOG_ROUTE_FIELDS:
+        value = route_data.get(field)
+        if field == "geometry" and isinstance(value, dict):
+            coordinates = np.asarray(value.get("coordinates") or [], dtype=np.float64)
+            value = hashlib.sha256(coordinates.tobytes()).hexdigest()
+        digest.append(value)
+    return digest
+
+
+def logs_fingerprint(trip, route_data, prior_daily_on_duty):
+    """
+    Hash of every input generate_daily_logs() reads for `trip`, including
+    the driver's prior duty from the ledger. Stored logs are current while
+    Trip.logs_fingerprint matches it.
+    """
+    driver = trip.driver
+    _, fingerprint = _digest({
+        "version": LOGS_FORMAT_VERSION,
+        "trip": [
+            trip.current_location, trip.pickup_location, trip.dropoff_location,
+            trip.stops, trip.current_cycle_hours, trip.created_at,
+        ],
+        "driver": [getattr(driver, field) for field in DRIVER_FIELDS] if driver else None,
+        "route": _route_digest(route_data),
+        "duty": list(prior_daily_on_duty),
+        "settings": [getattr(settings, name) for name in HOS_SETTINGS],
+    })
+    return fingerprint
+
+
+def save_daily_logs(trip, logs, fingerprint=""):
+    """
+    Persist generated logs as LogSheet rows in one transaction. Only days
+    whose content hash changed are written: new days are bulk-created,
+    changed days bulk-updated and days past the new end deleted. The
+    driver's duty ledger is updated for the days that changed.
+    Returns the stored day payloads, in day order.
+    """
+    now = timezone.now()
+    days = []
+    for log in logs:
+        payload, content_hash = _digest(log)
+        days.append((json.loads(payload), content_hash))
+
+    with transaction.atomic():
+        # Serialize concurrent regenerations of the same trip.
+        list(Trip.objects.select_for_update().filter(pk=trip.pk).values_list("pk"))
+        existing = {sheet.day: sheet for sheet in LogSheet.objects.filter(trip=trip)}
+
+        log_date = LogSheet._meta.get_field("log_date")
+        created, updated = [], []
+        changed_dates = {sheet.log_date for day, sheet in existing.items() if day > len(days)}
+        for index, (data, content_hash) in enumerate(days):
+            day = index + 1
+            sheet = existing.get(day)
+            if sheet is not None and sheet.content_hash == content_hash:
+                continue
+            if sheet is None:
+                sheet = LogSheet(trip=trip, day=day)
+                created.append(sheet)
+            else:
+                updated.append(sheet)
+                changed_dates.add(sheet.log_date)
+            sheet.log_date = log_date.to_python(logs[index]["date"])
+            changed_dates.add(sheet.log_date)
+            sheet.driving_hours = data["daily_driving_hours"]
+            sheet.rest_periods = data["rest_hours"]
+            sheet.notes = data["remarks"]
+            sheet.data = data
+            sheet.content_hash = content_hash
+            sheet.updated_at = now
+
+        if created:
+            LogSheet.objects.bulk_create(created)
+        if updated:
+            # bulk_update bypasses auto_now, hence updated_at is set above.
+            LogSheet.objects.bulk_update(updated, UPDATE_FIELDS)
+        LogSheet.objects.filter(trip=trip, day__gt=len(days)).delete()
+        Trip.objects.filter(pk=trip.pk).update(logs_fingerprint=fingerprint)
+        if trip.driver_id is not None:
+            update_duty_days(trip.driver_id, changed_dates)
+    trip.logs_fingerprint = fingerprint
+    return [data for data, _ in days]
+
+
+def stored_daily_logs(trip):
+    """
+    The persisted day payloads for `trip`, read with one indexed query.
+    """
+    return list(LogSheet.objects.filter(trip=trip).order_by("day").values_list("data", flat=True))
+
+
+def trip_daily_logs(trip, route_data, prior_daily_on_duty=None):
+    """
+    Daily logs for `trip`: read from LogSheet when its inputs are
+    unchanged, otherwise regenerated and saved incrementally. The
+    driver's prior duty is read from the ledger unless given.
+    """
+    if prior_daily_on_duty is None:
+        prior_daily_on_duty = prior_on_duty(trip)
+    fingerprint = logs_fingerprint(trip, route_data, prior_daily_on_duty)
+    if trip.logs_fingerprint == fingerprint:
+        return stored_daily_logs(trip)
+    with span("logs"):
+        logs = generate_daily_logs(trip, route_data, prior_daily_on_duty)
+    return save_daily_logs(trip, logs, fingerprint)
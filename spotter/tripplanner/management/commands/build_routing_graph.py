@@ -0,0 +1,123 @@
+import bz2
+import gzip
+import os
+import re
+import xml.etree.ElementTree as ET
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from tripplanner.geometry import haversine
+from tripplanner.routing import write_graph
+
+# Default speeds in km/h for drivable highway classes.
+HIGHWAY_SPEEDS = {
+    "motorway": 105, "motorway_link": 60,
+    "trunk": 90, "trunk_link": 50,
+    "primary": 70, "primary_link": 45,
+    "secondary": 60, "secondary_link": 40,
+    "tertiary": 50, "tertiary_link": 35,
+    "unclassified": 40, "residential": 30,
+    "living_street": 10, "service": 20,
+}
+
+MAXSPEED = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*(mph)?\s*$")
+
+
+def _open(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+def _speed(tags):
+    match = MAXSPEED.match(tags.get("maxspeed", ""))
+    if match:
+        speed = float(match.group(1))
+        return speed * 1.609344 if match.group(2) else speed
+    return HIGHWAY_SPEEDS[tags["highway"]]
+
+
+def _direction(tags):
+    """
+    1 for one-way along the way, -1 for against it, 0 for both directions.
+    """
+    oneway = tags.get("oneway", "")
+    if oneway in ("yes", "true", "1"):
+        return 1
+    if oneway == "-1":
+        return -1
+    if oneway == "no":
+        return 0
+    if tags["highway"] in ("motorway", "motorway_link") or tags.get("junction") == "roundabout":
+        return 1
+    return 0
+
+
+class Command(BaseCommand):
+    help = (
+        "Convert an OpenStreetMap XML extract (.osm, .osm.gz or .osm.bz2) into "
+        "the compact road graph used by ROUTING_PROVIDER=local."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", help="Path to the OSM XML extract.")
+        parser.add_argument(
+            "--output",
+            default=settings.ROUTING_GRAPH_PATH,
+            help="Where to write the .npz graph (defaults to ROUTING_GRAPH_PATH).",
+        )
+
+    def handle(self, *args, **options):
+        coordinates = {}
+        ways = []
+        try:
+            with _open(options["source"]) as source:
+                for _, element in ET.iterparse(source, events=("end",)):
+                    if element.tag == "node":
+                        coordinates[int(element.get("id"))] = (float(element.get("lat")), float(element.get("lon")))
+                        element.clear()
+                    elif element.tag == "way":
+                        tags = {tag.get("k"): tag.get("v") for tag in element.iter("tag")}
+                        if tags.get("highway") in HIGHWAY_SPEEDS:
+                            refs = [int(nd.get("ref")) for nd in element.iter("nd")]
+                            ways.append((refs, tags))
+                        element.clear()
+        except (OSError, ET.ParseError) as e:
+            raise CommandError(f"Could not read {options['source']}: {e}")
+
+        index = {}
+        names = {"": 0}
+        sources, targets, speeds, name_ids = [], [], [], []
+        for refs, tags in ways:
+            refs = [ref for ref in refs if ref in coordinates]
+            direction = _direction(tags)
+            speed = _speed(tags)
+            name_id = names.setdefault(tags.get("name") or tags.get("ref") or "", len(names))
+            for a, b in zip(refs, refs[1:]):
+                a, b = index.setdefault(a, len(index)), index.setdefault(b, len(index))
+                for u, v in ((a, b), (b, a)):
+                    if direction == 0 or (direction == 1) == ((u, v) == (a, b)):
+                        sources.append(u)
+                        targets.append(v)
+                        speeds.append(speed)
+                        name_ids.append(name_id)
+        if not sources:
+            raise CommandError("No drivable roads found in the extract.")
+
+        nodes = np.empty((len(index), 2))
+        for osm_id, node in index.items():
+            nodes[node] = coordinates[osm_id]
+        sources, targets = np.asarray(sources), np.asarray(targets)
+        length = haversine(nodes[sources, 0], nodes[sources, 1], nodes[targets, 0], nodes[targets, 1])
+        duration = length / (np.asarray(speeds) / 3.6)
+
+        os.makedirs(os.path.dirname(os.path.abspath(options["output"])), exist_ok=True)
+        write_graph(
+            options["output"], nodes[:, 0], nodes[:, 1], sources, targets,
+            length, duration, name_ids, list(names),
+        )
+        self.stdout.write(
+            f"Wrote {len(index)} nodes and {len(sources)} edges to {options['output']}."
+        )
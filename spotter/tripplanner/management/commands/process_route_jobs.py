@@ -0,0 +1,37 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+from tripplanner.jobs import requeue_stale_jobs, run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = "Run pending RouteJob rows (once, or continuously with --loop)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=None, help="Maximum jobs per pass.")
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new jobs.")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds between polls with --loop.")
+        parser.add_argument(
+            "--stale-after",
+            type=int,
+            default=15,
+            help="Requeue jobs left running for this many minutes (0 disables).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            if options["stale_after"]:
+                cutoff = timezone.now() - timedelta(minutes=options["stale_after"])
+                requeued = requeue_stale_jobs(cutoff)
+                if requeued:
+                    self.stdout.write(f"Requeued {requeued} stale job(s).")
+            ran = run_pending_jobs(limit=options["limit"])
+            if ran:
+                self.stdout.write(f"Ran {ran} route job(s).")
+            if not options["loop"]:
+                break
+            close_old_connections()
+            if not ran:
+                time.sleep(options["interval"])
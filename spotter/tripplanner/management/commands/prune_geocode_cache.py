@@ -0,0 +1,22 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from tripplanner.models import GeocodeCache
+
+
+class Command(BaseCommand):
+    help = "Delete persisted geocode results older than GEOCODE_DB_TTL_DAYS."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.GEOCODE_DB_TTL_DAYS,
+            help="Age in days after which a cached result is removed.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        deleted, _ = GeocodeCache.objects.filter(updated_at__lt=cutoff).delete()
+        self.stdout.write(f"Removed {deleted} cached geocode result(s).")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from tripplanner.ledger import rebuild_duty_days
+from tripplanner.models import DutyDay, LogSheet
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild drivers' duty-hours ledger (DutyDay rows) from their stored log sheets, "
+        "e.g. after upgrading or restoring LogSheet data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--driver", type=int, action="append", help="Only this driver id (repeatable).")
+
+    def handle(self, *args, **options):
+        driver_ids = options["driver"]
+        if not driver_ids:
+            driver_ids = set(LogSheet.objects.values_list("trip__driver_id", flat=True).distinct())
+            driver_ids.update(DutyDay.objects.values_list("driver_id", flat=True).distinct())
+            driver_ids = sorted(driver_id for driver_id in driver_ids if driver_id is not None)
+        for driver_id in driver_ids:
+            rebuild_duty_days(driver_id)
+        self.stdout.write(f"Rebuilt the duty ledger for {len(driver_ids)} driver(s).")
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark log generation, route formatting and trip serialization "
+        "against recorded upstream fixtures and compare with the stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--filter", default=None, help="Only run benchmarks whose name contains this.")
+        parser.add_argument("--rounds", type=int, default=7, help="Timed samples per benchmark.")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.25,
+            help="Relative slowdown over the baseline reported as a regression.",
+        )
+        parser.add_argument(
+            "--save-baseline", action="store_true", help="Store these results as the new baseline."
+        )
+        parser.add_argument(
+            "--fail-on-regression", action="store_true", help="Exit with an error if anything regressed."
+        )
+        parser.add_argument(
+            "--record",
+            action="store_true",
+            help="Re-record the upstream fixture from the live services before running.",
+        )
+
+    def handle(self, *args, **options):
+        from tripplanner.benchmarks import suite as benchmarks
+
+        if options["record"]:
+            benchmarks.record_fixture()
+            self.stdout.write(f"Recorded {benchmarks.FIXTURE_PATH}.")
+
+        results = benchmarks.run_benchmarks(options["filter"], rounds=options["rounds"])
+        baseline = benchmarks.load_baseline()
+        rows, regressions = benchmarks.compare(results, baseline, options["threshold"])
+
+        width = max((len(name) for name, *_ in rows), default=10)
+        self.stdout.write(f"{'benchmark':<{width}}  {'best ms':>10}  {'baseline':>10}  {'change':>8}")
+        for name, best, base, change in rows:
+            base_text = f"{base:10.3f}" if base is not None else f"{'-':>10}"
+            change_text = f"{change:+8.1%}" if change is not None else f"{'new':>8}"
+            line = f"{name:<{width}}  {best:10.3f}  {base_text}  {change_text}"
+            if name in regressions:
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
+
+        if options["save_baseline"]:
+            benchmarks.save_baseline(dict(baseline, **results))
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline to {benchmarks.BASELINE_PATH}."))
+        if regressions and options["fail_on_regression"]:
+            raise CommandError(f"{len(regressions)} benchmark(s) regressed: {', '.join(regressions)}")
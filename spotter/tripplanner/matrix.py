@@ -0,0 +1,166 @@
+"""
+Distance matrices over the routing provider's table service, and the
+stop ordering for multi-stop trips built on them.
+"""
+import contextvars
+import itertools
+import math
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from .cache import LRUCache
+from .metrics import span
+from . import routing
+from .utils import geocode_many, route_cache_key
+
+# (source, destination) -> (seconds, metres), keyed by rounded coordinates.
+_matrix_cache = LRUCache(maxsize=settings.MATRIX_CACHE_SIZE, ttl=settings.ROUTE_CACHE_TTL)
+
+# Blocks of a large matrix are fetched concurrently; the OSRM client's
+# rate limiter still bounds the combined request rate.
+_matrix_executor = ThreadPoolExecutor(
+    max_workers=settings.MATRIX_CONCURRENCY, thread_name_prefix="matrix"
+)
+
+# Stop counts up to this are ordered exactly (Held-Karp); longer lists use
+# nearest neighbour plus 2-opt.
+EXACT_ORDER_LIMIT = 9
+
+
+def matrix_cache_stats():
+    """
+    Hit/miss/eviction counters for the matrix cell cache in this process.
+    """
+    return dict(_matrix_cache.stats.as_dict(), size=len(_matrix_cache))
+
+
+def _chunks(items, size):
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+def _fetch_block(sources, destinations):
+    durations, distances = routing.get_provider().table(sources, destinations)
+    cells = {}
+    for source, duration_row, distance_row in zip(sources, durations, distances):
+        for destination, duration, distance in zip(destinations, duration_row, distance_row):
+            cells[(source, destination)] = cell = (duration, distance)
+            _matrix_cache.set((source, destination), cell)
+    return cells
+
+
+def distance_matrix(sources, destinations):
+    """
+    (durations, distances) in seconds and metres between (lat, lon)
+    `sources` and `destinations`, as rows per source; None where no route
+    exists. Cached cells are reused. The rest is requested in blocks of at
+    most MATRIX_CHUNK_SIZE places per side, trimmed to the rows and columns
+    with missing cells and fetched concurrently.
+    """
+    sources = route_cache_key(*sources)
+    destinations = route_cache_key(*destinations)
+    size = settings.MATRIX_CHUNK_SIZE
+
+    cells = {}
+    blocks = []
+    for source_chunk in _chunks(list(dict.fromkeys(sources)), size):
+        for destination_chunk in _chunks(list(dict.fromkeys(destinations)), size):
+            rows, columns = {}, {}
+            for source in source_chunk:
+                for destination in destination_chunk:
+                    cell = _matrix_cache.get((source, destination))
+                    if cell is None:
+                        rows[source] = columns[destination] = None
+                    else:
+                        cells[(source, destination)] = cell
+            if rows:
+                blocks.append((list(rows), list(columns)))
+
+    with span("matrix"):
+        if len(blocks) == 1:
+            cells.update(_fetch_block(*blocks[0]))
+        elif blocks:
+            futures = [
+                _matrix_executor.submit(contextvars.copy_context().run, _fetch_block, *block)
+                for block in blocks
+            ]
+            for future in futures:
+                cells.update(future.result())
+
+    durations = [[cells[(source, destination)][0] for destination in destinations] for source in sources]
+    distances = [[cells[(source, destination)][1] for destination in destinations] for source in sources]
+    return durations, distances
+
+
+def _path_cost(cost, path):
+    return sum(cost[a][b] for a, b in zip(path, path[1:]))
+
+
+def _held_karp(cost, count):
+    # best[(visited mask, last stop)] = (cost from node 0, previous stop)
+    best = {(1 << (stop - 1), stop): (cost[0][stop], 0) for stop in range(1, count + 1)}
+    for size in range(2, count + 1):
+        for subset in itertools.combinations(range(1, count + 1), size):
+            mask = sum(1 << (stop - 1) for stop in subset)
+            for last in subset:
+                previous_mask = mask & ~(1 << (last - 1))
+                best[(mask, last)] = min(
+                    (best[(previous_mask, stop)][0] + cost[stop][last], stop)
+                    for stop in subset if stop != last
+                )
+    mask = (1 << count) - 1
+    _, last = min((best[(mask, stop)][0] + cost[stop][count + 1], stop) for stop in range(1, count + 1))
+    order = []
+    while last:
+        order.append(last)
+        mask, last = mask & ~(1 << (last - 1)), best[(mask, last)][1]
+    return order[::-1]
+
+
+def _nearest_neighbour_two_opt(cost, count):
+    unvisited = set(range(1, count + 1))
+    path = [0]
+    while unvisited:
+        nearest = min(unvisited, key=lambda stop: (cost[path[-1]][stop], stop))
+        path.append(nearest)
+        unvisited.discard(nearest)
+    path.append(count + 1)
+
+    # Costs may be asymmetric, so reversed segments are re-costed in full.
+    best_cost = _path_cost(cost, path)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, len(path) - 2):
+            for j in range(i + 1, len(path) - 1):
+                candidate = path[:i] + path[i:j + 1][::-1] + path[j + 1:]
+                candidate_cost = _path_cost(cost, candidate)
+                if candidate_cost < best_cost - 1e-9:
+                    path, best_cost, improved = candidate, candidate_cost, True
+    return path[1:-1]
+
+
+def best_stop_order(cost):
+    """
+    Order of the intermediate nodes 1..n of a square cost matrix that
+    minimizes the path from node 0 to node n + 1. None costs count as
+    unreachable.
+    """
+    count = len(cost) - 2
+    if count <= 1:
+        return list(range(1, count + 1))
+    cost = [[math.inf if value is None else value for value in row] for row in cost]
+    if count <= EXACT_ORDER_LIMIT:
+        return _held_karp(cost, count)
+    return _nearest_neighbour_two_opt(cost, count)
+
+
+def optimize_stops(trip):
+    """
+    `trip.stops` reordered for the shortest driving time from the pickup
+    to the dropoff. The pickup and dropoff stay fixed; the extra stops are
+    treated as independent of each other.
+    """
+    if len(trip.stops) < 2:
+        return list(trip.stops)
+    coords = geocode_many([trip.pickup_location, *(stop["location"] for stop in trip.stops), trip.dropoff_location])
+    durations, _ = distance_matrix(coords, coords)
+    return [trip.stops[index - 1] for index in best_stop_order(durations)]
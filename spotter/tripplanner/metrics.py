@@ -0,0 +1,214 @@
+"""
+Request timing and Prometheus metrics.
+
+Code marks slow sections with `span(name)`. Each span feeds a process-wide
+latency histogram and, while a request is being handled by TimingMiddleware,
+that request's Server-Timing header. ORM queries are timed by a database
+execute wrapper installed on every connection. Everything is kept in memory
+per process, so scrape each worker (or run one) for a complete picture.
+"""
+import contextvars
+import threading
+from bisect import bisect_left
+from time import perf_counter
+
+# Histogram upper bounds in seconds, from a fast cache hit to a slow upstream.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, **extra):
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    Thread-safe Prometheus histogram keyed by a tuple of label values.
+    """
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = sorted((labels, list(counts), total, count)
+                              for labels, (counts, total, count) in self._series.items())
+        for labels, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket
+                lines.append(
+                    f"{self.name}_bucket{_labels(self.labelnames, labels, le=_number(bound))} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+request_duration = Histogram(
+    "spotter_request_duration_seconds",
+    "Time to handle a request, by view, method and status code.",
+    ("view", "method", "status"),
+)
+span_duration = Histogram(
+    "spotter_span_duration_seconds",
+    "Time spent in instrumented sections (geocode, route, logs, db, render).",
+    ("span",),
+)
+
+
+class RequestTimings:
+    """
+    Span totals for one request: {name: [seconds, count]}.
+    """
+    __slots__ = ("spans",)
+
+    def __init__(self):
+        self.spans = {}
+
+    def add(self, name, seconds):
+        entry = self.spans.get(name)
+        if entry is None:
+            self.spans[name] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+    def server_timing(self, total):
+        """
+        Server-Timing header value; durations are in milliseconds.
+        """
+        parts = []
+        for name, (seconds, count) in self.spans.items():
+            desc = f';desc="{count} queries"' if name == "db" else ""
+            parts.append(f"{name};dur={seconds * 1000:.1f}{desc}")
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+# The timings of the request being handled, if any. A mutable object is
+# stored so spans recorded in copied contexts (sync_to_async threads) count.
+_current = contextvars.ContextVar("request_timings", default=None)
+
+
+def start_request():
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def record(name, seconds):
+    span_duration.observe((name,), seconds)
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+class span:
+    """
+    Context manager timing a named section:
+
+        with span("route"):
+            ...
+    """
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.name, perf_counter() - self.start)
+
+
+def time_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper that records every query as a "db" span.
+    """
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record("db", perf_counter() - start)
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """
+    connection_created receiver adding time_query to the connection.
+    """
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+def cache_metrics(caches, coalesced):
+    """
+    Exposition lines for cache tiers ({cache: CacheStats.as_dict()-style
+    dict, optionally with "size"}) and single-flight coalesced call counts.
+    """
+    series = [
+        ("spotter_cache_hits_total", "counter", "Cache lookups that found a fresh entry.", "hits"),
+        ("spotter_cache_misses_total", "counter", "Cache lookups that missed.", "misses"),
+        ("spotter_cache_evictions_total", "counter", "Entries expired or evicted.", "evictions"),
+        ("spotter_cache_hit_ratio", "gauge", "Hits over lookups since the process started.", "hit_ratio"),
+        ("spotter_cache_size", "gauge", "Entries currently held.", "size"),
+    ]
+    lines = []
+    for name, kind, documentation, field in series:
+        lines += [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+        for cache, stats in caches.items():
+            if field in stats:
+                lines.append(f'{name}{{cache="{_escape(cache)}"}} {_number(stats[field])}')
+    lines += [
+        "# HELP spotter_coalesced_calls_total Calls that shared another caller's in-flight upstream request.",
+        "# TYPE spotter_coalesced_calls_total counter",
+    ]
+    lines += [f'spotter_coalesced_calls_total{{call="{_escape(call)}"}} {count}' for call, count in coalesced.items()]
+    return lines
+
+
+def exposition(extra_lines=()):
+    """
+    The Prometheus text exposition of every histogram plus `extra_lines`.
+    """
+    lines = request_duration.expose() + span_duration.expose() + list(extra_lines)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,54 @@
+from time import perf_counter
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from . import metrics
+
+
+class TimingMiddleware:
+    """
+    Times each request, adds a Server-Timing header with the spans recorded
+    while handling it (geocode, route, logs, db, render and the total) and
+    feeds the request and span histograms served at /metrics.
+
+    List it first in MIDDLEWARE so the total covers the other middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        start = perf_counter()
+        timings, token = metrics.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        return self.finish(request, response, timings, perf_counter() - start)
+
+    async def __acall__(self, request):
+        start = perf_counter()
+        timings, token = metrics.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        return self.finish(request, response, timings, perf_counter() - start)
+
+    def process_template_response(self, request, response):
+        # Called just before DRF and template responses render.
+        start = perf_counter()
+        response.add_post_render_callback(lambda rendered: metrics.record("render", perf_counter() - start))
+        return response
+
+    def finish(self, request, response, timings, elapsed):
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match is not None else "unmatched"
+        metrics.request_duration.observe((view, request.method, str(response.status_code)), elapsed)
+        response["Server-Timing"] = timings.server_timing(elapsed)
+        return response
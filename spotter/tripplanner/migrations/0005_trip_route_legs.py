@@ -0,0 +1,18 @@
+# Generated by Django 4.2.19 on 2026-10-17 02:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tripplanner', '0004_trip_route_routejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='route_legs',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
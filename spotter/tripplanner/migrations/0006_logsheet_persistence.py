@@ -0,0 +1,73 @@
+# Generated by Django 4.2.19 on 2026-10-17 02:17
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+def number_log_days(apps, schema_editor):
+    """
+    Number each trip's existing log sheets 1, 2, ... by date so the new
+    (trip, day) constraint holds.
+    """
+    LogSheet = apps.get_model('tripplanner', 'LogSheet')
+    sheets, trip_id, day = [], None, 0
+    for sheet in LogSheet.objects.order_by('trip_id', 'log_date', 'id').only('id', 'trip_id', 'day').iterator():
+        day = day + 1 if sheet.trip_id == trip_id else 1
+        trip_id = sheet.trip_id
+        if sheet.day != day:
+            sheet.day = day
+            sheets.append(sheet)
+    LogSheet.objects.bulk_update(sheets, ['day'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tripplanner', '0005_trip_route_legs'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='logsheet',
+            options={'ordering': ['trip', 'day']},
+        ),
+        migrations.AddField(
+            model_name='logsheet',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='logsheet',
+            name='data',
+            field=models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder),
+        ),
+        migrations.AddField(
+            model_name='logsheet',
+            name='day',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='logsheet',
+            name='driving_hours',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='logsheet',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='logs_fingerprint',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='logsheet',
+            index=models.Index(fields=['trip', 'log_date'], name='tripplanner_trip_id_927469_idx'),
+        ),
+        migrations.RunPython(number_log_days, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='logsheet',
+            constraint=models.UniqueConstraint(fields=('trip', 'day'), name='unique_logsheet_trip_day'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.19 on 2026-10-17 02:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tripplanner', '0006_logsheet_persistence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['driver', 'created_at', 'id'], name='trip_driver_created_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.19 on 2026-10-17 02:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tripplanner', '0007_trip_driver_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='optimize_stops',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='stops',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
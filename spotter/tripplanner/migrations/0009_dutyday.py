@@ -0,0 +1,38 @@
+# Generated by Django 4.2.19 on 2026-10-17 02:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tripplanner', '0008_trip_stops'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DutyDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('on_duty_minutes', models.PositiveIntegerField(default=0)),
+                ('first_on_duty_minute', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('last_on_duty_minute', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('cumulative_minutes', models.PositiveIntegerField(default=0)),
+                ('off_duty_streak', models.PositiveIntegerField(default=0)),
+                ('cycle_start', models.DateField()),
+                ('cycle_base_minutes', models.PositiveIntegerField(default=0)),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duty_days', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['driver', 'date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dutyday',
+            constraint=models.UniqueConstraint(fields=('driver', 'date'), name='unique_dutyday_driver_date'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.19 on 2026-10-17 02:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tripplanner', '0009_dutyday'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='route_steps',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -1,5 +1,13 @@
 from django.db import models
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+class RouteStatus(models.TextChoices):
+    NOT_STARTED = 'not_started', 'Not started'
+    PENDING = 'pending', 'Pending'
+    RUNNING = 'running', 'Running'
+    READY = 'ready', 'Ready'
+    FAILED = 'failed', 'Failed'
 
 class Trip(models.Model):
     driver = models.ForeignKey(
@@ -12,21 +20,168 @@ class Trip(models.Model):
     current_location = models.CharField(max_length=255)
     pickup_location = models.CharField(max_length=255)
     dropoff_location = models.CharField(max_length=255)
+    # Extra stops between pickup and dropoff, in driving order:
+    # [{"location": ..., "type": "pickup" | "dropoff", "minutes": ...}].
+    stops = models.JSONField(default=list, blank=True)
+    # Let the route job reorder `stops` for the shortest total drive.
+    optimize_stops = models.BooleanField(default=False)
     current_cycle_hours = models.FloatField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Route precomputed by a RouteJob; served by the read endpoints once ready.
+    route_status = models.CharField(
+        max_length=20, choices=RouteStatus.choices, default=RouteStatus.NOT_STARTED
+    )
+    route_distance = models.FloatField(null=True, blank=True)
+    route_duration = models.FloatField(null=True, blank=True)
+    route_geometry = models.JSONField(null=True, blank=True)
+    route_instructions = models.JSONField(null=True, blank=True)
+    route_legs = models.JSONField(null=True, blank=True)
+    # Raw steps of each leg, trimmed to what utils.route_steps() reads.
+    route_steps = models.JSONField(null=True, blank=True)
+    route_map_url = models.URLField(max_length=2000, blank=True)
+    route_error = models.TextField(blank=True)
+    route_updated_at = models.DateTimeField(null=True, blank=True)
+    # Hash of the inputs the stored LogSheet rows were generated from.
+    logs_fingerprint = models.CharField(max_length=64, blank=True)
+
+    class Meta:
+        indexes = [
+            # Backs the trip list's keyset pagination per driver.
+            models.Index(fields=['driver', 'created_at', 'id'], name='trip_driver_created_idx'),
+        ]
+
     @property
     def driver_name(self):
         return self.driver.username if self.driver else ''
+
+    @property
+    def route_places(self):
+        return (
+            self.current_location,
+            self.pickup_location,
+            *(stop["location"] for stop in self.stops),
+            self.dropoff_location,
+        )
+    
+    def stored_route(self):
+        """
+        The persisted route in get_route() format, or None if not ready.
+        """
+        if self.route_status != RouteStatus.READY:
+            return None
+        return {
+            "distance": self.route_distance,
+            "duration": self.route_duration,
+            "instructions": self.route_instructions,
+            "map_url": self.route_map_url,
+            "geometry": self.route_geometry,
+            "legs": self.route_legs,
+        }
+
+    def stored_steps(self):
+        """
+        The persisted raw steps of each leg, or None if the route is not
+        ready or was stored before steps were kept.
+        """
+        if self.route_status != RouteStatus.READY:
+            return None
+        return self.route_steps
     
     def __str__(self):
         return f"Trip by {self.driver_name} on {self.created_at.strftime('%Y-%m-%d')}"
 class LogSheet(models.Model):
+    """
+    One persisted day of a trip's generated logs. `data` holds the full
+    generate_daily_logs() entry; `content_hash` lets regeneration skip
+    days whose content did not change.
+    """
     trip = models.ForeignKey(Trip, related_name='logs', on_delete=models.CASCADE)
+    day = models.PositiveIntegerField(default=1)
     log_date = models.DateField()
-    driving_hours = models.FloatField
+    driving_hours = models.FloatField(default=0)
     rest_periods = models.FloatField()
     notes = models.TextField(blank=True, null=True)
+    data = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    content_hash = models.CharField(max_length=64, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['trip', 'day']
+        constraints = [
+            models.UniqueConstraint(fields=['trip', 'day'], name='unique_logsheet_trip_day'),
+        ]
+        indexes = [
+            models.Index(fields=['trip', 'log_date']),
+        ]
+
+    def __str__(self):
+        return f"Log for {self.trip} on {self.log_date}"
+
+class DutyDay(models.Model):
+    """
+    One calendar day of a driver's duty-hours ledger, totalled over the
+    LogSheet rows of all their trips. Rows are contiguous from the driver's
+    first logged day and carry running totals, so rolling 70-hour/8-day
+    figures for any date need at most two rows (see tripplanner.ledger).
+    """
+    driver = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='duty_days', on_delete=models.CASCADE)
+    date = models.DateField()
+    on_duty_minutes = models.PositiveIntegerField(default=0)
+    # First and last on-duty minute from midnight; null on days fully off duty.
+    first_on_duty_minute = models.PositiveSmallIntegerField(null=True, blank=True)
+    last_on_duty_minute = models.PositiveSmallIntegerField(null=True, blank=True)
+    # On-duty minutes from the first row through this day.
+    cumulative_minutes = models.PositiveIntegerField(default=0)
+    # Consecutive off-duty minutes up to this day's midnight.
+    off_duty_streak = models.PositiveIntegerField(default=0)
+    # First day after the latest 34-hour restart, and cumulative_minutes
+    # before that day.
+    cycle_start = models.DateField()
+    cycle_base_minutes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['driver', 'date']
+        constraints = [
+            models.UniqueConstraint(fields=['driver', 'date'], name='unique_dutyday_driver_date'),
+        ]
+
+    def __str__(self):
+        return f"Duty for {self.driver} on {self.date}"
+
+class GeocodeCache(models.Model):
+    """
+    Persistent geocoding results keyed by the normalized place string.
+    Backs the in-process LRU tier in tripplanner.utils.geocode.
+    """
+    query = models.CharField(max_length=255, unique=True)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.query} -> ({self.latitude}, {self.longitude})"
+
+class RouteJob(models.Model):
+    """
+    A queued background route computation for a trip. Rows outlive the
+    in-process queue, so pending work survives restarts and can be drained
+    with the process_route_jobs command.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+        SUPERSEDED = 'superseded', 'Superseded'
+
+    trip = models.ForeignKey(Trip, related_name='route_jobs', on_delete=models.CASCADE)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING, db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
-        return f"Log for {self.trip} on {self.log_date}"
\ No newline at end of file
+        return f"Route job {self.pk} for trip {self.trip_id} ({self.status})"
@@ -0,0 +1,22 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+
+
+class TripCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (created_at, id), newest first. Each page is an
+    index range scan, so deep pages cost the same as the first one.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = settings.TRIP_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.TRIP_MAX_PAGE_SIZE
+
+
+class RouteStepPagination(LimitOffsetPagination):
+    """
+    limit/offset pages over a route's structured steps (utils.RouteSteps),
+    which formats only the steps on the requested page.
+    """
+    default_limit = settings.ROUTE_STEP_PAGE_SIZE
+    max_limit = settings.ROUTE_STEP_MAX_PAGE_SIZE
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from django.conf import settings
+from reportlab.lib.pagesizes import landscape, letter
+from reportlab.pdfgen import canvas
+from . import hos
+
+# Paper logs have four duty rows; the app's separate Break status is
+# drawn as Off Duty, which is what a 30-minute break is on paper.
+GRID_ROWS = ("Off Duty", "Sleeper Berth", "Driving", "On Duty (not driving)")
+STATUS_ROW = {
+    hos.OFF_DUTY: 0,
+    hos.SLEEPER_BERTH: 1,
+    hos.DRIVING: 2,
+    hos.BREAK: 0,
+    hos.ON_DUTY: 3,
+}
+
+PAGE_WIDTH, PAGE_HEIGHT = landscape(letter)
+MARGIN = 36
+LABEL_WIDTH = 110
+TOTAL_WIDTH = 50
+ROW_HEIGHT = 22
+GRID_TOP = PAGE_HEIGHT - 190
+
+
+def logs_content_hash(logs):
+    """
+    Stable SHA-256 of the generated log data, used as the PDF cache key.
+    """
+    payload = json.dumps(logs, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cached_logs_pdf(logs):
+    """
+    Path to the rendered PDF for `logs`, rendering it on a cache miss.
+    Files are written to a temporary name and renamed into place, so
+    concurrent requests never see a partial document. Hits refresh the
+    file's modification time, which prune_pdf_cache() treats as last use.
+    """
+    cache_dir = Path(settings.LOG_PDF_CACHE_DIR)
+    path = cache_dir / f"{logs_content_hash(logs)}.pdf"
+    try:
+        os.utime(path)
+        return path
+    except FileNotFoundError:
+        pass
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".pdf.tmp")
+    os.close(fd)
+    try:
+        render_logs_pdf(logs, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    prune_pdf_cache(cache_dir)
+    return path
+
+
+def prune_pdf_cache(cache_dir):
+    """
+    Delete cached PDFs (and leftover temporary files) unused for
+    LOG_PDF_CACHE_MAX_AGE_DAYS, then the least recently used ones beyond
+    LOG_PDF_CACHE_MAX_FILES. Returns how many files were removed.
+    """
+    cutoff = time.time() - settings.LOG_PDF_CACHE_MAX_AGE_DAYS * 24 * 60 * 60
+    pdfs, stale = [], []
+    for entry in os.scandir(cache_dir):
+        try:
+            mtime = entry.stat().st_mtime
+        except FileNotFoundError:
+            continue
+        if entry.name.endswith(".pdf"):
+            pdfs.append((mtime, entry.path))
+        elif entry.name.endswith(".pdf.tmp") and mtime < cutoff:
+            stale.append(entry.path)
+    pdfs.sort(reverse=True)
+    stale += [
+        path for index, (mtime, path) in enumerate(pdfs)
+        if mtime < cutoff or index >= settings.LOG_PDF_CACHE_MAX_FILES
+    ]
+    removed = 0
+    for path in stale:
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def render_logs_pdf(logs, path):
+    """
+    Draw one driver's daily log page per day into the PDF at `path`.
+    """
+    pdf = canvas.Canvas(str(path), pagesize=(PAGE_WIDTH, PAGE_HEIGHT))
+    pdf.setTitle("Driver's Daily Log")
+    for log in logs:
+        _draw_header(pdf, log)
+        _draw_grid(pdf, log)
+        _draw_recap(pdf, log)
+        pdf.showPage()
+    pdf.save()
+
+
+def _draw_header(pdf, log):
+    top = PAGE_HEIGHT - MARGIN
+    pdf.setFont("Helvetica-Bold", 16)
+    pdf.drawString(MARGIN, top - 12, "Driver's Daily Log")
+    pdf.setFont("Helvetica", 10)
+    pdf.drawRightString(PAGE_WIDTH - MARGIN, top - 12, f"Day {log['day']}  -  {str(log['date'])[:10]}")
+
+    rows = [
+        ("From", log["current_location"], "To", log["dropoff_location"]),
+        ("Carrier", log["carrier"], "Truck/Trailer #", log["truck_number"]),
+        ("Home terminal", log["home_terminal_address"], "Shipping docs", log["shipping_docs"]),
+        ("Driver", log["driver_name"], "Total miles driving today", f"{log['daily_distance']:.1f}"),
+    ]
+    y = top - 40
+    for left_label, left_value, right_label, right_value in rows:
+        pdf.setFont("Helvetica-Bold", 9)
+        pdf.drawString(MARGIN, y, f"{left_label}:")
+        pdf.drawString(PAGE_WIDTH / 2, y, f"{right_label}:")
+        pdf.setFont("Helvetica", 9)
+        pdf.drawString(MARGIN + 80, y, str(left_value)[:60])
+        pdf.drawString(PAGE_WIDTH / 2 + 130, y, str(right_value)[:50])
+        y -= 16
+
+
+def _grid_geometry():
+    left = MARGIN + LABEL_WIDTH
+    right = PAGE_WIDTH - MARGIN - TOTAL_WIDTH
+    return left, right, (right - left) / 24
+
+
+def _draw_grid(pdf, log):
+    left, right, hour_width = _grid_geometry()
+    bottom = GRID_TOP - ROW_HEIGHT * len(GRID_ROWS)
+
+    pdf.setLineWidth(0.5)
+    pdf.setFont("Helvetica", 7)
+    for hour in range(25):
+        x = left + hour * hour_width
+        pdf.line(x, GRID_TOP, x, bottom)
+        if hour < 24:
+            label = "Mid" if hour == 0 else "Noon" if hour == 12 else str(hour % 12)
+            pdf.drawCentredString(x, GRID_TOP + 4, label)
+            # Quarter-hour ticks.
+            for quarter in (1, 2, 3):
+                tick = x + quarter * hour_width / 4
+                for row in range(len(GRID_ROWS)):
+                    row_top = GRID_TOP - row * ROW_HEIGHT
+                    size = 6 if quarter == 2 else 3
+                    pdf.line(tick, row_top, tick, row_top - size)
+
+    totals = [0] * len(GRID_ROWS)
+    for start, end, status in log["segments"]:
+        totals[STATUS_ROW[status]] += end - start
+    pdf.setFont("Helvetica", 9)
+    for row, label in enumerate(GRID_ROWS):
+        row_top = GRID_TOP - row * ROW_HEIGHT
+        pdf.line(left, row_top, right, row_top)
+        pdf.drawString(MARGIN, row_top - ROW_HEIGHT / 2 - 3, label)
+        pdf.drawRightString(PAGE_WIDTH - MARGIN, row_top - ROW_HEIGHT / 2 - 3, f"{totals[row] / 60:.2f}")
+    pdf.line(left, bottom, right, bottom)
+
+    # Duty line: a horizontal run per segment, joined by vertical changes.
+    pdf.setLineWidth(2)
+    minute_width = hour_width / 60
+    previous_y = None
+    for start, end, status in log["segments"]:
+        y = GRID_TOP - STATUS_ROW[status] * ROW_HEIGHT - ROW_HEIGHT / 2
+        x = left + start * minute_width
+        if previous_y is not None and previous_y != y:
+            pdf.line(x, previous_y, x, y)
+        pdf.line(x, y, left + end * minute_width, y)
+        previous_y = y
+    pdf.setLineWidth(0.5)
+
+
+def _draw_recap(pdf, log):
+    y = GRID_TOP - ROW_HEIGHT * len(GRID_ROWS) - 30
+    pdf.setFont("Helvetica-Bold", 9)
+    pdf.drawString(MARGIN, y, "Remarks:")
+    pdf.setFont("Helvetica", 9)
+    pdf.drawString(MARGIN + 60, y, str(log["remarks"])[:140])
+    stops = [name for name, flag in (("pickup", log["pickup"]), ("dropoff", log["dropoff"]),
+                                     ("fuel stop", log["fueling_stop"])) if flag]
+    if stops:
+        pdf.drawString(MARGIN + 60, y - 14, "Stops: " + ", ".join(stops))
+
+    y -= 44
+    recap = [
+        ("On duty today", log["onDutyHours"]),
+        ("Driving today", log["daily_driving_hours"]),
+        ("Cycle hours used (70/8)", log.get("cycleHoursUsed", "")),
+        ("Hours available (70/8)", log["seventyHrEightDay"]),
+        ("Hours available (60/7)", log["sixtyHrSevenDay"]),
+    ]
+    pdf.setFont("Helvetica-Bold", 9)
+    pdf.drawString(MARGIN, y, "Recap:")
+    pdf.setFont("Helvetica", 9)
+    for index, (label, value) in enumerate(recap):
+        pdf.drawString(MARGIN + 60 + (index % 3) * 200, y - (index // 3) * 14, f"{label}: {value}")
+
+    pdf.setFont("Helvetica-Bold", 9)
+    pdf.drawString(MARGIN, MARGIN + 10, "Driver signature:")
+    pdf.setFont("Helvetica", 9)
+    signed = "on file" if log["driver_signature"] else "________________________"
+    pdf.drawString(MARGIN + 90, MARGIN + 10, signed)
@@ -0,0 +1,123 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from django.conf import settings
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket: `rate` requests per second with up to `burst`
+    requests allowed back to back. acquire() blocks until a token is free;
+    acquire_async() waits without blocking the event loop.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def _try_acquire(self):
+        """
+        Take a token if one is available; otherwise return the seconds to
+        wait before the next one is due.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while (wait := self._try_acquire()) > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        if self.rate <= 0:
+            return
+        while (wait := self._try_acquire()) > 0:
+            await asyncio.sleep(wait)
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    Token bucket shared by every process on the host through a small
+    SQLite file, so N web workers together stay within one provider's rate.
+    Each acquisition is a short IMMEDIATE transaction on the bucket's row;
+    if the store is unusable the limiter falls back to its in-process bucket.
+    acquire_async() runs the transactions in the loop's default executor,
+    as they can block on other processes' locks.
+    """
+
+    def __init__(self, name, rate, burst=1, path=None):
+        super().__init__(rate, burst)
+        self.name = name
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS buckets "
+                "(name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._local.connection = connection
+        return connection
+
+    def _try_acquire(self):
+        try:
+            connection = self._connection()
+            # Wall-clock time: monotonic clocks are not comparable across processes.
+            now = time.time()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute(
+                    "SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)
+                ).fetchone()
+                tokens, updated = row if row else (float(self.burst), now)
+                tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+                wait = 0 if tokens >= 1 else (1 - tokens) / self.rate
+                if not wait:
+                    tokens -= 1
+                connection.execute(
+                    "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                    (self.name, tokens, now),
+                )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            return wait
+        except sqlite3.Error:
+            return super()._try_acquire()
+
+    async def acquire_async(self):
+        if self.rate <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        while (wait := await loop.run_in_executor(None, self._try_acquire)) > 0:
+            await asyncio.sleep(wait)
+
+
+def make_rate_limiter(name, rate, burst=1):
+    """
+    A limiter for one upstream provider: shared across processes through
+    settings.RATE_LIMIT_STORE when it is set, otherwise per process.
+    """
+    if settings.RATE_LIMIT_STORE:
+        return SharedRateLimiter(name, rate, burst, path=settings.RATE_LIMIT_STORE)
+    return RateLimiter(rate, burst)
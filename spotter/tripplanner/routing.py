@@ -0,0 +1,421 @@
+import asyncio
+import heapq
+import math
+import threading
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from . import upstream
+from .geometry import EARTH_RADIUS, haversine, shape_geometry, zoom_tolerance
+
+# Route detail levels, cheapest first: totals and legs only, plus a
+# simplified overview line, or the full line with turn-by-turn steps.
+ROUTE_DETAILS = ("summary", "overview", "full")
+
+OSRM_ROUTE_PARAMS = {
+    "summary": {"overview": "false", "steps": "false"},
+    # The full line, simplified here as for stored routes (see overview_geometry).
+    "overview": {"overview": "full", "geometries": "geojson", "steps": "false"},
+    "full": {"overview": "full", "geometries": "geojson", "steps": "true"},
+}
+
+# Overview lines are simplified to stay within a pixel at this map zoom.
+OVERVIEW_ZOOM = 10
+
+
+def overview_geometry(geometry):
+    """
+    The "overview" form of a full route geometry. Every provider and the
+    stored-route path (utils.trim_route) use this, so overview payloads
+    are the same however the route was obtained.
+    """
+    return shape_geometry(geometry, zoom_tolerance(OVERVIEW_ZOOM))
+
+
+def _at_detail(route, detail):
+    if detail == "overview" and route.get("geometry"):
+        route["geometry"] = overview_geometry(route["geometry"])
+    return route
+
+
+class RoutingProvider:
+    """
+    A routing backend. route() takes a list of (lat, lon) waypoints and
+    returns a route shaped like OSRM's: distance (m), duration (s), a GeoJSON
+    LineString geometry and one leg per consecutive waypoint pair, each
+    with its distance, duration and steps. `detail` (see ROUTE_DETAILS)
+    lets backends skip the geometry ("summary") or the steps (all but "full").
+
+    table() returns (durations, distances) in seconds and metres: one row
+    per source and one column per destination, None where no route exists.
+    """
+    name = None
+
+    def route(self, coordinates, detail="full"):
+        raise NotImplementedError
+
+    def table(self, sources, destinations):
+        raise NotImplementedError
+
+    async def route_async(self, coordinates, detail="full"):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.route, coordinates, detail)
+
+
+def _osrm_coordinates(coordinates):
+    return ";".join(f"{lon},{lat}" for lat, lon in coordinates)
+
+
+def _parse_route_response(response):
+    if response.status_code != 200:
+        raise Exception(f"OSRM API Error: {response.text}")
+    data = response.json()
+    if "routes" not in data or not data["routes"]:
+        raise Exception("No route data received from OSRM API")
+    return data["routes"][0]
+
+
+def _table_params(sources, destinations):
+    count = len(sources)
+    return {
+        "sources": ";".join(str(index) for index in range(count)),
+        "destinations": ";".join(str(count + index) for index in range(len(destinations))),
+        "annotations": "duration,distance",
+    }
+
+
+def _parse_table_response(response):
+    if response.status_code != 200:
+        raise Exception(f"OSRM API Error: {response.text}")
+    data = response.json()
+    if data.get("code") != "Ok" or "durations" not in data:
+        raise Exception("No table data received from OSRM API")
+    durations = data["durations"]
+    distances = data.get("distances") or [[None] * len(row) for row in durations]
+    return durations, distances
+
+
+class OSRMProvider(RoutingProvider):
+    """
+    The OSRM HTTP API at settings.OSRM_URL.
+    """
+    name = "osrm"
+
+    def route(self, coordinates, detail="full"):
+        response = upstream.osrm.get(
+            f"/route/v1/driving/{_osrm_coordinates(coordinates)}", params=OSRM_ROUTE_PARAMS[detail]
+        )
+        return _at_detail(_parse_route_response(response), detail)
+
+    def table(self, sources, destinations):
+        response = upstream.osrm.get(
+            f"/table/v1/driving/{_osrm_coordinates([*sources, *destinations])}",
+            params=_table_params(sources, destinations),
+        )
+        return _parse_table_response(response)
+
+    async def route_async(self, coordinates, detail="full"):
+        response = await upstream.osrm_async.get(
+            f"/route/v1/driving/{_osrm_coordinates(coordinates)}", params=OSRM_ROUTE_PARAMS[detail]
+        )
+        return _at_detail(_parse_route_response(response), detail)
+
+
+def write_graph(path, lat, lon, sources, targets, length, duration, name, names):
+    """
+    Save a directed road graph in the .npz layout LocalGraphProvider reads:
+    node coordinates plus edges in CSR order (`offsets` indexes each node's
+    outgoing run of `targets`), with per-edge length (m), duration (s) and
+    an index into `names`.
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    order = np.argsort(sources, kind="stable")
+    counts = np.bincount(sources, minlength=len(lat))
+    np.savez_compressed(
+        path,
+        lat=np.asarray(lat, dtype=np.float64),
+        lon=np.asarray(lon, dtype=np.float64),
+        offsets=np.concatenate(([0], np.cumsum(counts))).astype(np.int64),
+        targets=np.asarray(targets, dtype=np.int32)[order],
+        length=np.asarray(length, dtype=np.float32)[order],
+        duration=np.asarray(duration, dtype=np.float32)[order],
+        name=np.asarray(name, dtype=np.int32)[order],
+        names=np.asarray(names, dtype=str),
+    )
+
+
+def _bearing(lat1, lon1, lat2, lon2):
+    lat1, lat2 = math.radians(lat1), math.radians(lat2)
+    dlon = math.radians(lon2 - lon1)
+    x = math.sin(dlon) * math.cos(lat2)
+    y = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(dlon)
+    return math.degrees(math.atan2(x, y)) % 360
+
+
+def _turn_modifier(before, after):
+    """
+    OSRM maneuver modifier for a change of heading, in degrees.
+    """
+    delta = (after - before + 540) % 360 - 180
+    side = "right" if delta > 0 else "left"
+    delta = abs(delta)
+    if delta < 15:
+        return "straight"
+    if delta < 45:
+        return f"slight {side}"
+    if delta < 135:
+        return side
+    if delta < 170:
+        return f"sharp {side}"
+    return "uturn"
+
+
+class LocalGraphProvider(RoutingProvider):
+    """
+    Offline routing over a road graph file written by write_graph() (see
+    the build_routing_graph command). Waypoints snap to the nearest node and
+    each leg is the fastest path found by bidirectional A* with
+    average (consistent) potentials over edge durations.
+    """
+    name = "local"
+
+    def __init__(self, path):
+        with np.load(path, allow_pickle=False) as data:
+            lat, lon = data["lat"], data["lon"]
+            offsets, targets = data["offsets"], data["targets"]
+            length, duration = data["length"], data["duration"]
+            self.edge_name = data["name"].tolist()
+            self.names = data["names"].tolist()
+        if not len(lat):
+            raise ImproperlyConfigured(f"Routing graph {path} has no nodes.")
+
+        self.lat, self.lon = lat, lon
+        self._cos_lat = np.cos(np.radians(lat))
+        sources = np.repeat(np.arange(len(lat)), np.diff(offsets))
+
+        # Reverse adjacency for the backward search, keeping forward edge ids.
+        reverse_order = np.argsort(targets, kind="stable")
+        reverse_counts = np.bincount(targets, minlength=len(lat))
+        self.reverse_offsets = np.concatenate(([0], np.cumsum(reverse_counts))).tolist()
+        self.reverse_edges = reverse_order.tolist()
+
+        # Upper bound on straight-line speed keeps the A* potentials consistent.
+        straight = haversine(lat[sources], lon[sources], lat[targets], lon[targets])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            speeds = np.where(duration > 0, straight / duration, 0.0)
+        self.max_speed = float(max(speeds.max(initial=0.0), 1e-3))
+
+        self.offsets = offsets.tolist()
+        self.sources = sources.tolist()
+        self.targets = targets.tolist()
+        self.length = length.tolist()
+        self.duration = duration.tolist()
+        self._lat_rad = np.radians(lat).tolist()
+        self._lon_rad = np.radians(lon).tolist()
+
+    def nearest_node(self, lat, lon):
+        dy = self.lat - lat
+        dx = (self.lon - lon) * self._cos_lat
+        return int(np.argmin(dx * dx + dy * dy))
+
+    def _travel_time_bound(self, a, b):
+        lat1, lon1 = self._lat_rad[a], self._lon_rad[a]
+        lat2, lon2 = self._lat_rad[b], self._lon_rad[b]
+        h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+        return 2 * EARTH_RADIUS * math.asin(math.sqrt(min(h, 1.0))) / self.max_speed
+
+    def shortest_path(self, source, target):
+        """
+        Forward edge ids of the fastest path from `source` to `target`.
+        """
+        if source == target:
+            return []
+        potentials = {}
+
+        def potential(node):
+            # Average of the forward and backward estimates: the same
+            # reduced edge costs in both directions.
+            value = potentials.get(node)
+            if value is None:
+                value = (self._travel_time_bound(node, target) - self._travel_time_bound(source, node)) / 2
+                potentials[node] = value
+            return value
+
+        offsets, targets, duration = self.offsets, self.targets, self.duration
+        reverse_offsets, reverse_edges, sources = self.reverse_offsets, self.reverse_edges, self.sources
+        dist_f, dist_r = {source: 0.0}, {target: 0.0}
+        pred_f, pred_r = {source: None}, {target: None}
+        settled_f, settled_r = set(), set()
+        heap_f, heap_r = [(potential(source), source)], [(-potential(target), target)]
+        best, meeting = math.inf, None
+
+        while heap_f and heap_r:
+            if heap_f[0][0] + heap_r[0][0] >= best:
+                break
+            if len(heap_f) <= len(heap_r):
+                _, node = heapq.heappop(heap_f)
+                if node in settled_f:
+                    continue
+                settled_f.add(node)
+                base = dist_f[node]
+                for edge in range(offsets[node], offsets[node + 1]):
+                    nxt = targets[edge]
+                    cost = base + duration[edge]
+                    if cost < dist_f.get(nxt, math.inf):
+                        dist_f[nxt] = cost
+                        pred_f[nxt] = edge
+                        heapq.heappush(heap_f, (cost + potential(nxt), nxt))
+                        if nxt in dist_r and cost + dist_r[nxt] < best:
+                            best, meeting = cost + dist_r[nxt], nxt
+            else:
+                _, node = heapq.heappop(heap_r)
+                if node in settled_r:
+                    continue
+                settled_r.add(node)
+                base = dist_r[node]
+                for index in range(reverse_offsets[node], reverse_offsets[node + 1]):
+                    edge = reverse_edges[index]
+                    prev = sources[edge]
+                    cost = base + duration[edge]
+                    if cost < dist_r.get(prev, math.inf):
+                        dist_r[prev] = cost
+                        pred_r[prev] = edge
+                        heapq.heappush(heap_r, (cost - potential(prev), prev))
+                        if prev in dist_f and cost + dist_f[prev] < best:
+                            best, meeting = cost + dist_f[prev], prev
+
+        if meeting is None:
+            raise Exception("No route found in the local routing graph")
+        path = []
+        node = meeting
+        while pred_f[node] is not None:
+            path.append(pred_f[node])
+            node = sources[pred_f[node]]
+        path.reverse()
+        node = meeting
+        while pred_r[node] is not None:
+            path.append(pred_r[node])
+            node = targets[pred_r[node]]
+        return path
+
+    def _one_to_many(self, source, targets):
+        """
+        {target: (duration, length)} of the fastest paths from `source`, by
+        plain Dijkstra stopped once every reachable target is settled.
+        """
+        offsets, targets_of, duration, length = self.offsets, self.targets, self.duration, self.length
+        remaining = set(targets)
+        dist, travelled = {source: 0.0}, {source: 0.0}
+        heap = [(0.0, source)]
+        settled = set()
+        found = {}
+        while heap and remaining:
+            cost, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            settled.add(node)
+            if node in remaining:
+                remaining.discard(node)
+                found[node] = (cost, travelled[node])
+            for edge in range(offsets[node], offsets[node + 1]):
+                nxt = targets_of[edge]
+                candidate = cost + duration[edge]
+                if candidate < dist.get(nxt, math.inf):
+                    dist[nxt] = candidate
+                    travelled[nxt] = travelled[node] + length[edge]
+                    heapq.heappush(heap, (candidate, nxt))
+        return found
+
+    def table(self, sources, destinations):
+        destination_nodes = [self.nearest_node(lat, lon) for lat, lon in destinations]
+        searches = {}
+        durations, distances = [], []
+        for lat, lon in sources:
+            node = self.nearest_node(lat, lon)
+            if node not in searches:
+                searches[node] = self._one_to_many(node, destination_nodes)
+            found = searches[node]
+            durations.append([found[target][0] if target in found else None for target in destination_nodes])
+            distances.append([found[target][1] if target in found else None for target in destination_nodes])
+        return durations, distances
+
+    def _edge_bearing(self, edge):
+        a, b = self.sources[edge], self.targets[edge]
+        return _bearing(self.lat[a], self.lon[a], self.lat[b], self.lon[b])
+
+    def _steps(self, edges):
+        """
+        OSRM-style steps: one per run of edges on the same road name.
+        """
+        steps = []
+        previous = None
+        for edge in edges:
+            name = self.names[self.edge_name[edge]]
+            if steps and name == steps[-1]["name"]:
+                steps[-1]["distance"] += self.length[edge]
+                steps[-1]["duration"] += self.duration[edge]
+            else:
+                if steps:
+                    modifier = _turn_modifier(self._edge_bearing(previous), self._edge_bearing(edge))
+                    maneuver = {"type": "continue" if modifier == "straight" else "turn", "modifier": modifier}
+                else:
+                    maneuver = {"type": "depart"}
+                steps.append({
+                    "name": name,
+                    "distance": self.length[edge],
+                    "duration": self.duration[edge],
+                    "maneuver": maneuver,
+                })
+            previous = edge
+        if not steps:
+            steps.append({"name": "", "distance": 0.0, "duration": 0.0, "maneuver": {"type": "depart"}})
+        steps.append({
+            "name": steps[-1]["name"], "distance": 0.0, "duration": 0.0, "maneuver": {"type": "arrive"},
+        })
+        return steps
+
+    def route(self, coordinates, detail="full"):
+        nodes = [self.nearest_node(lat, lon) for lat, lon in coordinates]
+        legs = []
+        line = [[float(self.lon[nodes[0]]), float(self.lat[nodes[0]])]]
+        for source, target in zip(nodes, nodes[1:]):
+            edges = self.shortest_path(source, target)
+            if detail != "summary":
+                line.extend([float(self.lon[self.targets[e]]), float(self.lat[self.targets[e]])] for e in edges)
+            legs.append({
+                "distance": sum(self.length[e] for e in edges),
+                "duration": sum(self.duration[e] for e in edges),
+                "steps": self._steps(edges) if detail == "full" else [],
+            })
+        route = {
+            "distance": sum(leg["distance"] for leg in legs),
+            "duration": sum(leg["duration"] for leg in legs),
+            "legs": legs,
+        }
+        if detail != "summary":
+            route["geometry"] = {"type": "LineString", "coordinates": line}
+        return _at_detail(route, detail)
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider():
+    """
+    The process-wide provider selected by settings.ROUTING_PROVIDER
+    ("osrm" or "local"); the local graph is loaded on first use.
+    """
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                if settings.ROUTING_PROVIDER == "osrm":
+                    _provider = OSRMProvider()
+                elif settings.ROUTING_PROVIDER == "local":
+                    _provider = LocalGraphProvider(settings.ROUTING_GRAPH_PATH)
+                else:
+                    raise ImproperlyConfigured(
+                        f"Unknown ROUTING_PROVIDER {settings.ROUTING_PROVIDER!r}."
+                    )
+    return _provider
@@ -1,14 +1,98 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import Trip, LogSheet
+from .models import Trip, LogSheet, RouteJob
 
 class LogSheetSerializer(serializers.ModelSerializer):
     class Meta:
         model = LogSheet
-        fields = '__all__'
+        # The full day payload is served by the generate_logs endpoint.
+        exclude = ('data', 'content_hash')
+
+class TripStopSerializer(serializers.Serializer):
+    """
+    One extra stop of a multi-stop trip; `minutes` defaults to
+    PICKUP_MINUTES or DROPOFF_MINUTES for its type.
+    """
+    location = serializers.CharField(max_length=255)
+    type = serializers.ChoiceField(choices=("pickup", "dropoff"))
+    minutes = serializers.IntegerField(required=False, min_value=0, max_value=24 * 60)
 
 class TripSerializer(serializers.ModelSerializer):
+    """
+    Pass `fields` to restrict the output to those field names and
+    `expand` to choose which nested relations ("logs") are included;
+    by default every field and relation is serialized.
+    """
     logs = LogSheetSerializer(many=True, read_only=True)
+    stops = serializers.ListField(
+        child=TripStopSerializer(), required=False, max_length=settings.MAX_TRIP_STOPS,
+    )
+
+    # Nested relations that can be left out with `expand`.
+    EXPANDABLE = ('logs',)
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields) - {'id'}:
+                self.fields.pop(name)
+        if expand is not None:
+            for name in set(self.EXPANDABLE) - set(expand):
+                self.fields.pop(name, None)
 
     class Meta:
         model = Trip
-        fields = '__all__'
\ No newline at end of file
+        # Bulky route payloads are served by the route_map endpoint instead.
+        exclude = ('route_geometry', 'route_instructions', 'route_legs', 'route_steps', 'logs_fingerprint')
+        read_only_fields = (
+            'route_status',
+            'route_distance',
+            'route_duration',
+            'route_map_url',
+            'route_error',
+            'route_updated_at',
+        )
+        extra_kwargs = {'current_cycle_hours': {'min_value': 0}}
+
+class RouteJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RouteJob
+        fields = ('id', 'status', 'attempts', 'error', 'created_at', 'started_at', 'finished_at')
+
+class MatrixRequestSerializer(serializers.Serializer):
+    """
+    Place names or "lat,lon" strings to measure between, at most
+    MATRIX_MAX_CELLS sources x destinations per request.
+    """
+    sources = serializers.ListField(child=serializers.CharField(max_length=255), allow_empty=False)
+    destinations = serializers.ListField(child=serializers.CharField(max_length=255), allow_empty=False)
+
+    def validate(self, attrs):
+        cells = len(attrs["sources"]) * len(attrs["destinations"])
+        if cells > settings.MATRIX_MAX_CELLS:
+            raise serializers.ValidationError(
+                f"At most {settings.MATRIX_MAX_CELLS} sources x destinations per request."
+            )
+        return attrs
+
+class BatchLogRequestSerializer(serializers.Serializer):
+    """
+    Either explicit `trip_ids`, or a `driver_id` with an optional
+    `start`/`end` range on the trip creation date.
+    """
+    trip_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False,
+        max_length=settings.BATCH_LOG_MAX_TRIPS,
+    )
+    driver_id = serializers.IntegerField(required=False)
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if ("trip_ids" in attrs) == ("driver_id" in attrs):
+            raise serializers.ValidationError("Provide either trip_ids or driver_id.")
+        if "trip_ids" in attrs and ("start" in attrs or "end" in attrs):
+            raise serializers.ValidationError("start/end apply only with driver_id.")
+        if attrs.get("start") and attrs.get("end") and attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError("start must not be after end.")
+        return attrs
@@ -1,3 +1,631 @@
-from django.test import TestCase
+import asyncio
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from . import geometry, hos, jobs, ledger, pdf, routing, upstream, utils
+from .cache import SingleFlight
+from .ratelimit import SharedRateLimiter
+from .models import LogSheet, RouteJob, RouteStatus, Trip
+from .serializers import TripSerializer
+from .views import AsyncTripAPIView
 
-# Create your tests here.
+PLACES = ("40.0,-90.0", "40.5,-89.5", "41.0,-89.0")
+
+
+def _osrm_route(params):
+    """
+    An OSRM route response over PLACES honouring the requested detail: a
+    wiggly 600-point line, with one step per leg when steps are asked for.
+    """
+    line = [[-90.0 + index / 600, 40.0 + index / 600 + 0.01 * math.sin(index / 3)] for index in range(601)]
+    steps = params["steps"] == "true"
+    legs = [
+        {
+            "distance": 60000.0, "duration": 3600.0,
+            "steps": [{"name": "I-55", "distance": 60000.0, "duration": 3600.0,
+                       "maneuver": {"type": "depart"}}] if steps else [],
+        }
+        for _ in range(2)
+    ]
+    route = {"distance": 120000.0, "duration": 7200.0, "legs": legs}
+    if params["overview"] != "false":
+        route["geometry"] = {"type": "LineString", "coordinates": line}
+    return SimpleNamespace(status_code=200, json=lambda: {"code": "Ok", "routes": [route]})
+
+
+def _events(schedule, kind):
+    return [(event["start"], event["end"]) for event in schedule.events if event["type"] == kind]
+
+
+def _driving_runs(schedule):
+    return [(start, end) for start, end, status in schedule.segments if status == hos.DRIVING]
+
+
+class PlanTripTests(SimpleTestCase):
+    """
+    plan_trip() from 06:00 with fuel stops out of the way.
+    """
+
+    def plan(self, legs, stops, **kwargs):
+        return hos.plan_trip(legs, stops, start_minute=360, fuel_interval=10 ** 6, **kwargs)
+
+    def test_break_after_eight_hours_driving(self):
+        schedule = self.plan([(1200, 1200)], [("dropoff", 60)])
+        self.assertEqual(_events(schedule, "break")[0], (840, 870))
+        self.assertEqual(_driving_runs(schedule)[0], (360, 840))
+        self.assertIn((840, 870, hos.BREAK), schedule.segments)
+
+    def test_rest_after_eleven_hours_driving(self):
+        schedule = self.plan([(1200, 1200)], [("dropoff", 60)])
+        rest_start, rest_end = _events(schedule, "rest")[0]
+        driven = sum(min(end, rest_start) - start for start, end in _driving_runs(schedule) if start < rest_start)
+        self.assertEqual(driven, hos.MAX_DRIVING)
+        self.assertEqual(rest_end - rest_start, hos.DAILY_RESET)
+        self.assertIn((rest_start, rest_end, hos.SLEEPER_BERTH), schedule.segments)
+
+    def test_fourteen_hour_window_ends_the_shift(self):
+        # Five hours loading open the window, leaving nine on-duty hours.
+        schedule = self.plan([(0, 0), (600, 600)], [("pickup", 300), ("dropoff", 60)])
+        self.assertEqual(_events(schedule, "rest")[0], (360 + hos.DUTY_WINDOW, 360 + hos.DUTY_WINDOW + hos.DAILY_RESET))
+        # The pickup counts as the 30-minute break, so the first one comes
+        # eight driving hours after it.
+        self.assertEqual(_events(schedule, "break")[0], (660 + hos.DRIVING_BEFORE_BREAK, 660 + 510))
+
+    def test_cycle_limit_forces_a_34_hour_restart(self):
+        schedule = self.plan([(300, 300)], [("dropoff", 60)], prior_daily_on_duty=[600] * 7)
+        self.assertEqual(_events(schedule, "restart"), [(360, 360 + hos.RESTART_LENGTH)])
+        self.assertEqual(_driving_runs(schedule)[0][0], 360 + hos.RESTART_LENGTH)
+        # Only the on-duty time after the restart counts toward the new cycle.
+        self.assertEqual(schedule.on_duty_in_window(schedule.days - 1, hos.CYCLE_DAYS), 360)
+        self.assertEqual(schedule.cycle_index(schedule.days - 1), 2)
+
+    def test_cycle_limit_allows_driving_up_to_seventy_hours(self):
+        # The window is today and the seven days before it: the oldest
+        # prior day has rolled out, leaving 700 minutes for a 360-minute trip.
+        schedule = self.plan([(300, 300)], [("dropoff", 60)], prior_daily_on_duty=[600] + [500] * 7)
+        self.assertEqual(_events(schedule, "restart"), [])
+        self.assertEqual(schedule.on_duty_in_window(0, hos.CYCLE_DAYS), 3500 + 360)
+
+        # With 100 minutes left the restart comes mid-leg.
+        schedule = self.plan([(300, 300)], [("dropoff", 60)], prior_daily_on_duty=[600] * 6 + [500])
+        self.assertEqual(_events(schedule, "restart"), [(460, 460 + hos.RESTART_LENGTH)])
+        self.assertEqual(_driving_runs(schedule)[0], (360, 460))
+
+
+class CycleWindowTests(SimpleTestCase):
+    def test_window_counts_every_prior_day_it_covers(self):
+        schedule = hos.plan_trip([(2400, 2400)], [("dropoff", 60)], prior_daily_on_duty=[100, 200, 300])
+        self.assertGreaterEqual(schedule.days, 3)
+        on_duty = schedule.status_minutes[:, list(hos.ON_DUTY_STATUSES)].sum(axis=1)
+        # Days -5..2: all three prior days plus the trip's first three.
+        self.assertEqual(schedule.on_duty_in_window(2, 8), 600 + on_duty[:3].sum())
+        # Days -4..3 on a four-day schedule.
+        idle = hos.DutySchedule([(0, 4 * hos.MINUTES_PER_DAY, hos.OFF_DUTY)], [], {}, [100, 200, 300], [])
+        self.assertEqual(idle.on_duty_in_window(3, 8), 600)
+        self.assertEqual(idle.on_duty_in_window(3, 6), 500)
+
+    def test_negative_cycle_hours_are_rejected(self):
+        current, pickup, dropoff = PLACES
+        data = {"current_location": current, "pickup_location": pickup, "dropoff_location": dropoff}
+        self.assertFalse(TripSerializer(data={**data, "current_cycle_hours": -1}).is_valid())
+        self.assertTrue(TripSerializer(data={**data, "current_cycle_hours": 0}).is_valid())
+
+
+class GeometryTests(SimpleTestCase):
+    def test_simplify_short_lines_unchanged(self):
+        self.assertEqual(geometry.simplify([], 0.1), [])
+        self.assertEqual(geometry.simplify([[1, 2]], 0.1), [[1.0, 2.0]])
+        self.assertEqual(geometry.simplify([[1, 2], [3, 4]], 0.1), [[1.0, 2.0], [3.0, 4.0]])
+
+    def test_simplify_zero_tolerance_keeps_every_point(self):
+        line = [[0, 0], [1, 0], [2, 0], [3, 0.5]]
+        self.assertEqual(geometry.simplify(line, 0), [[float(x), float(y)] for x, y in line])
+
+    def test_simplify_drops_points_within_tolerance(self):
+        line = [[0, 0], [1, 0.05], [2, -0.05], [3, 1], [4, 1.02], [5, 1]]
+        self.assertEqual(geometry.simplify(line, 0.1), [[0, 0], [2, -0.05], [3, 1], [5, 1]])
+
+    def test_simplify_closed_loop_measures_from_the_shared_endpoint(self):
+        loop = [[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]
+        # The far corner is kept; with a chord of zero length, distances
+        # are to the endpoint itself.
+        self.assertEqual(geometry.simplify(loop, 0.5), [[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]])
+        self.assertEqual(geometry.simplify(loop, 2), [[0, 0], [0, 0]])
+        self.assertEqual(geometry.simplify([[0, 0], [0.01, 0.01], [0, 0]], 0.1), [[0, 0], [0, 0]])
+
+    def test_encode_polyline_matches_google_reference(self):
+        line = [[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]]
+        self.assertEqual(geometry.encode_polyline(line), "_p~iF~ps|U_ulLnnqC_mqNvxq`@")
+        self.assertEqual(geometry.encode_polyline([]), "")
+
+
+class StatusGridTests(SimpleTestCase):
+    def test_hour_takes_majority_status_and_lower_code_on_ties(self):
+        segments = [(0, 30, hos.OFF_DUTY), (30, 60, hos.DRIVING), (60, 100, hos.ON_DUTY), (100, 1440, hos.OFF_DUTY)]
+        hours = utils.hour_statuses(segments)
+        self.assertEqual(hours[:3], [hos.OFF_DUTY, hos.ON_DUTY, hos.OFF_DUTY])
+        grid = utils.status_grid(segments)
+        self.assertEqual(grid[hos.ON_DUTY][1], hos.ON_DUTY)
+        self.assertEqual([row[0] for row in grid], [hos.OFF_DUTY, None, None, None, None])
+
+
+class OSRMMixin:
+    """
+    Routes through a stubbed OSRM server (see _osrm_route) with empty caches.
+    """
+
+    def setUp(self):
+        super().setUp()
+        utils._route_cache.clear()
+        self.osrm = mock.Mock(get=mock.Mock(side_effect=lambda path, params: _osrm_route(params)))
+        for patcher in (
+            mock.patch.object(upstream, "osrm", self.osrm),
+            mock.patch.object(routing, "_provider", routing.OSRMProvider()),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class RouteJobTests(OSRMMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        current, pickup, dropoff = PLACES
+        self.stops = [
+            {"location": "40.2,-89.8", "type": "pickup"},
+            {"location": "40.7,-89.2", "type": "dropoff"},
+        ]
+        self.trip = Trip.objects.create(
+            current_location=current, pickup_location=pickup, dropoff_location=dropoff,
+            stops=self.stops, optimize_stops=True, current_cycle_hours=0, route_status=RouteStatus.PENDING,
+        )
+        optimize = mock.patch.object(jobs, "optimize_stops", lambda trip: trip.stops[::-1])
+        optimize.start()
+        self.addCleanup(optimize.stop)
+
+    def test_optimized_stops_are_stored_with_the_route(self):
+        job = RouteJob.objects.create(trip=self.trip)
+        jobs.run_route_job(job.pk)
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.route_status, RouteStatus.READY)
+        self.assertEqual(self.trip.stops, self.stops[::-1])
+
+    def test_edit_during_routing_keeps_the_new_stops(self):
+        edited = [{"location": "40.9,-89.1", "type": "dropoff"}]
+        job = RouteJob.objects.create(trip=self.trip)
+
+        def edit_while_optimizing(trip):
+            # The driver saves new stops while the job is still working.
+            Trip.objects.filter(pk=trip.pk).update(stops=edited)
+            RouteJob.objects.create(trip=trip)
+            return trip.stops[::-1]
+
+        with mock.patch.object(jobs, "optimize_stops", edit_while_optimizing):
+            jobs.run_route_job(job.pk)
+        self.trip.refresh_from_db()
+        job.refresh_from_db()
+        self.assertEqual(job.status, RouteJob.Status.SUPERSEDED)
+        self.assertEqual(self.trip.stops, edited)
+        self.assertNotEqual(self.trip.route_status, RouteStatus.READY)
+
+
+class ConditionalGetTests(OSRMMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.driver = get_user_model().objects.create_user(username="driver", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.driver)
+        current, pickup, dropoff = PLACES
+        self.trip = Trip.objects.create(
+            driver=self.driver, current_location=current, pickup_location=pickup,
+            dropoff_location=dropoff, current_cycle_hours=10, route_status=RouteStatus.PENDING,
+        )
+        jobs.run_route_job(RouteJob.objects.create(trip=self.trip).pk)
+
+    def url(self, name):
+        return f"/api/trips/{self.trip.pk}/{name}/"
+
+    def test_repeat_get_is_not_modified(self):
+        for name in ("route_map", "route_steps", "generate_logs"):
+            response = self.client.get(self.url(name))
+            self.assertEqual(response.status_code, 200)
+            etag = response["ETag"]
+            with mock.patch("tripplanner.views.get_route") as get_route, \
+                    mock.patch("tripplanner.views.trip_daily_logs") as trip_daily_logs:
+                for tag in (etag, f"W/{etag}", f'"other", {etag}'):
+                    response = self.client.get(self.url(name), HTTP_IF_NONE_MATCH=tag)
+                    self.assertEqual(response.status_code, 304, (name, tag))
+                    self.assertEqual(response.content, b"")
+                    self.assertEqual(response["ETag"], etag)
+            get_route.assert_not_called()
+            trip_daily_logs.assert_not_called()
+
+    def test_stale_tag_gets_the_full_response(self):
+        response = self.client.get(self.url("route_map"), HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data["distance"])
+
+    def test_editing_the_trip_changes_the_tag(self):
+        etags = [self.client.get(self.url("generate_logs"))["ETag"]]
+        for change in (
+            {"stops": [{"location": "40.7,-89.2", "type": "dropoff"}]},
+            {"stops": [{"location": "40.7,-89.2", "type": "dropoff", "minutes": 30}]},
+            {"dropoff_location": "41.2,-88.8"},
+        ):
+            self.assertEqual(self.client.patch(f"/api/trips/{self.trip.pk}/", change, format="json").status_code, 200)
+            etags.append(self.client.get(self.url("generate_logs"))["ETag"])
+        self.assertEqual(len(set(etags)), len(etags))
+        # Same inputs and route state, same tag.
+        self.assertEqual(self.client.get(self.url("generate_logs"))["ETag"], etags[-1])
+
+
+class RouteDetailTests(OSRMMixin, SimpleTestCase):
+
+    def test_stored_overview_matches_live_overview(self):
+        stored = utils.get_route(*PLACES, detail="full")
+        live = utils.get_route(*PLACES, detail="overview")
+        self.assertEqual(utils.trim_route(stored, "overview"), live)
+        self.assertLess(len(live["geometry"]["coordinates"]), len(stored["geometry"]["coordinates"]))
+
+    def test_stored_summary_matches_live_summary(self):
+        stored = utils.get_route(*PLACES, detail="full")
+        self.assertEqual(utils.trim_route(stored, "summary"), utils.get_route(*PLACES, detail="summary"))
+
+
+class StoredRouteStepsTests(OSRMMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.driver = get_user_model().objects.create_user(username="driver", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.driver)
+
+    def _trip(self):
+        current, pickup, dropoff = PLACES
+        return Trip.objects.create(
+            driver=self.driver, current_location=current, pickup_location=pickup,
+            dropoff_location=dropoff, current_cycle_hours=10, route_status=RouteStatus.PENDING,
+        )
+
+    def test_ready_trip_serves_stored_steps(self):
+        trip = self._trip()
+        jobs.run_route_job(RouteJob.objects.create(trip=trip).pk)
+        live = utils.get_route_steps(*PLACES)[0:10]
+
+        utils._route_cache.clear()
+        self.osrm.get.reset_mock()
+        response = self.client.get(f"/api/trips/{trip.pk}/route_steps/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"], live)
+        self.assertEqual(response.data["count"], 2)
+        self.osrm.get.assert_not_called()
+
+    def test_pending_trip_routes_live(self):
+        trip = self._trip()
+        response = self.client.get(f"/api/trips/{trip.pk}/route_steps/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 2)
+        self.osrm.get.assert_called()
+
+
+def _recomputed_cycle(sheets, day):
+    """
+    (on-duty minutes in the cycle, restart completed) at the end of `day`,
+    from a minute-by-minute timeline of {date: segments} log sheets.
+    """
+    first = min(sheets)
+    if day < first:
+        return 0, False
+    on_duty = []
+    for offset in range((day - first).days + 1):
+        minutes = [False] * hos.MINUTES_PER_DAY
+        for start, end, status in sheets.get(first + timedelta(days=offset), ()):
+            if status in hos.ON_DUTY_STATUSES:
+                minutes[start:end] = [True] * (end - start)
+        on_duty += minutes
+    off_since = restart_end = 0
+    for minute, working in enumerate(on_duty):
+        if working:
+            if minute - off_since >= hos.RESTART_LENGTH:
+                restart_end = minute
+            off_since = minute + 1
+    if len(on_duty) - off_since >= hos.RESTART_LENGTH:
+        return 0, True
+    window_start = max(0, len(on_duty) - hos.CYCLE_DAYS * hos.MINUTES_PER_DAY)
+    return sum(on_duty[max(window_start, restart_end):]), False
+
+
+class DutyStatusTests(TestCase):
+    def setUp(self):
+        self.driver = get_user_model().objects.create_user(username="driver", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.driver)
+
+    def test_matches_recomputation_from_log_sheets(self):
+        rng = random.Random(7)
+        start = date(2026, 3, 1)
+        trips = [
+            Trip.objects.create(
+                driver=self.driver, current_location=place, pickup_location=place,
+                dropoff_location=place, current_cycle_hours=0,
+            )
+            for place in PLACES[:2]
+        ]
+        sheets, days = {}, {trip.pk: 0 for trip in trips}
+        for offset in range(30):
+            # Some stretches off duty long enough for a 34-hour restart.
+            if rng.random() < 0.25:
+                continue
+            begin = rng.randrange(0, 720, 30)
+            middle = begin + rng.randrange(240, 480, 30)
+            end = middle + 30 + rng.randrange(60, 400, 30)
+            segments = [
+                [0, begin, hos.OFF_DUTY], [begin, middle, hos.DRIVING], [middle, middle + 30, hos.OFF_DUTY],
+                [middle + 30, end, hos.ON_DUTY], [end, hos.MINUTES_PER_DAY, hos.SLEEPER_BERTH],
+            ]
+            log_date = start + timedelta(days=offset)
+            sheets[log_date] = segments
+            trip = rng.choice(trips)
+            days[trip.pk] += 1
+            LogSheet.objects.create(
+                trip=trip, day=days[trip.pk], log_date=log_date, rest_periods=0, data={"segments": segments},
+            )
+        ledger.rebuild_duty_days(self.driver.pk)
+
+        restarts = 0
+        for offset in range(-1, 34):
+            day = start + timedelta(days=offset)
+            used, restarted = _recomputed_cycle(sheets, day)
+            restarts += restarted
+            response = self.client.get("/api/duty_status/", {"date": day.isoformat()})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data["cycle_used_hours"], used / 60, day)
+            self.assertEqual(response.data["available_hours"], max(0, hos.CYCLE_LIMIT - used) / 60, day)
+            self.assertEqual(response.data["restart_completed"], restarted, day)
+        self.assertTrue(restarts)
+
+    def test_rejects_malformed_date(self):
+        response = self.client.get("/api/duty_status/", {"date": "03/01/2026"})
+        self.assertEqual(response.status_code, 400)
+
+
+class SharedRateLimiterTests(SimpleTestCase):
+    def test_async_acquire_keeps_sqlite_off_the_event_loop(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        limiter = SharedRateLimiter("test", rate=20, burst=1, path=os.path.join(directory.name, "buckets.sqlite3"))
+        threads = []
+        acquire = limiter._try_acquire
+
+        def try_acquire():
+            threads.append(threading.get_ident())
+            return acquire()
+
+        async def acquire_two():
+            with mock.patch.object(limiter, "_try_acquire", try_acquire):
+                for _ in range(2):
+                    await limiter.acquire_async()
+            return threading.get_ident()
+
+        loop_thread = asyncio.run(acquire_two())
+        # The second token is due 50ms after the first, so there is a retry.
+        self.assertGreaterEqual(len(threads), 3)
+        self.assertNotIn(loop_thread, threads)
+
+
+class TripImportTests(TestCase):
+    def setUp(self):
+        self.driver = get_user_model().objects.create_user(username="driver", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.driver)
+
+    def upload(self, *lines):
+        return self.client.post(
+            "/api/trips/import/", b"".join(lines), content_type="application/x-ndjson",
+        )
+
+    def trip_line(self):
+        current, pickup, dropoff = PLACES
+        return (
+            b'{"current_location": "%s", "pickup_location": "%s", "dropoff_location": "%s", '
+            b'"current_cycle_hours": 5}\n' % (current.encode(), pickup.encode(), dropoff.encode())
+        )
+
+    def test_late_unreadable_line_keeps_earlier_rows(self):
+        response = self.upload(self.trip_line(), b'{"current_location": "\xff"}\n', self.trip_line())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual(response.data["errors"], [
+            {"line": 2, "errors": {"non_field_errors": ["Line 2 is not valid UTF-8."]}},
+        ])
+        self.assertIn("detail", response.data)
+        self.assertEqual(list(Trip.objects.values_list("pk", flat=True)), response.data["trip_ids"])
+
+    def test_unreadable_upload_creates_nothing(self):
+        response = self.upload(b"\xff\n", self.trip_line())
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["created"], 0)
+        self.assertFalse(Trip.objects.exists())
+
+
+class LogPDFCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache_dir = directory.name
+        settings = override_settings(
+            LOG_PDF_CACHE_DIR=self.cache_dir, LOG_PDF_CACHE_MAX_FILES=3, LOG_PDF_CACHE_MAX_AGE_DAYS=1,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        render = mock.patch.object(pdf, "render_logs_pdf", lambda logs, path: open(path, "wb").close())
+        render.start()
+        self.addCleanup(render.stop)
+
+    def cached(self, name, age_hours):
+        path = os.path.join(self.cache_dir, name)
+        open(path, "wb").close()
+        then = time.time() - age_hours * 60 * 60
+        os.utime(path, (then, then))
+        return name
+
+    def test_renders_prune_stale_and_least_recently_used_files(self):
+        expired = self.cached("expired.pdf", 30)
+        leftover = self.cached("leftover.pdf.tmp", 30)
+        oldest = self.cached("oldest.pdf", 3)
+        older = self.cached("older.pdf", 2)
+        hit_logs = [{"day": 1}]
+        hit = os.path.basename(pdf.cached_logs_pdf(hit_logs))
+        self.cached(hit, 5)
+
+        # The hit refreshes its file, so the oldest unused PDF goes instead.
+        self.assertEqual(os.path.basename(pdf.cached_logs_pdf(hit_logs)), hit)
+        fresh = os.path.basename(pdf.cached_logs_pdf([{"day": 2}]))
+        remaining = set(os.listdir(self.cache_dir))
+        self.assertEqual(remaining, {older, hit, fresh})
+        self.assertFalse({expired, leftover, oldest} & remaining)
+
+
+class AsyncTripAPIViewTests(TestCase):
+    async def test_base_view_answers_method_not_allowed(self):
+        driver = await get_user_model().objects.acreate(username="driver")
+        current, pickup, dropoff = PLACES
+        trip = await Trip.objects.acreate(
+            driver=driver, current_location=current, pickup_location=pickup,
+            dropoff_location=dropoff, current_cycle_hours=0,
+        )
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(driver)}")
+        response = await AsyncTripAPIView.as_view()(request, trip_id=trip.pk)
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response["Allow"], "")
+
+
+class CircuitBreakerTrialTests(SimpleTestCase):
+    """
+    A half-open breaker's single trial slot is freed however the trial ends.
+    """
+
+    def half_open_breaker(self):
+        breaker = upstream.CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, upstream.CircuitBreaker.HALF_OPEN)
+        return breaker
+
+    def test_cancelled_async_trial_frees_the_slot(self):
+        breaker = self.half_open_breaker()
+        client = upstream.AsyncUpstreamClient("test", "http://upstream.test", breaker=breaker, max_retries=0)
+        started = asyncio.Event()
+
+        async def hang(url, params=None):
+            started.set()
+            await asyncio.sleep(60)
+
+        async def cancel_trial():
+            with mock.patch.object(client, "_client", lambda: SimpleNamespace(get=hang)):
+                task = asyncio.ensure_future(client.get("route"))
+                await started.wait()
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+
+        asyncio.run(cancel_trial())
+        self.assertTrue(breaker.allow())
+
+    def test_unexpected_sync_error_frees_the_slot(self):
+        breaker = self.half_open_breaker()
+        client = upstream.UpstreamClient("test", "http://upstream.test", breaker=breaker, max_retries=0)
+        with mock.patch.object(client.session, "get", side_effect=ValueError("bad params")):
+            with self.assertRaises(ValueError):
+                client.get("route")
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_cancelled_leader_hands_over_to_a_follower(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append("fetch")
+            await asyncio.sleep(0.01)
+            return "route"
+
+        async def cancel_leader():
+            leader = asyncio.ensure_future(flight.do_async("key", fetch))
+            await asyncio.sleep(0)
+            followers = [asyncio.ensure_future(flight.do_async("key", fetch)) for _ in range(3)]
+            await asyncio.sleep(0)
+            leader.cancel()
+            results = await asyncio.gather(*followers, return_exceptions=True)
+            return leader, results
+
+        leader, results = asyncio.run(cancel_leader())
+        self.assertTrue(leader.cancelled())
+        self.assertEqual(results, ["route"] * 3)
+        # One follower took over; the others shared its call.
+        self.assertEqual(len(calls), 2)
+
+
+class TripListTests(TestCase):
+    def setUp(self):
+        self.driver = get_user_model().objects.create_user(username="driver", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.driver)
+        current, pickup, dropoff = PLACES
+        self.trips = [
+            Trip.objects.create(
+                driver=self.driver, current_location=current, pickup_location=pickup,
+                dropoff_location=dropoff, current_cycle_hours=0,
+            )
+            for _ in range(7)
+        ]
+        # Ties on created_at: three trips share one instant, four another.
+        now = timezone.now()
+        Trip.objects.filter(pk__in=[trip.pk for trip in self.trips[:3]]).update(created_at=now)
+        Trip.objects.filter(pk__in=[trip.pk for trip in self.trips[3:]]).update(created_at=now - timedelta(hours=1))
+        for trip in self.trips[:2]:
+            LogSheet.objects.create(trip=trip, day=1, log_date=date(2026, 3, 1), rest_periods=10)
+
+    def test_cursor_walks_every_trip_once_across_ties(self):
+        seen = []
+        url = "/api/trips/?page_size=2&fields=id"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [trip["id"] for trip in response.data["results"]]
+            url = response.data["next"]
+        newest_first = sorted(self.trips[:3], key=lambda trip: -trip.pk) + sorted(self.trips[3:], key=lambda trip: -trip.pk)
+        self.assertEqual(seen, [trip.pk for trip in newest_first])
+
+    def test_unknown_fields_are_ignored(self):
+        response = self.client.get("/api/trips/", {"fields": "pickup_location,no_such_field"})
+        self.assertEqual(response.status_code, 200)
+        for trip in response.data["results"]:
+            self.assertEqual(set(trip), {"id", "pickup_location"})
+
+    def test_logs_are_only_queried_when_expanded(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/trips/")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("logs", response.data["results"][0])
+        self.assertFalse([query for query in queries if "tripplanner_logsheet" in query["sql"]])
+        with self.assertNumQueries(1):
+            self.client.get("/api/trips/")
+
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/trips/", {"expand": "logs"})
+        logs = {trip["id"]: trip["logs"] for trip in response.data["results"]}
+        self.assertEqual(len(logs[self.trips[0].pk]), 1)
+        self.assertEqual(logs[self.trips[5].pk], [])
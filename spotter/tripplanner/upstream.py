@@ -0,0 +1,271 @@
+import asyncio
+import random
+import threading
+import time
+import weakref
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from .ratelimit import make_rate_limiter
+
+# Statuses worth retrying: throttling and transient server-side failures.
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class UpstreamError(Exception):
+    """
+    An upstream service could not be reached or kept failing after retries.
+    """
+
+
+class CircuitOpenError(UpstreamError):
+    """
+    Raised without contacting the upstream while its circuit breaker is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker. After `failure_threshold` consecutive
+    failures the circuit opens and calls fail fast for `reset_timeout`
+    seconds; the next call is then let through as a trial (half-open) and
+    its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now):
+        if self._opened_at is None:
+            return self.CLOSED
+        if now - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        with self._lock:
+            state = self._state(time.monotonic())
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class _BaseClient:
+    """
+    Retry, timeout, rate-limit and circuit-breaker policy shared by the
+    sync and async clients for one upstream host.
+    """
+
+    def __init__(self, name, base_url, headers=None, rate_limiter=None,
+                 timeout=None, max_retries=None, backoff_base=None,
+                 backoff_max=None, pool_size=None, breaker=None):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.headers = dict(headers or {})
+        self.rate_limiter = rate_limiter
+        self.timeout = timeout or (settings.UPSTREAM_CONNECT_TIMEOUT, settings.UPSTREAM_READ_TIMEOUT)
+        self.max_retries = settings.UPSTREAM_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = settings.UPSTREAM_BACKOFF_BASE if backoff_base is None else backoff_base
+        self.backoff_max = settings.UPSTREAM_BACKOFF_MAX if backoff_max is None else backoff_max
+        self.pool_size = pool_size or settings.UPSTREAM_POOL_SIZE
+        self.breaker = breaker or CircuitBreaker(
+            settings.UPSTREAM_BREAKER_THRESHOLD, settings.UPSTREAM_BREAKER_RESET
+        )
+
+    def _url(self, path):
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+
+    def _unsettled(self):
+        """
+        Count an attempt that ended without an outcome (cancelled, or an
+        unexpected exception) as a failure, freeing a half-open trial slot.
+        """
+        self.breaker.record_failure()
+
+    def _exhausted(self, last_error):
+        self.breaker.record_failure()
+        return UpstreamError(f"{self.name} request failed after {self.max_retries + 1} attempt(s): {last_error}")
+
+
+class UpstreamClient(_BaseClient):
+    """
+    Keep-alive HTTP client for one upstream host. Connections are pooled
+    per client, every attempt carries a (connect, read) timeout, transient
+    failures are retried with full-jitter exponential backoff, and a
+    circuit breaker stops hammering a host that keeps failing.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        # Retries are handled here so backoff and the breaker see every attempt.
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, path, params=None):
+        """
+        GET `path` relative to the base URL. Returns the response for any
+        non-retryable status (callers check it); raises UpstreamError once
+        retries are exhausted and CircuitOpenError while the breaker is open.
+        """
+        self._check_breaker()
+        try:
+            return self._get(path, params)
+        except UpstreamError:
+            raise
+        except BaseException:
+            self._unsettled()
+            raise
+
+    def _get(self, path, params):
+        url = self._url(path)
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self._backoff(attempt - 1))
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = e
+                continue
+            except requests.RequestException as e:
+                self.breaker.record_failure()
+                raise UpstreamError(f"{self.name} request failed: {e}") from e
+            if response.status_code in RETRY_STATUSES:
+                last_error = f"HTTP {response.status_code}"
+                continue
+            self.breaker.record_success()
+            return response
+        raise self._exhausted(last_error)
+
+
+class AsyncUpstreamClient(_BaseClient):
+    """
+    asyncio counterpart of UpstreamClient built on httpx. Each event loop
+    gets its own pooled httpx.AsyncClient; pass the sync client's `breaker`
+    and `rate_limiter` so both share one view of the host's health and rate.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._clients = weakref.WeakKeyDictionary()
+
+    def _client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            connect, read = self.timeout
+            client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=httpx.Timeout(read, connect=connect),
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                ),
+            )
+            self._clients[loop] = client
+        return client
+
+    async def get(self, path, params=None):
+        """
+        Async GET with the same retry and breaker semantics as UpstreamClient.get.
+        """
+        self._check_breaker()
+        try:
+            return await self._get(path, params)
+        except UpstreamError:
+            raise
+        except BaseException:
+            # Includes cancellation, e.g. a client disconnecting mid-request.
+            self._unsettled()
+            raise
+
+    async def _get(self, path, params):
+        url = self._url(path)
+        client = self._client()
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                await asyncio.sleep(self._backoff(attempt - 1))
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async()
+            try:
+                response = await client.get(url, params=params)
+            except httpx.TransportError as e:
+                last_error = e
+                continue
+            except httpx.HTTPError as e:
+                self.breaker.record_failure()
+                raise UpstreamError(f"{self.name} request failed: {e}") from e
+            if response.status_code in RETRY_STATUSES:
+                last_error = f"HTTP {response.status_code}"
+                continue
+            self.breaker.record_success()
+            return response
+        raise self._exhausted(last_error)
+
+
+nominatim = UpstreamClient(
+    "Nominatim",
+    settings.NOMINATIM_URL,
+    headers={"User-Agent": settings.NOMINATIM_USER_AGENT},
+    rate_limiter=make_rate_limiter("nominatim", settings.NOMINATIM_RATE_LIMIT, burst=settings.NOMINATIM_BURST),
+)
+
+osrm = UpstreamClient(
+    "OSRM",
+    settings.OSRM_URL,
+    rate_limiter=make_rate_limiter("osrm", settings.OSRM_RATE_LIMIT, burst=settings.OSRM_BURST),
+)
+
+nominatim_async = AsyncUpstreamClient(
+    "Nominatim",
+    settings.NOMINATIM_URL,
+    headers=nominatim.headers,
+    rate_limiter=nominatim.rate_limiter,
+    breaker=nominatim.breaker,
+)
+
+osrm_async = AsyncUpstreamClient(
+    "OSRM", settings.OSRM_URL, rate_limiter=osrm.rate_limiter, breaker=osrm.breaker
+)
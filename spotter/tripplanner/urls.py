@@ -1,14 +1,36 @@
 from django.urls import path
 from .views import (
     TripListCreateAPIView,
+    TripImportAPIView,
     TripDetailAPIView,
     RouteMapAPIView,
-    GenerateLogSheetAPIView
+    RouteStepsAPIView,
+    RouteStatusAPIView,
+    GenerateLogSheetAPIView,
+    LogSheetPDFAPIView,
+    DutyStatusAPIView,
+    DistanceMatrixAPIView,
+    PlaceReverseAPIView,
+    PlaceSearchAPIView,
+    BatchGenerateLogSheetAPIView,
+    AsyncRouteMapAPIView,
+    AsyncGenerateLogSheetAPIView,
 )
 
 urlpatterns = [
     path('trips/', TripListCreateAPIView.as_view(), name='trip-list-create'),
+    path('trips/import/', TripImportAPIView.as_view(), name='trip-import'),
+    path('trips/generate_logs/batch/', BatchGenerateLogSheetAPIView.as_view(), name='generate-logsheet-batch'),
     path('trips/<int:pk>/', TripDetailAPIView.as_view(), name='trip-detail'),
     path('trips/<int:trip_id>/route_map/', RouteMapAPIView.as_view(), name='route-map'),
+    path('trips/<int:trip_id>/route_steps/', RouteStepsAPIView.as_view(), name='route-steps'),
+    path('trips/<int:trip_id>/route_status/', RouteStatusAPIView.as_view(), name='route-status'),
     path('trips/<int:trip_id>/generate_logs/', GenerateLogSheetAPIView.as_view(), name='generate-logsheet'),
+    path('trips/<int:trip_id>/logs.pdf', LogSheetPDFAPIView.as_view(), name='logsheet-pdf'),
+    path('duty_status/', DutyStatusAPIView.as_view(), name='duty-status'),
+    path('matrix/', DistanceMatrixAPIView.as_view(), name='distance-matrix'),
+    path('places/', PlaceSearchAPIView.as_view(), name='place-search'),
+    path('places/reverse/', PlaceReverseAPIView.as_view(), name='place-reverse'),
+    path('trips/<int:trip_id>/route_map/async/', AsyncRouteMapAPIView.as_view(), name='route-map-async'),
+    path('trips/<int:trip_id>/generate_logs/async/', AsyncGenerateLogSheetAPIView.as_view(), name='generate-logsheet-async'),
 ]
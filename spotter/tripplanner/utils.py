@@ -1,9 +1,42 @@
 import re
 import io
 import math
-import requests
+import asyncio
+import contextvars
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from itertools import islice
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from django.utils import timezone
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
+from .cache import CacheStats, LRUCache, SingleFlight
+from .models import GeocodeCache
+from .gazetteer import get_gazetteer
+from .geometry import RouteIndex
+from .metrics import span
+from . import hos, routing, upstream
+
+# Two-tier geocode cache: a per-process LRU in front of the GeocodeCache table.
+_geocode_cache = LRUCache(maxsize=settings.GEOCODE_CACHE_SIZE, ttl=settings.GEOCODE_CACHE_TTL)
+_geocode_db_stats = CacheStats()
+_gazetteer_stats = CacheStats()
+# Concurrent misses for the same place share one lookup.
+_geocode_flight = SingleFlight()
+
+# Cold geocodes run on a small bounded pool; the Nominatim client's rate
+# limiter keeps the combined request rate within its usage policy.
+_geocode_executor = ThreadPoolExecutor(
+    max_workers=settings.GEOCODE_MAX_CONCURRENCY, thread_name_prefix="geocode"
+)
+
+# Raw OSRM routes keyed by the rounded coordinate triple, plus an index from
+# caller-supplied tags (trip ids) to the key they last used for invalidation.
+_route_cache = LRUCache(maxsize=settings.ROUTE_CACHE_SIZE, ttl=settings.ROUTE_CACHE_TTL)
+_route_cache_tags = LRUCache(maxsize=settings.ROUTE_CACHE_SIZE * 4, ttl=settings.ROUTE_CACHE_TTL)
+_route_flight = SingleFlight()
 
 def is_coordinate(location):
     """
@@ -12,27 +45,230 @@ def is_coordinate(location):
     pattern = r'^\s*-?\d+(\.\d+)?\s*,\s*-?\d+(\.\d+)?\s*$'
     return re.match(pattern, location) is not None
 
-def geocode(location):
-    # If the location is in coordinate format, parse and return it.
-    if is_coordinate(location):
-        try:
-            lat, lon = map(float, location.split(","))
-            return (lat, lon)
-        except Exception as e:
-            raise Exception(f"Error parsing coordinates: {location}") from e
+def normalize_place(location):
+    """
+    Normalize a place string into a cache key: case-folded, single-spaced.
+    """
+    return " ".join(location.casefold().split())
 
-    # Otherwise, assume it's a place name and call the geocoding API.
-    url = "https://nominatim.openstreetmap.org/search"
-    params = {"q": location, "format": "json", "limit": 1}
-    headers = {
-        "User-Agent": "YourAppName/1.0 (contact@yourdomain.com)"
+def geocode_cache_stats():
+    """
+    Hit/miss/eviction counters for the gazetteer and both geocode cache
+    tiers in this process.
+    """
+    gazetteer = get_gazetteer()
+    return {
+        "gazetteer": dict(_gazetteer_stats.as_dict(), size=len(gazetteer) if gazetteer else 0),
+        "memory": dict(_geocode_cache.stats.as_dict(), size=len(_geocode_cache)),
+        "database": _geocode_db_stats.as_dict(),
+        "coalesced": _geocode_flight.coalesced,
     }
-    response = requests.get(url, params=params, headers=headers)
+
+def _parse_geocode_response(location, response):
     if response.status_code != 200 or not response.json():
         raise Exception(f"Geocoding API error for place: {location}")
     result = response.json()[0]
     return (float(result["lat"]), float(result["lon"]))
 
+def _geocode_upstream(location):
+    """
+    Resolve a place name through the Nominatim search API.
+    """
+    params = {"q": location, "format": "json", "limit": 1}
+    response = upstream.nominatim.get("/search", params=params)
+    return _parse_geocode_response(location, response)
+
+async def _geocode_upstream_async(location):
+    params = {"q": location, "format": "json", "limit": 1}
+    response = await upstream.nominatim_async.get("/search", params=params)
+    return _parse_geocode_response(location, response)
+
+def _parse_coordinates(location):
+    try:
+        lat, lon = map(float, location.split(","))
+        return (lat, lon)
+    except Exception as e:
+        raise Exception(f"Error parsing coordinates: {location}") from e
+
+def _persistable(key):
+    # Keys longer than the column are simply not persisted.
+    return len(key) <= GeocodeCache._meta.get_field("query").max_length
+
+def _is_fresh(row):
+    return row.updated_at >= timezone.now() - timedelta(days=settings.GEOCODE_DB_TTL_DAYS)
+
+def _gazetteer_lookup(location):
+    """
+    Coordinates of a known place from the offline gazetteer, or None.
+    """
+    gazetteer = get_gazetteer()
+    if gazetteer is None:
+        return None
+    coords = gazetteer.lookup(location)
+    if coords is None:
+        _gazetteer_stats.record_miss()
+    else:
+        _gazetteer_stats.record_hit()
+    return coords
+
+def geocode(location):
+    # If the location is in coordinate format, parse and return it.
+    if is_coordinate(location):
+        return _parse_coordinates(location)
+    coords = _gazetteer_lookup(location)
+    if coords is not None:
+        return coords
+
+    key = normalize_place(location)
+    coords = _geocode_cache.get(key)
+    if coords is not None:
+        return coords
+    return _geocode_uncached(location, key)
+
+def _geocode_uncached(location, key):
+    """
+    Resolve a place that missed the in-process tier. Concurrent callers
+    for the same key wait for a single lookup.
+    """
+    return _geocode_flight.do(key, lambda: _resolve_geocode(location, key))
+
+def _resolve_geocode(location, key):
+    """
+    Consult the GeocodeCache table, then Nominatim, and populate both tiers.
+    """
+    # Second tier: the persistent table shared by all workers.
+    persist = _persistable(key)
+    stale = None
+    row = GeocodeCache.objects.filter(query=key).first() if persist else None
+    if row is not None:
+        coords = (row.latitude, row.longitude)
+        if _is_fresh(row):
+            _geocode_db_stats.record_hit()
+            _geocode_cache.set(key, coords)
+            return coords
+        stale = coords
+    _geocode_db_stats.record_miss()
+
+    # Otherwise, assume it's a place name and call the geocoding API.
+    try:
+        coords = _geocode_upstream(location)
+    except Exception:
+        # An expired row is still a better answer than a failed request.
+        if stale is None:
+            raise
+        return stale
+
+    if persist:
+        try:
+            GeocodeCache.objects.update_or_create(
+                query=key, defaults={"latitude": coords[0], "longitude": coords[1]}
+            )
+        except DatabaseError:
+            # Persisting is best-effort; a concurrent writer may hold the row.
+            pass
+    _geocode_cache.set(key, coords)
+    return coords
+
+async def geocode_async(location):
+    """
+    asyncio variant of geocode(): same tiers, async ORM and HTTP client.
+    """
+    if is_coordinate(location):
+        return _parse_coordinates(location)
+    coords = _gazetteer_lookup(location)
+    if coords is not None:
+        return coords
+
+    key = normalize_place(location)
+    coords = _geocode_cache.get(key)
+    if coords is not None:
+        return coords
+    return await _geocode_flight.do_async(key, lambda: _resolve_geocode_async(location, key))
+
+async def _resolve_geocode_async(location, key):
+    persist = _persistable(key)
+    stale = None
+    row = await GeocodeCache.objects.filter(query=key).afirst() if persist else None
+    if row is not None:
+        coords = (row.latitude, row.longitude)
+        if _is_fresh(row):
+            _geocode_db_stats.record_hit()
+            _geocode_cache.set(key, coords)
+            return coords
+        stale = coords
+    _geocode_db_stats.record_miss()
+
+    try:
+        coords = await _geocode_upstream_async(location)
+    except Exception:
+        if stale is None:
+            raise
+        return stale
+
+    if persist:
+        try:
+            await GeocodeCache.objects.aupdate_or_create(
+                query=key, defaults={"latitude": coords[0], "longitude": coords[1]}
+            )
+        except DatabaseError:
+            pass
+    _geocode_cache.set(key, coords)
+    return coords
+
+def _geocode_in_worker(location):
+    try:
+        return _geocode_uncached(location, normalize_place(location))
+    finally:
+        # Pool threads outlive requests, so release their DB connection here.
+        close_old_connections()
+
+def geocode_many(locations):
+    """
+    Geocode several places, resolving distinct cache misses concurrently.
+    Returns coordinates in the same order as `locations`.
+    """
+    resolved = {}
+    pending = []
+    for location in dict.fromkeys(locations):
+        if is_coordinate(location):
+            resolved[location] = geocode(location)
+            continue
+        coords = _gazetteer_lookup(location)
+        if coords is None:
+            coords = _geocode_cache.get(normalize_place(location))
+        if coords is not None:
+            resolved[location] = coords
+        else:
+            pending.append(location)
+
+    if len(pending) == 1:
+        resolved[pending[0]] = _geocode_uncached(pending[0], normalize_place(pending[0]))
+    elif pending:
+        # Run each worker in a copy of this context so its spans reach the request's timings.
+        futures = {
+            location: _geocode_executor.submit(contextvars.copy_context().run, _geocode_in_worker, location)
+            for location in pending
+        }
+        for location, future in futures.items():
+            resolved[location] = future.result()
+    return [resolved[location] for location in locations]
+
+async def geocode_many_async(locations):
+    """
+    asyncio variant of geocode_many(): distinct places are resolved
+    concurrently, at most GEOCODE_MAX_CONCURRENCY at a time.
+    """
+    semaphore = asyncio.Semaphore(settings.GEOCODE_MAX_CONCURRENCY)
+
+    async def resolve(location):
+        async with semaphore:
+            return await geocode_async(location)
+
+    distinct = list(dict.fromkeys(locations))
+    results = await asyncio.gather(*(resolve(location) for location in distinct))
+    resolved = dict(zip(distinct, results))
+    return [resolved[location] for location in locations]
+
 def swap_coordinates(coordinate):
     """
     Given a (lat, lon) tuple, swap it to (lon, lat) as expected by OSRM.
@@ -40,178 +276,407 @@ def swap_coordinates(coordinate):
     lat, lon = coordinate
     return f"{lon},{lat}"
 
-def get_route(current_place, pickup_place, dropoff_place):
-    """
-    Get directions based on real place names.
-    """
-    current_coords = geocode(current_place)
-    pickup_coords = geocode(pickup_place)
-    dropoff_coords = geocode(dropoff_place)
-    
-    current_osrm = swap_coordinates(current_coords)
-    pickup_osrm = swap_coordinates(pickup_coords)
-    dropoff_osrm = swap_coordinates(dropoff_coords)
-    coordinates = f"{current_osrm};{pickup_osrm};{dropoff_osrm}"
-    
-    url = f"http://router.project-osrm.org/route/v1/driving/{coordinates}"
-    params = {"overview": "full", "geometries": "geojson", "steps": "true"}
-    response = requests.get(url, params=params)
-    if response.status_code != 200:
-        raise Exception(f"OSRM API Error: {response.text}")
-    data = response.json()
-    if "routes" not in data or not data["routes"]:
-        raise Exception("No route data received from OSRM API")
-    
-    route = data["routes"][0]
+def route_cache_key(*coords):
+    """
+    Build the route cache key from (lat, lon) pairs rounded to
+    ROUTE_CACHE_PRECISION decimal places (5 places is roughly 1 m).
+    """
+    precision = settings.ROUTE_CACHE_PRECISION
+    return tuple((round(lat, precision), round(lon, precision)) for lat, lon in coords)
+
+def route_cache_stats():
+    """
+    Hit/miss/eviction counters for the route cache in this process.
+    """
+    return dict(_route_cache.stats.as_dict(), size=len(_route_cache), coalesced=_route_flight.coalesced)
+
+def invalidate_route(cache_tag):
+    """
+    Drop the cached routes (at every detail level) last fetched under
+    `cache_tag` (e.g. a trip id).
+    """
+    key = _route_cache_tags.pop(cache_tag)
+    if key is not None:
+        for detail in routing.ROUTE_DETAILS:
+            _route_cache.pop((detail, key))
+
+def _fetch_route(key, coords, detail):
+    route = routing.get_provider().route(coords, detail)
+    _route_cache.set(key, route)
+    return route
+
+async def _fetch_route_async(key, coords, detail):
+    route = await routing.get_provider().route_async(coords, detail)
+    _route_cache.set(key, route)
+    return route
+
+def _raw_route(places, cache_tag, detail):
+    """
+    The provider's raw route between `places` at `detail` and the
+    geocoded waypoints.
+    """
+    with span("geocode"):
+        coords = geocode_many(places)
+    key = route_cache_key(*coords)
+    cache_key = (detail, key)
+    with span("route"):
+        route = _route_cache.get(cache_key)
+        if route is None:
+            route = _route_flight.do(cache_key, lambda: _fetch_route(cache_key, coords, detail))
+    if cache_tag is not None:
+        _route_cache_tags.set(cache_tag, key)
+    return route, coords
+
+def get_route(*places, cache_tag=None, detail="full"):
+    """
+    Get directions through real place names, in order (current location,
+    pickup, any extra stops, dropoff), from the configured routing
+    provider (see tripplanner.routing).
+    The raw route is cached by rounded coordinates and detail level, and
+    concurrent misses for the same key share one upstream request; pass
+    `cache_tag` so the entries can later be dropped with invalidate_route(cache_tag).
+    `detail` is one of routing.ROUTE_DETAILS: "summary" skips the geometry
+    and instructions, "overview" returns a simplified geometry only.
+    """
+    route, coords = _raw_route(places, cache_tag, detail)
+    return _format_route(route, places, coords, detail)
+
+async def get_route_async(*places, cache_tag=None, detail="full"):
+    """
+    asyncio variant of get_route(), sharing its caches.
+    """
+    with span("geocode"):
+        coords = await geocode_many_async(places)
+    key = route_cache_key(*coords)
+    cache_key = (detail, key)
+    with span("route"):
+        route = _route_cache.get(cache_key)
+        if route is None:
+            route = await _route_flight.do_async(cache_key, lambda: _fetch_route_async(cache_key, coords, detail))
+    if cache_tag is not None:
+        _route_cache_tags.set(cache_tag, key)
+    return _format_route(route, places, coords, detail)
+
+def _step_instruction(step, start_place, end_place):
+    maneuver = step.get("maneuver", {})
+    step_type = maneuver.get("type", "")
+    modifier = maneuver.get("modifier", "")
+    road_name = step.get("name", "")
+    step_distance = round(step.get("distance", 0) * 0.000621371, 2)
+    if step_type == "depart":
+        return f"Depart from {start_place} onto {road_name} and continue for {step_distance} miles."
+    if step_type == "arrive":
+        return f"Arrive at {end_place}."
+    if modifier:
+        return f"{step_type.capitalize()} {modifier} onto {road_name} and continue for {step_distance} miles."
+    return f"{step_type.capitalize()} onto {road_name} and continue for {step_distance} miles."
+
+def _leg_places(places, leg_index):
+    return places[leg_index], places[leg_index + 1]
+
+def route_steps(route, places, start=0):
+    """
+    Lazily yield structured step records for a raw route, beginning at
+    step `start` (legs before it are skipped without formatting).
+    """
+    skipped = 0
+    for leg_index, leg in enumerate(route.get("legs", [])):
+        steps = leg.get("steps", [])
+        if skipped + len(steps) <= start:
+            skipped += len(steps)
+            continue
+        start_place, end_place = _leg_places(places, leg_index)
+        first = max(start - skipped, 0)
+        for index, step in enumerate(islice(steps, first, None), skipped + first):
+            maneuver = step.get("maneuver", {})
+            yield {
+                "index": index,
+                "leg": leg_index,
+                "type": maneuver.get("type", ""),
+                "modifier": maneuver.get("modifier", ""),
+                "road": step.get("name", ""),
+                "distance": step.get("distance", 0) * 0.000621371,
+                "duration": step.get("duration", 0) / 3600,
+                "instruction": _step_instruction(step, start_place, end_place),
+            }
+        skipped += len(steps)
+
+class RouteSteps:
+    """
+    Sequence view over a raw route's steps for paginators: len() counts
+    steps without formatting them, and slices format only what they cover.
+    """
+
+    def __init__(self, route, places):
+        self.route = route
+        self.places = places
+
+    @classmethod
+    def from_legs(cls, legs, places):
+        """
+        RouteSteps over steps persisted with leg_steps().
+        """
+        return cls({"legs": [{"steps": steps} for steps in legs]}, places)
+
+    def leg_steps(self):
+        """
+        Each leg's raw steps with only the fields route_steps() reads, for
+        storing on the trip.
+        """
+        return [
+            [
+                {
+                    "name": step.get("name", ""),
+                    "distance": step.get("distance", 0),
+                    "duration": step.get("duration", 0),
+                    "maneuver": {
+                        name: value for name, value in step.get("maneuver", {}).items()
+                        if name in ("type", "modifier")
+                    },
+                }
+                for step in leg.get("steps", [])
+            ]
+            for leg in self.route.get("legs", [])
+        ]
+
+    def __len__(self):
+        return sum(len(leg.get("steps", [])) for leg in self.route.get("legs", []))
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice) or item.step not in (None, 1):
+            raise TypeError("RouteSteps only supports contiguous slices.")
+        start, stop, _ = item.indices(len(self))
+        return list(islice(route_steps(self.route, self.places, start), max(stop - start, 0)))
+
+def get_route_steps(*places, cache_tag=None):
+    """
+    RouteSteps for the full-detail route through the places.
+    """
+    route, _ = _raw_route(places, cache_tag, "full")
+    return RouteSteps(route, places)
+
+def trim_route(route_data, detail):
+    """
+    A stored full-detail get_route() payload at `detail`: the fields it
+    leaves out are dropped and an overview geometry is simplified exactly
+    as the providers simplify it.
+    """
+    if detail == "full":
+        return route_data
+    route_data = {name: value for name, value in route_data.items() if name != "instructions"}
+    if detail == "summary":
+        route_data.pop("geometry", None)
+    elif route_data.get("geometry"):
+        route_data["geometry"] = routing.overview_geometry(route_data["geometry"])
+    return route_data
+
+def _format_route(route, places, coords, detail="full"):
+    """
+    Turn a raw OSRM-shaped route into the API payload: miles, hours and readable
+    instructions naming the trip's own places. Below "full" detail the
+    instructions are left out, and "summary" also leaves out the geometry.
+    """
     distance_miles = route["distance"] * 0.000621371
     duration_hours = route["duration"] / 3600
     legs = route.get("legs", [])
-    
-    formatted_instructions = []
-    for i, leg in enumerate(legs):
-        if i == 0:
-            start_place, end_place = current_place, pickup_place
-        else:
-            start_place, end_place = pickup_place, dropoff_place
 
-        for step in leg.get("steps", []):
-            maneuver = step.get("maneuver", {})
-            step_type = maneuver.get("type", "")
-            modifier = maneuver.get("modifier", "")
-            road_name = step.get("name", "")
-            step_distance = round(step.get("distance", 0) * 0.000621371, 2)
-            if step_type == "depart":
-                instruction_str = f"Depart from {start_place} onto {road_name} and continue for {step_distance} miles."
-            elif step_type == "arrive":
-                instruction_str = f"Arrive at {end_place}."
-            else:
-                if modifier:
-                    instruction_str = f"{step_type.capitalize()} {modifier} onto {road_name} and continue for {step_distance} miles."
-                else:
-                    instruction_str = f"{step_type.capitalize()} onto {road_name} and continue for {step_distance} miles."
-            formatted_instructions.append(instruction_str)
-    
     map_url = (
         f"https://www.openstreetmap.org/directions?engine=osrm_car"
-        f"&route={current_osrm};{pickup_osrm};{dropoff_osrm}"
+        f"&route={';'.join(swap_coordinates(c) for c in coords)}"
     )
-    
-    return {
-        "distance": distance_miles,
-        "duration": duration_hours,
-        "instructions": formatted_instructions,
-        "map_url": map_url,
-        "geometry": route.get("geometry")
-    }
 
-def generate_daily_logs(trip, route_data):
+    route_data = {"distance": distance_miles, "duration": duration_hours}
+    if detail == "full":
+        instructions = route_data["instructions"] = []
+        for i, leg in enumerate(legs):
+            start_place, end_place = _leg_places(places, i)
+            instructions.extend(_step_instruction(step, start_place, end_place) for step in leg.get("steps", []))
+    route_data["map_url"] = map_url
+    if detail != "summary":
+        route_data["geometry"] = route.get("geometry")
+    route_data["legs"] = [
+        {"distance": leg.get("distance", 0) * 0.000621371, "duration": leg.get("duration", 0) / 3600}
+        for leg in legs
+    ]
+    return route_data
+
+# Route fields generate_daily_logs() reads.
+LOG_ROUTE_FIELDS = ("distance", "duration", "legs", "geometry")
+
+def _trip_stops(trip):
+    """
+    (kind, minutes) for the on-duty stop after each leg: the pickup, any
+    extra stops (their own `minutes` or the default for their type) and
+    the dropoff.
+    """
+    defaults = {"pickup": settings.PICKUP_MINUTES, "dropoff": settings.DROPOFF_MINUTES}
+    extra = [
+        (stop["type"], stop.get("minutes", defaults[stop["type"]]))
+        for stop in getattr(trip, "stops", None) or []
+    ]
+    return [("pickup", defaults["pickup"]), *extra, ("dropoff", defaults["dropoff"])]
+
+def _route_legs(route_data):
+    """
+    (driving_minutes, miles) per leg. Routes without per-leg data are
+    treated as pickup at the start followed by one leg to the dropoff.
+    """
+    legs = route_data.get("legs")
+    if legs:
+        return [(leg["duration"] * 60, leg["distance"]) for leg in legs]
+    return [(0, 0), (route_data.get("duration", 0) * 60, route_data.get("distance", 0))]
+
+def hour_statuses(segments):
+    """
+    Status held for most of each hour of a day's (start, end, status)
+    segments; ties go to the lower status code.
+    """
+    counts = [[0] * hos.STATUS_COUNT for _ in range(24)]
+    for start, end, status in segments:
+        cursor = start
+        while cursor < end:
+            hour = cursor // 60
+            boundary = min(end, (hour + 1) * 60)
+            counts[hour][status] += boundary - cursor
+            cursor = boundary
+    return [max(range(hos.STATUS_COUNT), key=lambda status: (row[status], -status)) for row in counts]
+
+def status_grid(segments):
+    """
+    Build the 5x24 log grid: row s holds s in the hours spent mainly in status s.
+    """
+    hours = hour_statuses(segments)
+    return [
+        [status if hour_status == status else None for hour_status in hours]
+        for status in range(hos.STATUS_COUNT)
+    ]
+
+def with_status_grid(logs):
+    """
+    Logs in the original grid format: each day's `segments` replaced by
+    the derived `statusGrid`.
+    """
+    converted = []
+    for log in logs:
+        log = dict(log)
+        log["statusGrid"] = status_grid(log.pop("segments"))
+        converted.append(log)
+    return converted
+
+def _route_index(route_data):
+    geometry = route_data.get("geometry")
+    if not isinstance(geometry, dict) or geometry.get("type") != "LineString" or not geometry.get("coordinates"):
+        return None
+    return RouteIndex(geometry["coordinates"], route_data.get("distance"))
+
+def _locate_stops(schedule, route_data):
+    """
+    Per-day stop lists and end-of-day (lat, lon) positions. Each stop event
+    and day end is placed on the route geometry by its mileage, all in one
+    vectorized lookup; locations are None when the route has no geometry.
+    """
+    day_end_miles = np.cumsum(schedule.day_miles)
+    index = _route_index(route_data)
+    if index is not None:
+        points = index.locate([event["mile"] for event in schedule.events] + day_end_miles.tolist())
+        points = [[round(lat, 6), round(lon, 6)] for lat, lon in points.tolist()]
+    else:
+        points = [None] * (len(schedule.events) + len(day_end_miles))
+
+    stops = [[] for _ in range(schedule.days)]
+    for event, location in zip(schedule.events, points):
+        day, start = divmod(event["start"], hos.MINUTES_PER_DAY)
+        stops[day].append({
+            "type": event["type"],
+            "start_minute": start,
+            "end_minute": start + event["end"] - event["start"],
+            "mile": round(float(event["mile"]), 2),
+            "location": location,
+        })
+    return stops, points[len(schedule.events):]
+
+def generate_daily_logs(trip, route_data, prior_daily_on_duty=None):
     """
     Generate daily logs combining route data and trip details.
-    Additionally, create a status grid timeline for each day reflecting:
+    The duty schedule comes from tripplanner.hos at minute resolution; each
+    day carries its duty-status `segments` as [start_minute, end_minute, status]
+    runs from midnight (see with_status_grid() for the hourly grid), with
       0: Off Duty, 1: Sleeper Berth, 2: Driving, 3: Break, 4: On Duty.
-    This version allocates driving hours up to 11 per day until the total driving time is exhausted.
-    If driving in a day exceeds 8 hours, a 30-minute break (simulated as one hour on the grid) is inserted.
-    """
-    # Total driving time in hours (from OSRM route)
-    total_driving = route_data.get("duration", 0)
-    # Total distance in miles
-    total_distance = route_data.get("distance", 0)
-    
-    # Fixed stops (pickup + dropoff) and fueling stops add to overall on-duty time.
-    fixed_stops_time = 2  # hours
-    fueling_stop_time = (total_distance // 1000) * 0.5  # hours
-    adjusted_duration = total_driving + fixed_stops_time + fueling_stop_time
-
-    # For FMCSA, a driver can drive up to 11 hours in a day.
-    max_daily_driving = 11
-    # We assume an 8-day cycle as per FMCSA’s 70-hour limit.
-    cycle_days = 8
-
-    # Allocate driving hours per day (greedy allocation up to 11 hours per day)
-    daily_driving_alloc = []
-    remaining_driving = total_driving
-    for day in range(cycle_days):
-        if remaining_driving <= 0:
-            daily_driving_alloc.append(0)
-        else:
-            day_driving = min(max_daily_driving, remaining_driving)
-            daily_driving_alloc.append(day_driving)
-            remaining_driving -= day_driving
+    `prior_daily_on_duty` lists on-duty minutes for the days before the trip,
+    oldest first (see tripplanner.ledger); without it Trip.current_cycle_hours
+    counts toward the 70-hour cycle as on-duty time on the day before the
+    trip. Each day lists its `stops` (pickup, fuel, break, rest, ...) and its
+    `end_location`, placed along the route geometry.
+    """
+    if prior_daily_on_duty is None:
+        cycle_hours = getattr(trip, "current_cycle_hours", 0) or 0
+        prior_daily_on_duty = [int(round(cycle_hours * 60))]
+    legs = _route_legs(route_data)
+    stops = _trip_stops(trip)
+    if len(legs) != len(stops):
+        # Routes without per-leg data only place the pickup and dropoff.
+        stops = [stops[0], stops[-1]]
+    schedule = hos.plan_trip(
+        legs,
+        stops,
+        start_minute=settings.DRIVING_DAY_START_HOUR * 60,
+        prior_daily_on_duty=prior_daily_on_duty,
+        fuel_interval=settings.FUEL_STOP_INTERVAL_MILES,
+        fuel_minutes=settings.FUEL_STOP_MINUTES,
+    )
+
+    day_segments = schedule.day_segments()
+    day_stops, day_end_locations = _locate_stops(schedule, route_data)
+    minutes = schedule.status_minutes.tolist()
 
+    driver = trip.driver
+    via = ", ".join([trip.pickup_location, *(stop["location"] for stop in getattr(trip, "stops", None) or [])])
     logs = []
-    # For each day in the cycle, create a timeline.
-    for day in range(1, cycle_days + 1):
-        day_driving = daily_driving_alloc[day - 1]
-        # Calculate daily distance proportionally.
-        daily_distance = total_distance * (day_driving / total_driving) if total_driving > 0 else 0
-
-        # Build a 24-hour timeline.
-        # We assume the day starts at 0:00 but the driving window starts at 6:00.
-        timeline = [0] * 24  # default Off Duty (status 0)
-        start_hour = 6
-        # End hour based on day_driving (could be fractional)
-        end_hour = start_hour + day_driving
-
-        if day_driving <= 8:
-            # All driving is continuous.
-            for hr in range(start_hour, min(24, int(round(end_hour)))):
-                timeline[hr] = 2  # Driving.
-        else:
-            # First 8 hours are driving.
-            for hr in range(start_hour, min(24, 6 + 8)):
-                timeline[hr] = 2
-            # Insert a break after 8 hours.
-            if 14 < 24:
-                timeline[14] = 3  # Break (simulated as a full hour for the grid)
-            # Resume driving starting at hour 15.
-            remaining_hours = day_driving - 8
-            rem_full = int(round(remaining_hours))
-            for hr in range(15, min(24, 15 + rem_full)):
-                timeline[hr] = 2
-
-        # Build a 5-row status grid (rows 0 to 4 for statuses Off Duty, Sleeper Berth, Driving, Break, On Duty).
-        numRows = 5
-        statusGrid = [ [None]*24 for _ in range(numRows)]
-        for hr in range(24):
-            st = timeline[hr]
-            # Only set the cell for the appropriate status.
-            statusGrid[st][hr] = st
-
-        # For reporting, if a break was inserted, count it as 0.5 hour extra.
-        break_time = 0.5 if day_driving > 8 else 0
-        effective_driving_hours = day_driving + break_time
-        rest_hours = max(0, 24 - effective_driving_hours)
-        
+    for index in range(schedule.days):
+        day = index + 1
+        events = {stop["type"] for stop in day_stops[index]}
+        day_minutes = minutes[index]
+        driving_hours = day_minutes[hos.DRIVING] / 60
+        break_time = day_minutes[hos.BREAK] / 60
+        on_duty_hours = (day_minutes[hos.DRIVING] + day_minutes[hos.ON_DUTY]) / 60
+        rest_hours = (day_minutes[hos.OFF_DUTY] + day_minutes[hos.SLEEPER_BERTH]) / 60
+        cycle_used = schedule.on_duty_in_window(index, hos.CYCLE_DAYS)
+        short_cycle_used = schedule.on_duty_in_window(index, hos.SHORT_CYCLE_DAYS)
+
         log_entry = {
-            "cycle": 1,  # For simplicity, assume one cycle.
+            "cycle": schedule.cycle_index(index),
             "day": day,
-            "driver_name": trip.driver.username if trip.driver else "",
-            "carrier": trip.driver.carrier if trip.driver else "",
-            "truck_number": trip.driver.truck_number if trip.driver else "",
-            "home_terminal_address": trip.driver.home_terminal_address if trip.driver else "",
-            "shipping_docs": trip.driver.shipping_docs if trip.driver else "",
-            "driver_signature": trip.driver.driver_signature if trip.driver else "",
+            "driver_name": driver.username if driver else "",
+            "carrier": driver.carrier if driver else "",
+            "truck_number": driver.truck_number if driver else "",
+            "home_terminal_address": driver.home_terminal_address if driver else "",
+            "shipping_docs": driver.shipping_docs if driver else "",
+            "driver_signature": driver.driver_signature if driver else "",
             "current_cycle_hours": getattr(trip, "current_cycle_hours", ""),
             "current_location": trip.current_location,
             "pickup_location": trip.pickup_location,
             "dropoff_location": trip.dropoff_location,
-            "daily_distance": round(daily_distance, 2),
-            "daily_driving_hours": round(day_driving, 2),
-            "break_time": break_time,
-            "effective_driving_hours": round(effective_driving_hours, 2),
+            "daily_distance": round(float(schedule.day_miles[index]), 2),
+            "daily_driving_hours": round(driving_hours, 2),
+            "break_time": round(break_time, 2),
+            "effective_driving_hours": round(driving_hours + break_time, 2),
             "rest_hours": round(rest_hours, 2),
-            "fueling_stop": False, 
-            "pickup": (day == 1),
-            "dropoff": (day == cycle_days),
+            "fueling_stop": "fuel" in events,
+            "pickup": "pickup" in events,
+            "dropoff": "dropoff" in events,
             "remarks": (
-                f"Day {day}: {trip.driver.username if trip.driver else 'N/A'} driving from "
-                f"{trip.current_location} to {trip.dropoff_location} via {trip.pickup_location}"
+                f"Day {day}: {driver.username if driver else 'N/A'} driving from "
+                f"{trip.current_location} to {trip.dropoff_location} via {via}"
             ),
-            "date": trip.created_at,
-            "onDutyHours": round(effective_driving_hours, 2),
-            "seventyHrEightDay": 70,
-            "sixtyHrSevenDay": 60,
-            "statusGrid": statusGrid
+            "date": trip.created_at + timedelta(days=index),
+            "onDutyHours": round(on_duty_hours, 2),
+            "cycleHoursUsed": round(cycle_used / 60, 2),
+            # Hours still available under each rolling limit at the end of the day.
+            "seventyHrEightDay": round(max(0, hos.CYCLE_LIMIT - cycle_used) / 60, 2),
+            "sixtyHrSevenDay": round(max(0, hos.SHORT_CYCLE_LIMIT - short_cycle_used) / 60, 2),
+            "segments": [list(segment) for segment in day_segments[index]],
+            "stops": day_stops[index],
+            "end_location": day_end_locations[index],
         }
         logs.append(log_entry)
     return logs
@@ -1,18 +1,122 @@
 import base64
+import hmac
+from datetime import date
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
-from django.http import FileResponse
+from django.utils import timezone
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, JsonResponse
+from django.views import View
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from .models import Trip
-from .serializers import TripSerializer
-from .utils import get_route, generate_daily_logs
+from accounts.authentication import CachedJWTAuthentication
+from . import metrics
+from .batch import generate_logs_batch
+from .conditional import etag_matches, set_etag, trip_etag
+from .gazetteer import get_gazetteer
+from .geometry import MAX_ZOOM, shape_geometry, zoom_tolerance
+from .routing import ROUTE_DETAILS
+from .importer import IMPORT_FORMATS, import_trips
+from .jobs import enqueue_route_job
+from . import ledger
+from .ledger import prior_on_duty
+from .logsheets import trip_daily_logs
+from .matrix import distance_matrix, matrix_cache_stats
+from .pdf import cached_logs_pdf
+from .models import LogSheet, Trip
+from .pagination import RouteStepPagination, TripCursorPagination
+from .serializers import BatchLogRequestSerializer, MatrixRequestSerializer, RouteJobSerializer, TripSerializer
+from .utils import (
+    geocode_cache_stats, geocode_many, get_route, get_route_async, get_route_steps, invalidate_route, route_cache_stats,
+    RouteSteps, trim_route, with_status_grid,
+)
+
+def owned_trip(request, trip_id):
+    """
+    The requesting driver's trip `trip_id` (404 otherwise), with `driver`
+    set to the authenticated user so ETag and log generation reuse it
+    rather than loading the driver again.
+    """
+    trip = get_object_or_404(Trip, pk=trip_id, driver=request.user)
+    trip.driver = request.user
+    return trip
+
+def geometry_options(params):
+    """
+    Parse route_map's geometry query parameters: `zoom` (0-22) or an explicit
+    `tolerance` in degrees for simplification, and `geometry_format`
+    ("geojson" or "polyline"). Raises ValueError with a client-facing message.
+    """
+    tolerance = None
+    if params.get("tolerance"):
+        try:
+            tolerance = float(params["tolerance"])
+        except ValueError:
+            raise ValueError("Invalid tolerance parameter.")
+        if tolerance < 0:
+            raise ValueError("Invalid tolerance parameter.")
+    elif params.get("zoom"):
+        try:
+            zoom = int(params["zoom"])
+        except ValueError:
+            raise ValueError("Invalid zoom parameter.")
+        if not 0 <= zoom <= MAX_ZOOM:
+            raise ValueError(f"zoom must be between 0 and {MAX_ZOOM}.")
+        tolerance = zoom_tolerance(zoom)
+
+    encoding = params.get("geometry_format", "geojson")
+    if encoding not in ("geojson", "polyline"):
+        raise ValueError("geometry_format must be 'geojson' or 'polyline'.")
+    return tolerance, encoding
+
+def detail_option(params):
+    """
+    Parse route_map's `detail`: "summary" (distance, duration and legs),
+    "overview" (plus a simplified geometry) or "full" (default; full
+    geometry and instructions).
+    """
+    detail = params.get("detail", "full")
+    if detail not in ROUTE_DETAILS:
+        raise ValueError(f"detail must be one of {', '.join(ROUTE_DETAILS)}.")
+    return detail
+
+def status_format_option(params):
+    """
+    Parse the log endpoints' `status_format`: "grid" (default) for the 5x24
+    statusGrid, or "segments" for minute-accurate [start, end, status] runs.
+    """
+    status_format = params.get("status_format", "grid")
+    if status_format not in ("grid", "segments"):
+        raise ValueError("status_format must be 'grid' or 'segments'.")
+    return status_format
+
+def format_logs(logs, status_format):
+    return with_status_grid(logs) if status_format == "grid" else logs
+
+def list_param(params, name):
+    """
+    Comma-separated query parameter as a list, or None when absent.
+    """
+    value = params.get(name)
+    if value is None:
+        return None
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+def shape_route(route_data, tolerance, encoding):
+    if "geometry" in route_data and (tolerance or encoding != "geojson"):
+        route_data = dict(route_data, geometry=shape_geometry(route_data["geometry"], tolerance, encoding))
+    return route_data
 
 class TripListCreateAPIView(APIView):
     """
     API view for listing trips for the logged-in driver or, if permitted, for another user,
-    and creating a new trip.
+    and creating a new trip. Lists are cursor-paginated newest first; `fields`
+    limits the serialized fields and nested logs are only included with
+    `expand=logs`.
     """
     permission_classes = [IsAuthenticated]
 
@@ -39,18 +143,59 @@ class TripListCreateAPIView(APIView):
         else:
             # No query parameter: return trips for the authenticated user.
             trips = Trip.objects.filter(driver=request.user)
-        
-        serializer = TripSerializer(trips, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+
+        fields = list_param(request.query_params, "fields")
+        expand = list_param(request.query_params, "expand") or []
+        if "logs" in expand and (fields is None or "logs" in fields):
+            # Log payloads are not serialized here; keep them out of the prefetch.
+            trips = trips.prefetch_related(
+                Prefetch("logs", queryset=LogSheet.objects.defer("data").order_by("day"))
+            )
+
+        paginator = TripCursorPagination()
+        page = paginator.paginate_queryset(trips, request, view=self)
+        serializer = TripSerializer(page, many=True, fields=fields, expand=expand)
+        return paginator.get_paginated_response(serializer.data)
 
     def post(self, request, format=None):
         serializer = TripSerializer(data=request.data)
         if serializer.is_valid():
             # Automatically assign the logged-in driver to the trip.
-            serializer.save(driver=request.user)
+            trip = serializer.save(driver=request.user)
+            enqueue_route_job(trip)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class TripImportAPIView(APIView):
+    """
+    API view to create many trips for the logged-in driver from one upload:
+    CSV with a header row (text/csv) or one JSON trip per line
+    (application/x-ndjson). The body is read as a stream and imported in
+    chunks; valid rows are created even when others fail, and the errors
+    are reported by line. An upload that cannot be read to the end keeps
+    the rows before the problem, with the reason in "detail"; it is a 400
+    only when nothing was created. `geocode=true` warms the geocode caches
+    for the imported locations in the background.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, format=None):
+        media_type = (request.content_type or "").split(";")[0].strip().lower()
+        parse = IMPORT_FORMATS.get(media_type)
+        if parse is None:
+            return Response(
+                {"detail": f"Upload one of: {', '.join(IMPORT_FORMATS)}."},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+        if request.stream is None:
+            return Response({"detail": "The upload is empty."}, status=status.HTTP_400_BAD_REQUEST)
+        warm_geocode = request.query_params.get("geocode", "").lower() in ("1", "true", "yes")
+        report = import_trips(parse(request.stream), request.user, warm_geocode=warm_geocode)
+        # "detail" means the upload could not be read to the end.
+        failed = "detail" in report and not report["created"]
+        code = status.HTTP_400_BAD_REQUEST if failed else status.HTTP_200_OK
+        return Response(report, status=code)
+
 class TripDetailAPIView(APIView):
     """
     API view for retrieving, updating, or deleting a trip owned by the logged-in driver.
@@ -62,55 +207,447 @@ class TripDetailAPIView(APIView):
 
     def get(self, request, pk, format=None):
         trip = self.get_object(pk, request.user)
-        serializer = TripSerializer(trip)
+        serializer = TripSerializer(
+            trip,
+            fields=list_param(request.query_params, "fields"),
+            expand=list_param(request.query_params, "expand"),
+        )
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     def put(self, request, pk, format=None):
         trip = self.get_object(pk, request.user)
+        previous_route = (trip.route_places, trip.optimize_stops)
         serializer = TripSerializer(trip, data=request.data)
         if serializer.is_valid():
-            serializer.save(driver=request.user)
+            trip = serializer.save(driver=request.user)
+            if (trip.route_places, trip.optimize_stops) != previous_route:
+                invalidate_route(trip.pk)
+                enqueue_route_job(trip)
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def patch(self, request, pk, format=None):
         trip = self.get_object(pk, request.user)
+        previous_route = (trip.route_places, trip.optimize_stops)
         serializer = TripSerializer(trip, data=request.data, partial=True)
         if serializer.is_valid():
-            serializer.save(driver=request.user)
+            trip = serializer.save(driver=request.user)
+            if (trip.route_places, trip.optimize_stops) != previous_route:
+                invalidate_route(trip.pk)
+                enqueue_route_job(trip)
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request, pk, format=None):
         trip = self.get_object(pk, request.user)
+        invalidate_route(trip.pk)
         trip.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 class RouteMapAPIView(APIView):
     """
     API view to return route details from OSRM for a trip owned by the logged-in driver.
+    `detail=summary|overview|full` selects how much of the route is fetched
+    and returned. Accepts `zoom` or `tolerance` to simplify the geometry and
+    `geometry_format=polyline` for a Google encoded polyline. Responses
+    carry an ETag; a matching If-None-Match gets a 304 without routing.
     """
     permission_classes = [IsAuthenticated]
 
     def get(self, request, trip_id, format=None):
-        trip = get_object_or_404(Trip, pk=trip_id, driver=request.user)
+        trip = owned_trip(request, trip_id)
         try:
-            route_data = get_route(trip.current_location, trip.pickup_location, trip.dropoff_location)
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        return Response(route_data, status=status.HTTP_200_OK)
+            detail = detail_option(request.query_params)
+            tolerance, encoding = geometry_options(request.query_params)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        etag = trip_etag(trip, request)
+        if etag_matches(request, etag):
+            return set_etag(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+        route_data = trip.stored_route()
+        if route_data is not None:
+            route_data = trim_route(route_data, detail)
+        else:
+            try:
+                route_data = get_route(*trip.route_places, cache_tag=trip.pk, detail=detail)
+            except Exception as e:
+                return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        response = Response(shape_route(route_data, tolerance, encoding), status=status.HTTP_200_OK)
+        return set_etag(response, etag)
 
-class GenerateLogSheetAPIView(APIView):
+class RouteStepsAPIView(APIView):
+    """
+    API view returning a trip's turn-by-turn steps as structured records
+    (leg, maneuver type and modifier, road, miles, hours and instruction),
+    paginated with `limit`/`offset`. Only the requested page is formatted.
+    Ready trips are served from their stored steps.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, trip_id, format=None):
+        trip = owned_trip(request, trip_id)
+        etag = trip_etag(trip, request)
+        if etag_matches(request, etag):
+            return set_etag(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+        legs = trip.stored_steps()
+        if legs is not None:
+            steps = RouteSteps.from_legs(legs, trip.route_places)
+        else:
+            try:
+                steps = get_route_steps(*trip.route_places, cache_tag=trip.pk)
+            except Exception as e:
+                return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        paginator = RouteStepPagination()
+        page = paginator.paginate_queryset(steps, request, view=self)
+        return set_etag(paginator.get_paginated_response(page), etag)
+
+class RouteStatusAPIView(APIView):
     """
-    API view to dynamically generate daily log sheets (JSON) for a trip.
+    API view to poll the background route computation for a trip.
     """
     permission_classes = [IsAuthenticated]
 
     def get(self, request, trip_id, format=None):
         trip = get_object_or_404(Trip, pk=trip_id, driver=request.user)
+        job = trip.route_jobs.order_by("-pk").first()
+        return Response({
+            "status": trip.route_status,
+            "error": trip.route_error,
+            "updated_at": trip.route_updated_at,
+            "job": RouteJobSerializer(job).data if job else None,
+        }, status=status.HTTP_200_OK)
+
+class GenerateLogSheetAPIView(APIView):
+    """
+    API view to return daily log sheets (JSON) for a trip. Logs are served
+    from LogSheet rows and regenerated only when the trip's inputs change.
+    `status_format=segments` returns duty-status runs instead of statusGrid.
+    Conditional GETs are supported as in RouteMapAPIView.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, trip_id, format=None):
+        trip = owned_trip(request, trip_id)
+        try:
+            status_format = status_format_option(request.query_params)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        duty = prior_on_duty(trip)
+        etag = trip_etag(trip, request, duty)
+        if etag_matches(request, etag):
+            return set_etag(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+        route_data = trip.stored_route()
+        if route_data is None:
+            try:
+                route_data = get_route(*trip.route_places, cache_tag=trip.pk)
+            except Exception as e:
+                return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        logs = trip_daily_logs(trip, route_data, duty)
+        return set_etag(Response(format_logs(logs, status_format), status=status.HTTP_200_OK), etag)
+
+class LogSheetPDFAPIView(APIView):
+    """
+    API view to download a trip's daily logs as a printable PDF. Rendered
+    files are cached on disk by content hash and streamed from there.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, trip_id, format=None):
+        trip = owned_trip(request, trip_id)
+        duty = prior_on_duty(trip)
+        etag = trip_etag(trip, request, duty)
+        if etag_matches(request, etag):
+            return set_etag(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+        route_data = trip.stored_route()
+        if route_data is None:
+            try:
+                route_data = get_route(*trip.route_places, cache_tag=trip.pk)
+            except Exception as e:
+                return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        path = cached_logs_pdf(trip_daily_logs(trip, route_data, duty))
+        response = FileResponse(
+            open(path, "rb"),
+            content_type="application/pdf",
+            filename=f"trip-{trip.pk}-logs.pdf",
+        )
+        return set_etag(response, etag)
+
+class DutyStatusAPIView(APIView):
+    """
+    API view reporting the driver's 70-hour/8-day position at the end of
+    `date` (ISO format, default today) from their duty ledger: hours used
+    and left in the cycle, and whether a 34-hour restart is complete.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, format=None):
+        day = timezone.localdate()
+        if request.query_params.get("date"):
+            try:
+                day = date.fromisoformat(request.query_params["date"])
+            except ValueError:
+                return Response({"detail": "date must be YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+        driver_id = request.user.pk
+        return Response({
+            "date": day,
+            "cycle_used_hours": ledger.cycle_used_minutes(driver_id, day) / 60,
+            "available_hours": ledger.available_hours(driver_id, day),
+            "restart_completed": ledger.restart_completed(driver_id, day),
+        }, status=status.HTTP_200_OK)
+
+class BatchGenerateLogSheetAPIView(APIView):
+    """
+    API view to generate daily logs for many trips in one request, selected
+    by `trip_ids` or by `driver_id` plus an optional created-date range.
+    Drivers may only batch their own trips; staff may batch anyone's.
+    Accepts `status_format` like GenerateLogSheetAPIView.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, format=None):
         try:
-            route_data = get_route(trip.current_location, trip.pickup_location, trip.dropoff_location)
+            status_format = status_format_option(request.query_params)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = BatchLogRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = serializer.validated_data
+
+        # Own trips reuse the authenticated driver instead of joining it.
+        own = not request.user.is_staff
+        trips = Trip.objects.filter(driver=request.user) if own else Trip.objects.select_related("driver")
+        if "trip_ids" in params:
+            trip_ids = list(dict.fromkeys(params["trip_ids"]))
+            trips = trips.filter(pk__in=trip_ids)
+        else:
+            if own and params["driver_id"] != request.user.id:
+                return Response(
+                    {"detail": "Permission denied to view trips for this user."},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            trips = trips.filter(driver_id=params["driver_id"])
+            if params.get("start"):
+                trips = trips.filter(created_at__date__gte=params["start"])
+            if params.get("end"):
+                trips = trips.filter(created_at__date__lte=params["end"])
+            trip_ids = None
+
+        trips = list(trips.order_by("pk")[:settings.BATCH_LOG_MAX_TRIPS + 1])
+        if len(trips) > settings.BATCH_LOG_MAX_TRIPS:
+            return Response(
+                {"detail": f"At most {settings.BATCH_LOG_MAX_TRIPS} trips per batch."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if own:
+            for trip in trips:
+                trip.driver = request.user
+        results, errors = generate_logs_batch(trips)
+        if trip_ids is not None:
+            found = {trip.pk for trip in trips}
+            for trip_id in trip_ids:
+                if trip_id not in found:
+                    errors[trip_id] = "Not found."
+        return Response({
+            "count": len(results),
+            "results": [
+                {"trip_id": trip_id, "logs": format_logs(logs, status_format)}
+                for trip_id, logs in results.items()
+            ],
+            "errors": [{"trip_id": trip_id, "error": error} for trip_id, error in errors.items()],
+        }, status=status.HTTP_200_OK)
+
+class DistanceMatrixAPIView(APIView):
+    """
+    API view returning driving durations (hours) and distances (miles)
+    from every source to every destination, e.g. drivers to loads for
+    dispatch. Large sets are split into concurrent upstream table requests
+    and cells are cached, so repeated pairs cost nothing.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, format=None):
+        serializer = MatrixRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        sources = serializer.validated_data["sources"]
+        destinations = serializer.validated_data["destinations"]
+        try:
+            coords = geocode_many(sources + destinations)
+            durations, distances = distance_matrix(coords[:len(sources)], coords[len(sources):])
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        logs = generate_daily_logs(trip, route_data)
-        return Response(logs, status=status.HTTP_200_OK)
+        return Response({
+            "sources": [{"place": place, "location": list(coords[index])} for index, place in enumerate(sources)],
+            "destinations": [
+                {"place": place, "location": list(coords[len(sources) + index])}
+                for index, place in enumerate(destinations)
+            ],
+            "durations": [[None if value is None else value / 3600 for value in row] for row in durations],
+            "distances": [[None if value is None else value * 0.000621371 for value in row] for row in distances],
+        }, status=status.HTTP_200_OK)
+
+class PlaceSearchAPIView(APIView):
+    """
+    API view for place-name autocomplete against the offline gazetteer:
+    `q` is a name prefix and `limit` caps the results (default 10, max 50).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, format=None):
+        gazetteer = get_gazetteer()
+        if gazetteer is None:
+            return Response({"detail": "No gazetteer is configured."},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        try:
+            limit = min(int(request.query_params.get("limit", 10)), 50)
+        except ValueError:
+            return Response({"detail": "Invalid limit parameter."}, status=status.HTTP_400_BAD_REQUEST)
+        results = gazetteer.search(request.query_params.get("q", ""), limit=max(limit, 1))
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+class PlaceReverseAPIView(APIView):
+    """
+    API view returning the gazetteer place nearest to `lat`/`lon`.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, format=None):
+        gazetteer = get_gazetteer()
+        if gazetteer is None:
+            return Response({"detail": "No gazetteer is configured."},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        try:
+            lat = float(request.query_params["lat"])
+            lon = float(request.query_params["lon"])
+        except (KeyError, ValueError):
+            return Response({"detail": "lat and lon are required numbers."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        place = gazetteer.reverse(lat, lon)
+        if place is None:
+            return Response({"detail": "No known place nearby."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(place, status=status.HTTP_200_OK)
+
+class AsyncTripAPIView(View):
+    """
+    Base for native async (ASGI) trip endpoints. DRF's APIView is sync-only,
+    so JWT authentication and the owned-Trip lookup are done here directly;
+    subclasses implement `respond(request, trip)`, which otherwise answers
+    405 like a DRF view without a handler.
+    """
+    authentication = CachedJWTAuthentication()
+
+    async def get(self, request, trip_id):
+        try:
+            auth = await sync_to_async(self.authentication.authenticate)(request)
+        except AuthenticationFailed as e:
+            detail = e.detail if isinstance(e.detail, dict) else {"detail": e.detail}
+            return self.unauthorized(request, detail)
+        if auth is None:
+            return self.unauthorized(request, {"detail": "Authentication credentials were not provided."})
+        request.user = auth[0]
+
+        trip = await Trip.objects.filter(pk=trip_id, driver=request.user).afirst()
+        if trip is None:
+            return JsonResponse({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        trip.driver = request.user
+        return await self.respond(request, trip)
+
+    def unauthorized(self, request, detail):
+        response = JsonResponse(detail, status=status.HTTP_401_UNAUTHORIZED)
+        response["WWW-Authenticate"] = self.authentication.authenticate_header(request)
+        return response
+
+    async def respond(self, request, trip):
+        response = JsonResponse(
+            {"detail": f'Method "{request.method}" not allowed.'}, status=status.HTTP_405_METHOD_NOT_ALLOWED
+        )
+        response["Allow"] = ""
+        return response
+
+class AsyncRouteMapAPIView(AsyncTripAPIView):
+    """
+    Async variant of RouteMapAPIView for ASGI deployments.
+    """
+
+    async def respond(self, request, trip):
+        try:
+            detail = detail_option(request.GET)
+            tolerance, encoding = geometry_options(request.GET)
+        except ValueError as e:
+            return JsonResponse({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        etag = trip_etag(trip, request)
+        if etag_matches(request, etag):
+            return set_etag(HttpResponseNotModified(), etag)
+        route_data = trip.stored_route()
+        if route_data is not None:
+            route_data = trim_route(route_data, detail)
+        else:
+            try:
+                route_data = await get_route_async(*trip.route_places, cache_tag=trip.pk, detail=detail)
+            except Exception as e:
+                return JsonResponse({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        response = JsonResponse(shape_route(route_data, tolerance, encoding), status=status.HTTP_200_OK)
+        return set_etag(response, etag)
+
+class AsyncGenerateLogSheetAPIView(AsyncTripAPIView):
+    """
+    Async variant of GenerateLogSheetAPIView for ASGI deployments.
+    """
+
+    async def respond(self, request, trip):
+        try:
+            status_format = status_format_option(request.GET)
+        except ValueError as e:
+            return JsonResponse({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        duty = await sync_to_async(prior_on_duty)(trip)
+        etag = trip_etag(trip, request, duty)
+        if etag_matches(request, etag):
+            return set_etag(HttpResponseNotModified(), etag)
+        route_data = trip.stored_route()
+        if route_data is None:
+            try:
+                route_data = await get_route_async(*trip.route_places, cache_tag=trip.pk)
+            except Exception as e:
+                return JsonResponse({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        logs = await sync_to_async(trip_daily_logs)(trip, route_data, duty)
+        response = JsonResponse(format_logs(logs, status_format), safe=False, status=status.HTTP_200_OK)
+        return set_etag(response, etag)
+
+class MetricsView(View):
+    """
+    Prometheus metrics for this process: request and span latency
+    histograms, cache hit ratios and coalesced upstream calls. Readable with
+    the METRICS_TOKEN bearer token or a staff user's access token.
+    """
+    authentication = CachedJWTAuthentication()
+
+    def get(self, request):
+        token = settings.METRICS_TOKEN
+        header = request.headers.get("Authorization", "")
+        if not (token and hmac.compare_digest(header.encode(), f"Bearer {token}".encode())):
+            try:
+                auth = self.authentication.authenticate(request)
+            except AuthenticationFailed:
+                auth = None
+            if auth is None:
+                response = JsonResponse({"detail": "Authentication credentials were not provided."},
+                                        status=status.HTTP_401_UNAUTHORIZED)
+                response["WWW-Authenticate"] = self.authentication.authenticate_header(request)
+                return response
+            if not auth[0].is_staff:
+                return JsonResponse({"detail": "Metrics are restricted to staff."},
+                                    status=status.HTTP_403_FORBIDDEN)
+
+        geocode, route = geocode_cache_stats(), route_cache_stats()
+        caches = {
+            "geocode_gazetteer": geocode["gazetteer"],
+            "geocode_memory": geocode["memory"],
+            "geocode_database": geocode["database"],
+            "route": route,
+            "matrix": matrix_cache_stats(),
+        }
+        coalesced = {"geocode": geocode["coalesced"], "route": route["coalesced"]}
+        body = metrics.exposition(metrics.cache_metrics(caches, coalesced))
+        return HttpResponse(body, content_type=metrics.CONTENT_TYPE)